@@ -1,13 +1,66 @@
 # auth.py
 
-from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, current_app, request, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
+from sqlalchemy.exc import SQLAlchemyError
 from models import User, db
+from passwords import HasherBusy, password_hasher
+from tokens import SCOPES, TokenIdentity, denylist, issue_token, read_token
+from user_cache import CachedUser
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Initialize the Blueprint for authentication routes
 auth_bp = Blueprint("auth_bp", __name__)
 
+
+def user_by_login_query(login):
+    """
+    Build the query finding the user whose username or email matches a login.
+
+    Both unique indexes are used in one statement; a username match wins over an email
+    match, as when they were looked up one after the other.
+
+    Args:
+        login (str): A username or email address.
+
+    Returns:
+        Select: A statement yielding at most one User.
+    """
+    return (
+        db.select(User)
+        .where(db.or_(User.username == login, User.email == login))
+        .order_by(db.case((User.username == login, 0), else_=1))
+        .limit(1)
+    )
+
+
+def existing_users_query(username, email):
+    """
+    Build the query selecting the usernames and emails that clash with a signup.
+
+    Args:
+        username (str): The requested username.
+        email (str): The requested email address.
+
+    Returns:
+        Select: A statement yielding (username, email) rows of the clashing users.
+    """
+    return db.select(User.username, User.email).where(
+        db.or_(User.username == username, User.email == email)
+    )
+
+
+def busy_response(error):
+    """
+    Answer a request whose password check was rejected because the hashing pool is full.
+    """
+    logger.warning("Password hashing pool is full")
+    response = jsonify({"message": str(error)})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 @auth_bp.route("/signup", methods=["POST"])
 def signup():
     """
@@ -31,16 +84,17 @@ def signup():
         if not all([username, email, password, name]):
             return jsonify({"message": "All fields are required!"}), 400
 
-        # Check for existing username
-        if User.query.filter_by(username=username).first():
+        # Check for an existing username or email with one query
+        existing = db.session.execute(existing_users_query(username, email)).all()
+        if any(row.username == username for row in existing):
             return jsonify({"message": "Username already exists!"}), 400
-
-        # Check for existing email
-        if User.query.filter_by(email=email).first():
+        if existing:
             return jsonify({"message": "Email already exists!"}), 400
+        # End the read transaction so that no lock is held while hashing
+        db.session.rollback()
 
-        # Hash the password for security
-        password_hash = generate_password_hash(password)
+        # Hash the password for security, on the bounded hashing pool
+        password_hash = password_hasher.hash(password)
 
         # Create a new User instance
         new_user = User(
@@ -53,16 +107,18 @@ def signup():
         # Add and commit the new user to the database
         db.session.add(new_user)
         db.session.commit()
-        print(f"New user created: {new_user.username}")
+        logger.info("New user created", extra={"user_id": new_user.id})
 
         return jsonify({"message": "New user created!"}), 201
+    except HasherBusy as e:
+        return busy_response(e)
     except KeyError as e:
         # Handle missing fields in the JSON payload
-        print(f"Missing field: {e}")
+        logger.warning("Missing field: %s", e)
         return jsonify({"message": f"Missing field: {e}"}), 400
     except Exception as e:
         # Handle unexpected errors
-        print(f"Error creating new user: {e}")
+        logger.exception("Error creating new user")
         return jsonify({"message": f"Error creating new user: {e}"}), 400
 
 
@@ -74,9 +130,14 @@ def login():
     Expects:
         JSON payload with 'login' (username or email) and 'password'.
 
+    A stored hash made with other parameters than PASSWORD_HASH_METHOD is replaced by a
+    fresh one once the password has been verified, unless the hashing pool is busy or the
+    database cannot save it; the login succeeds either way.
+
     Returns:
         JSON response with a success message, username, and HTTP status 200 on successful login.
-        JSON response with an error message and appropriate HTTP status code on failure.
+        JSON response with an error message and appropriate HTTP status code on failure;
+        HTTP status 503 with Retry-After when too many logins are being verified at once.
     """
     try:
         data = request.get_json()
@@ -87,28 +148,48 @@ def login():
         if not all([login, password]):
             return jsonify({"message": "Login and password are required!"}), 400
 
-        # Attempt to find the user by username or email
-        user = (
-            User.query.filter_by(username=login).first()
-            or User.query.filter_by(email=login).first()
-        )
+        # Find the user by username or email with one query, then end the read
+        # transaction so that no lock is held while the password is checked
+        user = db.session.execute(user_by_login_query(login)).scalar()
+        if not user:
+            return jsonify({"message": "Username or password is incorrect!"}), 400
+        # Keep what the login needs, so that it completes without reading the row again
+        password_hash = user.password_hash
+        identity = CachedUser(user.id, user.username, user.email, user.name)
+        db.session.rollback()
 
-        # Verify the user's password
-        if not user or not check_password_hash(user.password_hash, password):
+        # Verify the user's password on the bounded hashing pool
+        if not password_hasher.verify(password_hash, password):
             return jsonify({"message": "Username or password is incorrect!"}), 400
 
+        # Upgrade hashes made with older cost parameters while the password is at hand
+        if password_hasher.needs_rehash(password_hash):
+            try:
+                user.password_hash = password_hasher.rehash(password)
+                db.session.commit()
+                logger.info("Password rehashed", extra={"user_id": identity.id})
+            except HasherBusy:
+                # Best effort: the password is verified, so log in now and upgrade next time
+                logger.info("Password rehash skipped, hasher busy", extra={"user_id": identity.id})
+            except SQLAlchemyError:
+                # Likewise when the database cannot take the write, e.g. because it is locked
+                db.session.rollback()
+                logger.warning("Password rehash not saved", exc_info=True, extra={"user_id": identity.id})
+
         # Log the user in using Flask-Login
-        login_user(user)
-        print(f"User {user.username} logged in successfully! Session id: {user.id}")
+        login_user(identity)
+        logger.info("User logged in", extra={"user_id": identity.id})
 
-        return jsonify({"message": "Logged in successfully!", "username": user.username}), 200 
+        return jsonify({"message": "Logged in successfully!", "username": identity.username}), 200 
+    except HasherBusy as e:
+        return busy_response(e)
     except KeyError as e:
         # Handle missing fields in the JSON payload
-        print(f"Missing field: {e}")
+        logger.warning("Missing field: %s", e)
         return jsonify({"message": f"Missing field: {e}"}), 400
     except Exception as e:
         # Handle unexpected errors
-        print(f"Error logging in: {e}")
+        logger.exception("Error logging in")
         return jsonify({"message": f"Error logging in: {e}"}), 400
 
 
@@ -123,12 +204,12 @@ def logout():
         JSON response with an error message and appropriate HTTP status code on failure.
     """
     try:
-        print(f"User {current_user.username} logged out successfully!")
+        logger.info("User logged out", extra={"user_id": current_user.id})
         logout_user()
         return jsonify({"message": "Logged out successfully!"}), 200
     except Exception as e:
         # Handle unexpected errors
-        print(f"Error logging out: {e}")
+        logger.exception("Error logging out")
         return jsonify({"message": f"Error logging out: {e}"}), 400
     
 
@@ -148,3 +229,77 @@ def current_user_route():
         # Include any other fields you want to expose, if available
     }
     return jsonify(user_info), 200
+
+
+@auth_bp.route("/tokens", methods=["POST"])
+@login_required
+def create_token():
+    """
+    Issue a short-lived signed access token for the logged-in user.
+
+    API clients send it as 'Authorization: Bearer <token>'; it is verified by its signature
+    and one lookup of the revoked tokens, without a session cookie or a user lookup.
+    Tokens cannot be used to issue further tokens.
+
+    Expects:
+        Optional JSON payload with 'scopes', a subset of ["read", "write"] (both by default).
+
+    Returns:
+        JSON response with the 'token', its 'token_id', 'scopes' and 'expires_in' seconds, and HTTP status 201.
+        If access tokens are disabled, returns an error message with HTTP status 404.
+        If the request is itself token-authenticated, returns an error message with HTTP status 403.
+        If a scope is unknown, returns an error message with HTTP status 400.
+    """
+    if not current_app.config["API_TOKENS_ENABLED"]:
+        return jsonify({"message": "Access tokens are disabled."}), 404
+    if isinstance(current_user, TokenIdentity):
+        return jsonify({"message": "Log in with a password to issue access tokens."}), 403
+
+    data = request.get_json(silent=True) or {}
+    scopes = data.get("scopes", list(SCOPES))
+    if not isinstance(scopes, list) or not scopes or not set(scopes) <= set(SCOPES):
+        return jsonify({"message": f"scopes must be a non-empty subset of {list(SCOPES)}."}), 400
+
+    token, token_id = issue_token(current_user, scopes)
+    logger.info("Access token issued", extra={"user_id": current_user.id})
+    return jsonify({
+        "token": token,
+        "token_id": token_id,
+        "scopes": sorted(set(scopes)),
+        "expires_in": current_app.config["API_TOKEN_TTL"],
+    }), 201
+
+
+@auth_bp.route("/tokens/revoke", methods=["POST"])
+@login_required
+def revoke_token():
+    """
+    Revoke an access token of the authenticated user before it expires.
+
+    Expects:
+        JSON payload with the 'token' to revoke; token-authenticated requests may omit it
+        to revoke the token they were sent with.
+
+    Returns:
+        JSON response with a success message and HTTP status 200.
+        If access tokens are disabled, returns an error message with HTTP status 404.
+        If the token is invalid, expired or belongs to another user, returns an error message with HTTP status 400.
+    """
+    if not current_app.config["API_TOKENS_ENABLED"]:
+        return jsonify({"message": "Access tokens are disabled."}), 404
+
+    data = request.get_json(silent=True) or {}
+    if data.get("token"):
+        identity = read_token(data["token"])
+    elif isinstance(current_user, TokenIdentity):
+        identity = current_user
+    else:
+        return jsonify({"message": "The token to revoke is required."}), 400
+
+    if identity is None or identity.id != current_user.id:
+        return jsonify({"message": "Token is invalid or already expired."}), 400
+
+    denylist.revoke(identity.token_id, identity.id, identity.expires_at)
+    db.session.commit()
+    logger.info("Access token revoked", extra={"user_id": current_user.id})
+    return jsonify({"message": "Token revoked successfully!"}), 200
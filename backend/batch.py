@@ -0,0 +1,125 @@
+# batch.py
+
+# Upper bound on the number of tasks accepted by a single batch request
+MAX_BATCH_SIZE = 5000
+
+
+def _check_id(value, field):
+    # IDs are integers; bool is an int subclass but never a valid ID
+    if value is not None and (isinstance(value, bool) or not isinstance(value, int)):
+        raise ValueError(f"{field} must be an integer.")
+    return value
+
+
+def _check_ref(value, field):
+    # Client-side references are strings or integers, used as dictionary keys
+    if value is not None and (isinstance(value, bool) or not isinstance(value, (str, int))):
+        raise ValueError(f"{field} must be a string or an integer.")
+    return value
+
+
+def flatten_batch(payload):
+    """
+    Normalize a batch creation payload into flat task specs, ordered parents first.
+
+    The payload's 'tasks' may be nested ('subtasks' arrays), flat (each item carrying a
+    client-side 'temp_id' and an optional 'parent_ref' to another item), or a mix of both.
+    Items may also attach to an existing task through 'parent_id'. Top-level items take
+    their 'list_id' from the item or from the payload; children inherit their parent's list.
+
+    Args:
+        payload (dict): The parsed JSON request body.
+
+    Returns:
+        list: Dictionaries with 'ref', 'index' (request order), 'temp_id', 'name', 'completed', 'list_id',
+        'parent_ref', 'parent_id' and 'level' keys, sorted by 'level'.
+
+    Raises:
+        ValueError: If the payload is malformed, e.g. an ID is not an integer or a temp_id
+            neither a string nor an integer.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get("tasks"), list):
+        raise ValueError("A 'tasks' array is required.")
+
+    default_list_id = _check_id(payload.get("list_id"), "list_id")
+    specs = {}
+    order = []
+
+    # Walk nested items with an explicit stack of (item, enclosing ref)
+    stack = [(item, None) for item in reversed(payload["tasks"])]
+    while stack:
+        item, enclosing_ref = stack.pop()
+        if not isinstance(item, dict):
+            raise ValueError("Each task must be an object.")
+
+        name = item.get("name")
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError("Task name is required.")
+
+        temp_id = _check_ref(item.get("temp_id"), "temp_id")
+        ref = f"temp:{temp_id}" if temp_id is not None else f"auto:{len(order)}"
+        if ref in specs:
+            raise ValueError(f"Duplicate temp_id: {temp_id}.")
+
+        parent_ref = enclosing_ref
+        if _check_ref(item.get("parent_ref"), "parent_ref") is not None:
+            if enclosing_ref is not None:
+                raise ValueError("Nested tasks cannot also declare a parent_ref.")
+            parent_ref = f"temp:{item['parent_ref']}"
+
+        parent_id = _check_id(item.get("parent_id"), "parent_id")
+        if parent_id is not None and parent_ref is not None:
+            raise ValueError("A task cannot have both a parent_ref and a parent_id.")
+
+        specs[ref] = {
+            "ref": ref,
+            "index": len(order),
+            "temp_id": temp_id,
+            "name": name,
+            "completed": bool(item.get("completed", False)),
+            "list_id": (
+                _check_id(item.get("list_id", default_list_id), "list_id")
+                if parent_ref is None and parent_id is None else None
+            ),
+            "parent_ref": parent_ref,
+            "parent_id": parent_id,
+        }
+        order.append(ref)
+
+        if len(order) > MAX_BATCH_SIZE:
+            raise ValueError(f"A batch may contain at most {MAX_BATCH_SIZE} tasks.")
+
+        subtasks = item.get("subtasks", [])
+        if not isinstance(subtasks, list):
+            raise ValueError("'subtasks' must be an array.")
+        stack.extend((subtask, ref) for subtask in reversed(subtasks))
+
+    for ref in order:
+        spec = specs[ref]
+        if spec["parent_ref"] is None and spec["parent_id"] is None and spec["list_id"] is None:
+            raise ValueError("list_id is required for top-level tasks.")
+        if spec["parent_ref"] is not None and spec["parent_ref"] not in specs:
+            raise ValueError(f"Unknown parent_ref: {spec['parent_ref'][len('temp:'):]}.")
+
+    # Resolve each spec's level within the batch, rejecting reference cycles
+    for ref in order:
+        chain = []
+        visited = set()
+        current = ref
+        while "level" not in specs[current]:
+            if current in visited:
+                raise ValueError("parent_ref values must not form a cycle.")
+            chain.append(current)
+            visited.add(current)
+            parent_ref = specs[current]["parent_ref"]
+            if parent_ref is None:
+                specs[current]["level"] = 0
+                chain.pop()
+                break
+            current = parent_ref
+
+        for node_ref in reversed(chain):
+            specs[node_ref]["level"] = specs[specs[node_ref]["parent_ref"]]["level"] + 1
+
+    # sorted() is stable, so siblings keep their request order
+    return sorted((specs[ref] for ref in order), key=lambda spec: spec["level"])
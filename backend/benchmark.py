@@ -0,0 +1,514 @@
+# benchmark.py
+
+"""
+Reproducible latency benchmark for every API route.
+
+Seeds a throwaway SQLite database with synthetic users, lists and task trees of a
+configurable shape, drives each endpoint through the Flask test client, and writes
+p50/p95/p99 latency, requests per second and SQL statements per request to a JSON
+file. Pass --compare with an earlier result file to print the change per endpoint.
+
+Usage:
+    python benchmark.py --lists 5 --roots 20 --depth 3 --fanout 3 --output results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from sqlalchemy import event
+from werkzeug.security import generate_password_hash
+from server import create_app
+from db_init import db
+from models import List, User
+from batch import flatten_batch
+from hierarchy import insert_task_batch
+from columnar import COLUMNAR_JSON_MIMETYPE
+from tree_cache import tree_cache
+
+BASE_URL = "https://localhost"
+PASSWORD = "benchmark-password"
+
+
+def build_tree(depth, fanout, prefix="task"):
+    """
+    Build a nested batch payload of the given shape.
+
+    Args:
+        depth (int): Levels of subtasks below each top-level task.
+        fanout (int): Subtasks per task.
+        prefix (str): Name prefix of the generated tasks.
+
+    Returns:
+        dict: A task item with nested 'subtasks'.
+    """
+    root = {"name": prefix, "subtasks": []}
+    level = [root]
+    for current_depth in range(depth):
+        next_level = []
+        for parent in level:
+            for index in range(fanout):
+                child = {"name": f"{parent['name']}.{index}", "subtasks": []}
+                parent["subtasks"].append(child)
+                next_level.append(child)
+        level = next_level
+    return root
+
+
+def seed(args):
+    """
+    Create the benchmark users, lists and task trees. Requires an app context.
+
+    Args:
+        args: Parsed command-line arguments.
+
+    Returns:
+        list: One dict per user with 'username' and 'list_ids'.
+    """
+    password_hash = generate_password_hash(PASSWORD)
+    users = []
+
+    for user_index in range(args.users):
+        user = User(
+            username=f"bench{user_index}",
+            email=f"bench{user_index}@example.com",
+            name=f"Benchmark User {user_index}",
+            password_hash=password_hash,
+        )
+        db.session.add(user)
+        db.session.flush()
+
+        list_ids = []
+        for list_index in range(args.lists):
+            task_list = List(name=f"List {list_index}", user_id=user.id)
+            db.session.add(task_list)
+            db.session.flush()
+            list_ids.append(task_list.id)
+
+            payload = {
+                "list_id": task_list.id,
+                "tasks": [
+                    build_tree(args.depth, args.fanout, f"task{root_index}")
+                    for root_index in range(args.roots)
+                ],
+            }
+            insert_task_batch(flatten_batch(payload), {})
+
+        db.session.commit()
+        users.append({"username": user.username, "list_ids": list_ids})
+
+    return users
+
+
+def first_task_id(client, list_id):
+    """
+    Return the ID of the first top-level task of a list.
+    """
+    tasks = client.get(f"{BASE_URL}/api/GetTasks/{list_id}").get_json()["tasks"]
+    return tasks[0]["id"]
+
+
+def create_task(client, list_id, name="scratch"):
+    """
+    Create a top-level task and return its ID.
+    """
+    client.post(f"{BASE_URL}/api/AddTask/{list_id}", json={"name": name})
+    tasks = client.get(f"{BASE_URL}/api/GetTasks/{list_id}").get_json()["tasks"]
+    return tasks[-1]["id"]
+
+
+def create_list(client, name="scratch"):
+    """
+    Create a list and return its ID.
+    """
+    client.post(f"{BASE_URL}/api/Addlists", json={"name": name})
+    lists = client.get(f"{BASE_URL}/api/GetLists").get_json()["lists"]
+    return lists[-1]["id"]
+
+
+def create_subtree(client, list_id, depth=3, fanout=5):
+    """
+    Create a top-level task with a full subtree in one batch and return the root's ID.
+    """
+    response = client.post(
+        f"{BASE_URL}/api/tasks:batch",
+        json={"list_id": list_id, "tasks": [build_tree(depth, fanout, "scratch")]},
+    )
+    return response.get_json()["ids"][0]
+
+
+def create_populated_list(client, roots=5, depth=3, fanout=5):
+    """
+    Create a list holding several full subtrees and return its ID.
+    """
+    list_id = create_list(client)
+    client.post(
+        f"{BASE_URL}/api/tasks:batch",
+        json={"list_id": list_id, "tasks": [build_tree(depth, fanout, "scratch") for _ in range(roots)]},
+    )
+    return list_id
+
+
+def build_chain(length, prefix="chain"):
+    """
+    Build a flat batch payload of a single chain of tasks, each the parent of the next.
+
+    The flat format is used because the nested one cannot be decoded beyond the JSON
+    parser's recursion limit.
+
+    Args:
+        length (int): Number of tasks in the chain.
+        prefix (str): Name prefix of the generated tasks.
+
+    Returns:
+        list: Flat task items linked through 'temp_id' and 'parent_ref'.
+    """
+    return [
+        {"name": f"{prefix}{index}", "temp_id": index, **({"parent_ref": index - 1} if index else {})}
+        for index in range(length)
+    ]
+
+
+def shaped_list(tasks):
+    """
+    Return an untimed setup creating, on its first call only, a list holding the given batch.
+    """
+    created = {}
+
+    def setup(client):
+        if "list_id" not in created:
+            created["list_id"] = create_list(client, "shaped")
+            client.post(f"{BASE_URL}/api/tasks:batch", json={"list_id": created["list_id"], "tasks": tasks})
+        return created["list_id"]
+
+    return setup
+
+
+def uncached(setup=None):
+    """
+    Wrap a scenario's setup so the tree cache is emptied before every request.
+
+    GetTasks serves cached payloads (and skips streaming) whenever the list is unchanged,
+    so without this its scenarios would time cache hits instead of loading trees.
+    """
+    def run(client):
+        tree_cache.backend.clear()
+        return setup(client) if setup else None
+
+    return run
+
+
+def scenarios(client, user, args):
+    """
+    Describe one benchmark scenario per endpoint.
+
+    Each scenario is a (name, setup, request) tuple: setup(client) runs untimed before
+    every request and its result is passed to request(state), which returns the
+    (method, url, json) to time, optionally followed by request headers.
+
+    Args:
+        client: A logged-in Flask test client.
+        user (dict): The seeded user, with its 'list_ids'.
+        args: Parsed command-line arguments, giving the deep chain's and wide tree's sizes.
+
+    Returns:
+        list: The scenarios.
+    """
+    list_id, other_list_id = user["list_ids"][0], user["list_ids"][-1]
+    # Created when their scenarios first run, after the ones reading every list
+    deep_chain = shaped_list(build_chain(args.chain_length))
+    wide_tree = shaped_list([build_tree(1, args.wide_fanout, "wide")])
+    task_id = first_task_id(client, list_id)
+    move_state = {"list_id": list_id}
+
+    def move_target(client):
+        # Alternate the task between two lists so every move does the same work
+        move_state["list_id"] = other_list_id if move_state["list_id"] == list_id else list_id
+        return move_state["list_id"]
+
+    return [
+        ("GET /GetLists", None, lambda state: ("get", "/GetLists", None)),
+        ("GET /GetLists?include=tasks", None, lambda state: ("get", "/GetLists?include=tasks", None)),
+        ("GET /GetTasks/<list_id>", uncached(), lambda state: ("get", f"/GetTasks/{list_id}", None)),
+        (
+            "GET /GetTasks/<list_id> (cached)",
+            # An untimed read fills the cache, so every timed request is a hit
+            lambda client: client.get(f"{BASE_URL}/api/GetTasks/{list_id}"),
+            lambda state: ("get", f"/GetTasks/{list_id}", None),
+        ),
+        (
+            "GET /GetTasks/<list_id>?stream=true",
+            uncached(),
+            lambda state: ("get", f"/GetTasks/{list_id}?stream=true", None),
+        ),
+        (
+            "GET /GetTasks/<list_id> (columnar)",
+            uncached(),
+            lambda state: ("get", f"/GetTasks/{list_id}", None, {"Accept": COLUMNAR_JSON_MIMETYPE}),
+        ),
+        (
+            "GET /GetLists?include=tasks (columnar)",
+            None,
+            lambda state: ("get", "/GetLists?include=tasks", None, {"Accept": COLUMNAR_JSON_MIMETYPE}),
+        ),
+        ("GET /GetListDetails/<list_id>", None, lambda state: ("get", f"/GetListDetails/{list_id}", None)),
+        ("GET /getUserIdByListId/<list_id>", None, lambda state: ("get", f"/getUserIdByListId/{list_id}", None)),
+        ("GET /search?q=", None, lambda state: ("get", "/search?q=task1", None)),
+        ("GET /current_user", None, lambda state: ("get", "/current_user", None)),
+        ("POST /AddTask/<list_id>", None, lambda state: ("post", f"/AddTask/{list_id}", {"name": "bench"})),
+        (
+            "POST /AddSubtasks",
+            None,
+            lambda state: ("post", "/AddSubtasks", {"name": "bench", "parent_id": task_id, "list_id": list_id}),
+        ),
+        (
+            "POST /tasks:batch",
+            None,
+            lambda state: ("post", "/tasks:batch", {"list_id": list_id, "tasks": [build_tree(2, 3, "batch")]}),
+        ),
+        ("PUT /EditTask/<task_id>", None, lambda state: ("put", f"/EditTask/{task_id}", {"name": "renamed"})),
+        ("PUT /TaskCompleted/<task_id>", None, lambda state: ("put", f"/TaskCompleted/{task_id}", None)),
+        (
+            "PUT /reorderTask/<task_id>",
+            None,
+            lambda state: ("put", f"/reorderTask/{task_id}", {"after_id": None}),
+        ),
+        (
+            "PUT /moveTask/<task_id>",
+            move_target,
+            lambda state: ("put", f"/moveTask/{task_id}", {"new_list_id": state}),
+        ),
+        (
+            "DELETE /DeleteTask/<task_id>",
+            lambda client: create_task(client, list_id),
+            lambda state: ("delete", f"/DeleteTask/{state}", None),
+        ),
+        (
+            "DELETE /DeleteTask/<task_id> (156-task subtree)",
+            lambda client: create_subtree(client, list_id),
+            lambda state: ("delete", f"/DeleteTask/{state}", None),
+        ),
+        ("POST /Addlists", None, lambda state: ("post", "/Addlists", {"name": "bench"})),
+        ("PUT /EditList/<list_id>", None, lambda state: ("put", f"/EditList/{list_id}", {"name": "renamed"})),
+        (
+            "DELETE /DeleteList/<list_id>",
+            create_list,
+            lambda state: ("delete", f"/DeleteList/{state}", None),
+        ),
+        (
+            "DELETE /DeleteList/<list_id> (780 tasks)",
+            create_populated_list,
+            lambda state: ("delete", f"/DeleteList/{state}", None),
+        ),
+        (
+            f"GET /GetTasks/<list_id> ({args.chain_length}-deep chain)",
+            uncached(deep_chain),
+            lambda state: ("get", f"/GetTasks/{state}", None),
+        ),
+        (
+            f"GET /GetTasks/<list_id>?stream=true ({args.chain_length}-deep chain)",
+            uncached(deep_chain),
+            lambda state: ("get", f"/GetTasks/{state}?stream=true", None),
+        ),
+        (
+            f"GET /GetTasks/<list_id> ({args.wide_fanout}-wide tree)",
+            uncached(wide_tree),
+            lambda state: ("get", f"/GetTasks/{state}", None),
+        ),
+        (
+            f"GET /GetTasks/<list_id>?stream=true ({args.wide_fanout}-wide tree)",
+            uncached(wide_tree),
+            lambda state: ("get", f"/GetTasks/{state}?stream=true", None),
+        ),
+        (
+            f"GET /GetTasks/<list_id> (columnar, {args.wide_fanout}-wide tree)",
+            uncached(wide_tree),
+            lambda state: ("get", f"/GetTasks/{state}", None, {"Accept": COLUMNAR_JSON_MIMETYPE}),
+        ),
+        (
+            "POST /login",
+            None,
+            lambda state: ("post", "/login", {"login": user["username"], "password": PASSWORD}),
+        ),
+    ]
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(client, setup, build_request, iterations, statements):
+    """
+    Time one scenario and count the SQL statements it issues.
+
+    Args:
+        client: A logged-in Flask test client.
+        setup (callable): Untimed setup run before every request, or None.
+        build_request (callable): Returns the (method, url, json[, headers]) of the request to time.
+        iterations (int): Number of timed requests.
+        statements (list): Shared list the engine listener appends executed statements to.
+
+    Returns:
+        dict: Latency percentiles, throughput, SQL statements and bytes per response, and error count.
+    """
+    durations = []
+    statement_counts = []
+    response_bytes = 0
+    errors = 0
+
+    for _ in range(iterations):
+        state = setup(client) if setup else None
+        method, url, payload, *headers = build_request(state)
+
+        statements.clear()
+        started = time.perf_counter()
+        response = getattr(client, method)(
+            f"{BASE_URL}/api{url}", json=payload, headers=headers[0] if headers else None
+        )
+        # Streamed bodies are only produced while they are read
+        response_bytes += len(response.get_data())
+        durations.append(time.perf_counter() - started)
+        statement_counts.append(len(statements))
+
+        if response.status_code >= 400:
+            errors += 1
+
+    durations.sort()
+    total = sum(durations)
+    return {
+        "requests": iterations,
+        "errors": errors,
+        "p50_ms": round(percentile(durations, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 3),
+        "mean_ms": round(total / iterations * 1000, 3),
+        "requests_per_second": round(iterations / total, 1) if total else None,
+        "sql_per_request": round(sum(statement_counts) / iterations, 2),
+        "bytes_per_response": round(response_bytes / iterations),
+    }
+
+
+def git_commit():
+    """
+    Return the current git commit hash, or None outside a git checkout.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """
+    Print the p50 latency and SQL count change of every endpoint against a baseline file.
+    """
+    with open(baseline_path) as baseline_file:
+        baseline = json.load(baseline_file)["results"]
+
+    print(f"\n{'endpoint':40} {'p50 ms':>20} {'sql/request':>16}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print(f"{name:40} {'(new)':>20}")
+            continue
+        print(
+            f"{name:40} {before['p50_ms']:>9.3f} -> {result['p50_ms']:<9.3f}"
+            f" {before['sql_per_request']:>6} -> {result['sql_per_request']:<6}"
+        )
+
+
+def parse_args(argv=None):
+    """
+    Parse the benchmark's command-line arguments.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark every API route.")
+    parser.add_argument("--users", type=int, default=2, help="synthetic users to create")
+    parser.add_argument("--lists", type=int, default=5, help="lists per user")
+    parser.add_argument("--roots", type=int, default=20, help="top-level tasks per list")
+    parser.add_argument("--depth", type=int, default=3, help="subtask levels below each top-level task")
+    parser.add_argument("--fanout", type=int, default=3, help="subtasks per task")
+    parser.add_argument("--chain-length", type=int, default=2000, help="tasks in the deep-chain scenarios")
+    parser.add_argument("--wide-fanout", type=int, default=2000, help="subtasks of the root in the wide-tree scenarios")
+    parser.add_argument("--iterations", type=int, default=50, help="timed requests per endpoint")
+    parser.add_argument("--only", help="only run endpoints whose name contains this text")
+    parser.add_argument("--output", default="benchmark_results.json", help="result file to write")
+    parser.add_argument("--compare", help="earlier result file to compare against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        database_path = os.path.join(directory, "benchmark.db")
+        app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{database_path}"})
+
+        with app.app_context():
+            users = seed(args)
+
+            # Count every statement sent to the database
+            statements = []
+            event.listen(
+                db.engine,
+                "before_cursor_execute",
+                lambda conn, cursor, statement, *rest: statements.append(statement),
+            )
+
+        client = app.test_client()
+        user = users[0]
+        client.post(f"{BASE_URL}/api/login", json={"login": user["username"], "password": PASSWORD})
+
+        results = {}
+        for name, setup, build_request in scenarios(client, user, args):
+            if args.only and args.only not in name:
+                continue
+            results[name] = run_scenario(client, setup, build_request, args.iterations, statements)
+            result = results[name]
+            print(
+                f"{name:40} p50 {result['p50_ms']:>9.3f} ms  p95 {result['p95_ms']:>9.3f} ms"
+                f"  p99 {result['p99_ms']:>9.3f} ms  {result['requests_per_second']:>8} req/s"
+                f"  {result['sql_per_request']:>6} sql/req"
+            )
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "shape": {
+                "users": args.users,
+                "lists": args.lists,
+                "roots": args.roots,
+                "depth": args.depth,
+                "fanout": args.fanout,
+                "tasks_per_list": args.roots * sum(args.fanout ** level for level in range(args.depth + 1)),
+                "chain_length": args.chain_length,
+                "wide_fanout": args.wide_fanout,
+            },
+            "iterations": args.iterations,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
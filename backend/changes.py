@@ -0,0 +1,290 @@
+# changes.py
+
+from flask import current_app, request
+from db_init import db
+from models import List, Task, Tombstone, User
+from tree_cache import tree_cache
+
+
+def record_list_change(user_id, list_ids):
+    """
+    Bump the version counters invalidating cached reads of the given lists.
+
+    Every route that writes lists or tasks calls this inside its transaction, so the
+    per-list versions (GetTasks, GetListDetails) and the owner's lists version
+    (GetLists) change exactly when their payloads may have changed. Cached task
+    trees of the lists are dropped as well.
+
+    The owner's new lists version is also the change sequence the caller stamps on
+    the rows it writes (change_seq) and on tombstones of the rows it deletes. Lists
+    take it as their version too, so a version never repeats for a list ID, even
+    when SQLite hands a deleted list's ID to a new list.
+
+    Args:
+        user_id (int): The ID of the user owning the lists.
+        list_ids (iterable): IDs of the lists that were modified, created or deleted.
+
+    Returns:
+        int: The user's new change sequence.
+    """
+    list_ids = {list_id for list_id in list_ids if list_id is not None}
+    tree_cache.invalidate(user_id, list_ids)
+    db.session.execute(
+        db.update(User)
+        .where(User.id == user_id)
+        .values(lists_version=User.lists_version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    change_seq = user_lists_version(user_id)
+
+    if list_ids:
+        db.session.execute(
+            db.update(List)
+            .where(List.id.in_(list_ids))
+            .values(version=change_seq)
+            .execution_options(synchronize_session=False)
+        )
+    return change_seq
+
+
+def record_deletions(user_id, change_seq, entity, entity_ids, list_id):
+    """
+    Record tombstones for deleted tasks or lists so delta sync can report them.
+
+    Tombstones older than TOMBSTONE_RETENTION change sequences are discarded along the
+    way; clients syncing from before them get a full resync instead (see changes_since).
+
+    Args:
+        user_id (int): The ID of the user who owned the entities.
+        change_seq (int): The change sequence of the deletion.
+        entity (str): 'task' or 'list'.
+        entity_ids (iterable): IDs of the deleted entities.
+        list_id (int): The list the entities belonged to.
+    """
+    rows = [
+        {
+            "user_id": user_id,
+            "entity": entity,
+            "entity_id": entity_id,
+            "list_id": list_id,
+            "change_seq": change_seq,
+        }
+        for entity_id in entity_ids
+    ]
+    if rows:
+        db.session.execute(db.insert(Tombstone), rows)
+
+    prune_tombstones(user_id, change_seq - current_app.config["TOMBSTONE_RETENTION"])
+
+
+def prune_tombstones(user_id, before_seq):
+    """
+    Discard a user's tombstones up to a change sequence and remember where they stop.
+
+    Args:
+        user_id (int): The ID of the user.
+        before_seq (int): Tombstones with this change sequence or older are deleted.
+    """
+    if before_seq <= 0:
+        return
+
+    pruned = db.session.execute(
+        db.delete(Tombstone)
+        .where(Tombstone.user_id == user_id, Tombstone.change_seq <= before_seq)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if pruned:
+        db.session.execute(
+            db.update(User)
+            .where(User.id == user_id, User.tombstones_pruned_seq < before_seq)
+            .values(tombstones_pruned_seq=before_seq)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def changed_lists_query(user_id, since):
+    """
+    Build the query selecting a user's lists changed after a change sequence.
+    """
+    return (
+        db.select(List.id, List.name)
+        .where(List.user_id == user_id, List.change_seq > since)
+        .order_by(List.change_seq)
+    )
+
+
+def changed_tasks_query(user_id, since):
+    """
+    Build the query selecting the tasks in a user's lists changed after a change sequence.
+    """
+    return (
+        db.select(
+            Task.id,
+            Task.name,
+            Task.parent_id,
+            Task.list_id,
+            Task.depth,
+            Task.completed,
+            Task.position,
+            Task.descendant_count,
+            Task.completed_descendant_count,
+        )
+        .join(List, Task.list_id == List.id)
+        .where(List.user_id == user_id, Task.change_seq > since)
+        .order_by(Task.change_seq, Task.path)
+    )
+
+
+def tombstones_query(user_id, since):
+    """
+    Build the query selecting a user's tombstones recorded after a change sequence.
+    """
+    return (
+        db.select(Tombstone.entity, Tombstone.entity_id)
+        .where(Tombstone.user_id == user_id, Tombstone.change_seq > since)
+        .order_by(Tombstone.change_seq)
+    )
+
+
+def changes_since(user_id, since):
+    """
+    Collect everything that changed in a user's lists after a change sequence.
+
+    The cursor is read before the rows, so a write committed meanwhile is reported
+    again on the next call rather than missed. A cursor older than the user's oldest
+    kept tombstone (deletions since then are no longer known) or newer than the
+    user's change sequence (e.g. from a restored database) gets a full resync:
+    every list and task, no deletions, and 'reset' set so the client replaces its copy.
+
+    Args:
+        user_id (int): The ID of the user.
+        since (int): The change sequence the client is up to date with (0 for everything).
+
+    Returns:
+        dict: The new 'cursor', whether this is a full 'reset', changed 'lists' and 'tasks',
+            and 'deleted' task and list IDs.
+    """
+    cursor, pruned_seq = db.session.execute(
+        db.select(User.lists_version, User.tombstones_pruned_seq).where(User.id == user_id)
+    ).one()
+    reset = since == 0 or since < pruned_seq or since > cursor
+    if reset:
+        # Rows never written since change sequences were introduced still carry 0
+        since = -1
+
+    lists = db.session.execute(changed_lists_query(user_id, since)).all()
+    tasks = db.session.execute(changed_tasks_query(user_id, since)).all()
+    tombstones = [] if reset else db.session.execute(tombstones_query(user_id, since)).all()
+
+    return {
+        "cursor": cursor,
+        "reset": reset,
+        "lists": [{"id": row.id, "name": row.name} for row in lists],
+        "tasks": [
+            {
+                "id": row.id,
+                "name": row.name,
+                "parent_id": row.parent_id,
+                "list_id": row.list_id,
+                "depth": row.depth,
+                "completed": row.completed,
+                "position": row.position,
+                "descendant_count": row.descendant_count,
+                "completed_descendant_count": row.completed_descendant_count,
+            }
+            for row in tasks
+        ],
+        "deleted": {
+            "lists": [row.entity_id for row in tombstones if row.entity == "list"],
+            "tasks": [row.entity_id for row in tombstones if row.entity == "task"],
+        },
+    }
+
+
+def list_version(list_id, user_id):
+    """
+    Read a list's version, checking that it belongs to the user, without loading any tasks.
+
+    Args:
+        list_id (int): The ID of the list.
+        user_id (int): The ID of the user who must own the list.
+
+    Returns:
+        int: The list's version, or None if the list is not found or not owned by the user.
+    """
+    return db.session.execute(
+        db.select(List.version).where(List.id == list_id, List.user_id == user_id)
+    ).scalar()
+
+
+def user_lists_version(user_id):
+    """
+    Read the version covering all of a user's lists.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        int: The user's lists version.
+    """
+    return db.session.execute(
+        db.select(User.lists_version).where(User.id == user_id)
+    ).scalar()
+
+
+def list_etag(user_id, list_id, version):
+    """
+    Build the (unquoted) ETag of a list's contents.
+
+    Args:
+        user_id (int): The ID of the list's owner.
+        list_id (int): The ID of the list.
+        version (int): The list's version.
+
+    Returns:
+        str: The ETag, unique to the owner, list and version.
+    """
+    return f"list-{user_id}-{list_id}-{version}"
+
+
+def is_not_modified(etag):
+    """
+    Check whether the request's If-None-Match header already matches an ETag.
+
+    Args:
+        etag (str): The current (unquoted) strong ETag of the resource.
+
+    Returns:
+        bool: True if the client's copy is current and a 304 can be returned.
+    """
+    return request.if_none_match.contains(etag)
+
+
+def not_modified_response(etag):
+    """
+    Build an empty 304 Not Modified response carrying the ETag.
+
+    Args:
+        etag (str): The current (unquoted) strong ETag of the resource.
+
+    Returns:
+        Response: The 304 response.
+    """
+    response = current_app.response_class(status=304)
+    return with_etag(response, etag)
+
+
+def with_etag(response, etag):
+    """
+    Attach a strong ETag to a response and ask clients to revalidate it on every use.
+
+    Args:
+        response (Response): The response to update.
+        etag (str): The (unquoted) ETag.
+
+    Returns:
+        Response: The updated response.
+    """
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
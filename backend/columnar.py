@@ -0,0 +1,260 @@
+# columnar.py
+
+import base64
+import time
+from flask import current_app
+from db_init import db
+from instrumentation import add_serialize_time
+from traversal import iter_preorder
+from tree import fetch_task_rows, list_summary_query
+
+try:
+    import msgpack
+except ImportError:
+    # MessagePack is optional; without it only the JSON encodings are offered
+    msgpack = None
+
+# Representations of task trees, chosen with the Accept header. Nested JSON stays the
+# default for clients that send no Accept header, '*/*' or anything else unknown.
+JSON_MIMETYPE = "application/json"
+COLUMNAR_JSON_MIMETYPE = "application/vnd.taskmanager.columnar+json"
+COLUMNAR_MSGPACK_MIMETYPE = "application/vnd.taskmanager.columnar+msgpack"
+
+# Short names of the columnar representations, used in ETags and tree cache keys
+VARIANTS = {
+    COLUMNAR_JSON_MIMETYPE: "columnar-json",
+    COLUMNAR_MSGPACK_MIMETYPE: "columnar-msgpack",
+}
+
+
+def offered_mimetypes():
+    """
+    List the representations this server can produce, the default first.
+    """
+    offers = [JSON_MIMETYPE, COLUMNAR_JSON_MIMETYPE]
+    if msgpack is not None:
+        offers.append(COLUMNAR_MSGPACK_MIMETYPE)
+    return offers
+
+
+def negotiate(request):
+    """
+    Pick the representation of a task tree response from the request's Accept header.
+
+    Args:
+        request: The current request.
+
+    Returns:
+        str: The chosen mimetype; JSON_MIMETYPE unless a columnar one is preferred.
+    """
+    return request.accept_mimetypes.best_match(offered_mimetypes()) or JSON_MIMETYPE
+
+
+class TaskColumns:
+    """
+    Parallel arrays describing a forest of tasks in depth-first order.
+
+    Task i's parent is task parent_index[i] (-1 for tasks at the top), which always
+    precedes it, so a client rebuilds the nesting in one forward pass. Fields the
+    client can derive (list_id, position, rollup counts) are left out; bit i of the
+    completed bitset (least significant bit first) is task i's status.
+
+    Attributes:
+        child_counts (list): Children of each task, kept only for paged trees, or None.
+    """
+
+    def __init__(self, with_child_counts=False):
+        self.ids = []
+        self.parent_index = []
+        self.depths = []
+        self.names = []
+        self.completed = bytearray()
+        self.child_counts = [] if with_child_counts else None
+        self._index = {}
+
+    def append(self, task_id, parent_id, depth, name, completed, child_count=None):
+        index = len(self.ids)
+        self._index[task_id] = index
+        self.ids.append(task_id)
+        self.parent_index.append(self._index.get(parent_id, -1))
+        self.depths.append(depth)
+        self.names.append(name)
+        if index % 8 == 0:
+            self.completed.append(0)
+        if completed:
+            self.completed[index >> 3] |= 1 << (index & 7)
+        if self.child_counts is not None:
+            self.child_counts.append(child_count)
+
+    def to_dict(self):
+        columns = {
+            "count": len(self.ids),
+            "ids": self.ids,
+            "parent_index": self.parent_index,
+            "depths": self.depths,
+            "names": self.names,
+            "completed": bytes(self.completed),
+        }
+        if self.child_counts is not None:
+            columns["child_counts"] = self.child_counts
+        return columns
+
+
+def task_columns(rows, root_parent_id=None):
+    """
+    Lay out flat task rows as columns, without building a dictionary per task.
+
+    Rows whose parent is not part of the given rows are skipped, as in build_task_tree.
+
+    Args:
+        rows (list): Task rows ordered by sibling position, as returned by fetch_task_rows.
+        root_parent_id (int, optional): Parent of the tasks at the top (None for top-level tasks).
+
+    Returns:
+        dict: The columns of the tree.
+    """
+    roots = []
+    children = {}
+    for row in rows:
+        if row.parent_id == root_parent_id:
+            roots.append(row)
+        else:
+            children.setdefault(row.parent_id, []).append(row)
+
+    columns = TaskColumns()
+    for row, _ in iter_preorder(roots, lambda row: children.get(row.id, ())):
+        columns.append(row.id, row.parent_id, row.depth, row.name, row.completed)
+    return columns.to_dict()
+
+
+def tree_columns(tasks):
+    """
+    Lay out already nested task dictionaries (such as a page from load_task_page) as columns.
+
+    Args:
+        tasks (list): Serialized tasks with their 'subtasks' and 'child_count'.
+
+    Returns:
+        dict: The columns of the tree, including 'child_counts'.
+    """
+    columns = TaskColumns(with_child_counts=True)
+    for task, _ in iter_preorder(tasks, lambda task: task["subtasks"]):
+        columns.append(
+            task["id"], task["parent_id"], task["depth"], task["name"], task["completed"], task["child_count"]
+        )
+    return columns.to_dict()
+
+
+def load_task_columns(list_id):
+    """
+    Load the full task hierarchy of a list as columns with one query.
+
+    Args:
+        list_id (int): The ID of the list to load.
+
+    Returns:
+        dict: The columns of the list's tree.
+    """
+    return task_columns(fetch_task_rows([list_id]))
+
+
+def load_list_columns(user_id, include_tasks=False):
+    """
+    Summarize a user's lists as columns, the columnar counterpart of load_list_summaries.
+
+    Args:
+        user_id (int): The ID of the user whose lists should be summarized.
+        include_tasks (bool): Whether to add each list's task columns, loaded in one batched query.
+
+    Returns:
+        dict: Parallel 'ids', 'names', 'task_counts', 'completed_counts' and 'max_depths'
+            arrays, plus 'tasks' (one column set per list) when requested.
+    """
+    summaries = db.session.execute(list_summary_query(user_id)).all()
+    columns = {
+        "count": len(summaries),
+        "ids": [row.id for row in summaries],
+        "names": [row.name for row in summaries],
+        "task_counts": [row.task_count for row in summaries],
+        "completed_counts": [row.completed_count for row in summaries],
+        "max_depths": [row.max_depth for row in summaries],
+    }
+
+    if include_tasks:
+        rows_by_list = {row.id: [] for row in summaries}
+        for row in fetch_task_rows(columns["ids"]):
+            rows_by_list[row.list_id].append(row)
+        columns["tasks"] = [task_columns(rows_by_list[row.id]) for row in summaries]
+
+    return columns
+
+
+def _encode_bytes(value):
+    # JSON has no binary type: bitsets travel as base64 strings
+    if isinstance(value, (bytes, bytearray)):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def encode(document, mimetype):
+    """
+    Serialize a columnar response body.
+
+    Args:
+        document (dict): The response, with columns from TaskColumns or load_list_columns.
+        mimetype (str): COLUMNAR_JSON_MIMETYPE or COLUMNAR_MSGPACK_MIMETYPE.
+
+    Returns:
+        bytes: The encoded body. In JSON, bitsets are base64 strings; in MessagePack, binary.
+    """
+    if mimetype == COLUMNAR_MSGPACK_MIMETYPE:
+        started = time.perf_counter()
+        try:
+            return msgpack.packb(document, use_bin_type=True)
+        finally:
+            add_serialize_time(time.perf_counter() - started)
+    return current_app.json.dumps(document, default=_encode_bytes, separators=(",", ":")).encode()
+
+
+def vary_on_accept(response):
+    """
+    Tell caches that a response depends on the Accept header.
+
+    Args:
+        response (Response): The response to update.
+
+    Returns:
+        Response: The updated response.
+    """
+    response.vary.add("Accept")
+    return response
+
+
+def columnar_response(document, mimetype):
+    """
+    Build a response carrying a columnar body.
+
+    Args:
+        document (dict): The response document.
+        mimetype (str): The negotiated columnar mimetype.
+
+    Returns:
+        Response: The response, varying by Accept.
+    """
+    return vary_on_accept(current_app.response_class(encode(document, mimetype), mimetype=mimetype))
+
+
+def representation_etag(etag, mimetype):
+    """
+    Give each representation of a resource its own ETag, so a conditional request never
+    validates a copy in another format.
+
+    Args:
+        etag (str): The (unquoted) ETag of the resource's default representation.
+        mimetype (str): The negotiated mimetype.
+
+    Returns:
+        str: The ETag of the negotiated representation.
+    """
+    variant = VARIANTS.get(mimetype)
+    return f"{etag}-{variant}" if variant else etag
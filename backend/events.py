@@ -0,0 +1,299 @@
+# events.py
+
+import json
+import logging
+import queue
+import threading
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import current_user, login_required
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from db_init import db
+from changes import user_lists_version
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One connected client's bounded queue of pending events.
+
+    Attributes:
+        user_id (int): The ID of the subscribed user.
+        queue (queue.Queue): Events waiting to be sent, as (event_type, data) tuples.
+        overflowed (bool): Set when an event was dropped because the queue was full.
+    """
+
+    def __init__(self, user_id, max_queue):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def drain(self):
+        """
+        Discard every queued event.
+        """
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+class EventBroker:
+    """
+    In-process publish/subscribe hub fanning change events out to per-user subscriptions.
+
+    Publishing never blocks a write request: when a slow client's queue is full, further
+    events for it are dropped and it receives a single 'resync' event instead, telling it
+    to catch up through GET /api/changes.
+
+    Attributes:
+        max_queue (int): Events buffered per connection.
+        max_subscribers (int): Concurrent connections accepted by this process.
+    """
+
+    def __init__(self, max_queue=100, max_subscribers=100):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._subscriber_count = 0
+        self._counters = {"published": 0, "delivered": 0, "dropped": 0, "rejected": 0}
+
+    def configure(self, max_queue, max_subscribers):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+
+    def subscribe(self, user_id):
+        """
+        Open a subscription to a user's channel.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            Subscription: The new subscription, or None if the connection limit is reached.
+        """
+        with self._lock:
+            if self._subscriber_count >= self.max_subscribers:
+                self._counters["rejected"] += 1
+                return None
+            subscription = Subscription(user_id, self.max_queue)
+            self._channels.setdefault(user_id, set()).add(subscription)
+            self._subscriber_count += 1
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            channel = self._channels.get(subscription.user_id)
+            if channel is None or subscription not in channel:
+                return
+            channel.discard(subscription)
+            if not channel:
+                del self._channels[subscription.user_id]
+            self._subscriber_count -= 1
+
+    def publish(self, user_id, event_type, data):
+        """
+        Deliver an event to every subscription of a user without blocking.
+
+        Args:
+            user_id (int): The ID of the user whose channel receives the event.
+            event_type (str): The event name, e.g. 'task_added'.
+            data (dict): The JSON-serializable event payload.
+        """
+        with self._lock:
+            self._counters["published"] += 1
+            for subscription in self._channels.get(user_id, ()):
+                if subscription.overflowed:
+                    self._counters["dropped"] += 1
+                    continue
+                try:
+                    subscription.queue.put_nowait((event_type, data))
+                    self._counters["delivered"] += 1
+                except queue.Full:
+                    subscription.overflowed = True
+                    self._counters["dropped"] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["subscribers"] = self._subscriber_count
+            stats["channels"] = len(self._channels)
+            stats["max_subscribers"] = self.max_subscribers
+            return stats
+
+
+# Shared by the write routes and the events stream
+broker = EventBroker()
+
+
+def publish_on_commit(user_id, event_type, data):
+    """
+    Queue an event on the current session, published only once its transaction commits.
+
+    Args:
+        user_id (int): The ID of the user whose channel receives the event.
+        event_type (str): The event name.
+        data (dict): The JSON-serializable event payload.
+    """
+    db.session.info.setdefault("pending_events", []).append((user_id, event_type, data))
+
+
+@event.listens_for(Session, "after_commit")
+def publish_pending_events(session):
+    """
+    Publish the events queued on a session when its transaction commits.
+    """
+    for user_id, event_type, data in session.info.pop("pending_events", []):
+        broker.publish(user_id, event_type, data)
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_pending_events(session):
+    """
+    Drop the events queued on a session whose transaction was rolled back.
+    """
+    session.info.pop("pending_events", None)
+
+
+def task_event_data(task):
+    """
+    Compact representation of a task in change events, matching GET /api/changes rows.
+
+    Args:
+        task (Task): The task.
+
+    Returns:
+        dict: The task's id, name, parent_id, list_id, depth, completed status and position.
+    """
+    return {
+        "id": task.id,
+        "name": task.name,
+        "parent_id": task.parent_id,
+        "list_id": task.list_id,
+        "depth": task.depth,
+        "completed": task.completed,
+        "position": task.position,
+    }
+
+
+def format_event(event_type, data, event_id=None):
+    """
+    Encode one Server-Sent Events message.
+
+    Args:
+        event_type (str): The event name.
+        data (dict): The JSON-serializable payload.
+        event_id (int, optional): The message ID, echoed back by clients as Last-Event-ID.
+
+    Returns:
+        str: The encoded message.
+    """
+    lines = [f"event: {event_type}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def stream_events(subscription, cursor, resync, heartbeat_seconds, current_version=None):
+    """
+    Yield a subscription's events as Server-Sent Events until the client disconnects.
+
+    The broker only reaches streams in the process that committed a change. Changes made
+    through other worker processes are caught on every heartbeat, by comparing the
+    stream's cursor with the user's change sequence, and by gaps in the sequence
+    numbers of delivered events; either way the client is sent a 'resync'.
+
+    Args:
+        subscription (Subscription): The client's subscription.
+        cursor (int): The user's change sequence when the stream opened.
+        resync (bool): Whether the client missed changes while disconnected.
+        heartbeat_seconds (float): Idle time after which a keep-alive comment is sent.
+        current_version (callable, optional): Returns the user's current change sequence.
+    """
+    try:
+        yield format_event("ready", {"cursor": cursor}, cursor)
+        if resync:
+            yield format_event("resync", {"cursor": cursor})
+
+        while True:
+            # A full queue means events were dropped; the client must catch up via /changes
+            if subscription.overflowed:
+                subscription.drain()
+                subscription.overflowed = False
+                yield format_event("resync", {})
+                continue
+
+            try:
+                event_type, data = subscription.queue.get(timeout=heartbeat_seconds)
+            except queue.Empty:
+                version = current_version() if current_version is not None else cursor
+                if version != cursor:
+                    # Changed through another process (or a route that publishes no event)
+                    cursor = version
+                    yield format_event("resync", {"cursor": cursor}, cursor)
+                else:
+                    yield ": keep-alive\n\n"
+                continue
+
+            seq = data.get("seq")
+            yield format_event(event_type, data, seq)
+            if seq is not None and seq > cursor:
+                # A skipped sequence number was committed elsewhere and never delivered here
+                if seq > cursor + 1:
+                    yield format_event("resync", {"cursor": seq}, seq)
+                cursor = seq
+    finally:
+        broker.unsubscribe(subscription)
+
+
+# Blueprint for the real-time event stream
+events_bp = Blueprint("events", __name__)
+
+
+@events_bp.route("/events", methods=["GET"])
+@login_required
+def get_events():
+    """
+    Stream the authenticated user's task changes as Server-Sent Events.
+
+    The stream opens with a 'ready' event carrying the current change cursor, followed by
+    task_added, tasks_added, task_edited, task_completed, subtree_completed, task_deleted,
+    task_moved and task_reordered events
+    as they are committed. A 'resync' event asks the client to catch up through
+    GET /api/changes, e.g. after reconnecting with a stale Last-Event-ID, falling behind,
+    or changes made through another worker process (noticed within one heartbeat).
+
+    Returns:
+        A text/event-stream response with HTTP status 200.
+        If this process has reached its connection limit, returns an error message with HTTP status 503.
+    """
+    cursor = user_lists_version(current_user.id)
+    last_event_id = request.headers.get("Last-Event-ID", "")
+    resync = last_event_id.isdigit() and int(last_event_id) != cursor
+
+    subscription = broker.subscribe(current_user.id)
+    if subscription is None:
+        return jsonify({"error": "Too many event streams, try again later."}), 503
+
+    app = current_app._get_current_object()
+    user_id = current_user.id
+
+    def current_version():
+        # The stream outlives the request, so each check runs in its own app context
+        with app.app_context():
+            return user_lists_version(user_id)
+
+    response = current_app.response_class(
+        stream_events(
+            subscription, cursor, resync, current_app.config["EVENTS_HEARTBEAT_SECONDS"], current_version
+        ),
+        mimetype="text/event-stream",
+    )
+    response.headers["Cache-Control"] = "no-cache"
+    # Keep reverse proxies from buffering the stream
+    response.headers["X-Accel-Buffering"] = "no"
+    return response, 200
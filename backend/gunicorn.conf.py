@@ -0,0 +1,33 @@
+# gunicorn.conf.py
+
+import multiprocessing
+import os
+
+# Address to listen on
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+
+# Worker processes and threads per worker; gthread workers share one connection pool per process.
+# Open event streams each hold a thread, so the app accepts at most threads - 1 of them
+# per worker unless EVENTS_MAX_CONNECTIONS says otherwise. Events are published within one
+# worker; streams on the others pick up its changes with a 'resync' on their next heartbeat.
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count() * 2 + 1)))
+# The app sizes per-process caches from the worker count (the user cache is off with several workers)
+os.environ["WEB_CONCURRENCY"] = str(workers)
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Build the app (and run schema upgrades) once in the master instead of in every worker
+preload_app = True
+
+
+def post_fork(server, worker):
+    """
+    Drop database connections inherited from the master so each worker opens its own.
+    """
+    from db_init import db
+    from wsgi import app
+
+    with app.app_context():
+        db.engine.dispose(close=False)
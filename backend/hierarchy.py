@@ -0,0 +1,631 @@
+# hierarchy.py
+
+from collections import defaultdict
+from itertools import groupby
+from db_init import db
+from models import Task
+from rollups import adjust_rollups, apply_rollup_deltas
+
+# Each task ID is stored as a zero-padded segment so paths sort in (id-ordered) pre-order.
+# Paths grow by 11 bytes per level, so a chain's path text (and index) grows with depth squared.
+PATH_SEGMENT_WIDTH = 10
+PATH_SEPARATOR = "/"
+
+# Distance between the positions of consecutive siblings when they are (re)numbered
+POSITION_GAP = 1024
+
+
+def path_segment(task_id):
+    """
+    Build the materialized path segment for a single task.
+
+    Args:
+        task_id (int): The ID of the task.
+
+    Returns:
+        str: The zero-padded segment, including its trailing separator.
+    """
+    return f"{task_id:0{PATH_SEGMENT_WIDTH}d}{PATH_SEPARATOR}"
+
+
+def path_depth(path):
+    """
+    Compute the depth encoded by a materialized path (0 for top-level tasks).
+
+    Args:
+        path (str): A materialized path.
+
+    Returns:
+        int: The number of ancestors of the task the path belongs to.
+    """
+    return path.count(PATH_SEPARATOR) - 1
+
+
+def path_ids(path):
+    """
+    Decode a materialized path into task IDs, from the root down to the task itself.
+
+    Args:
+        path (str): A materialized path.
+
+    Returns:
+        list: The IDs of the task's ancestors followed by the task's own ID.
+    """
+    return [int(segment) for segment in path.split(PATH_SEPARATOR) if segment]
+
+
+def path_ids_query(path):
+    """
+    Build a query selecting the task IDs encoded in a path, binding the path only once.
+
+    A recursive CTE steps through the fixed-width segments, so unlike an IN list of the
+    decoded IDs the statement stays within the database's bound-parameter limit however
+    deep the path is.
+
+    Args:
+        path (str): A materialized path ('' for none).
+
+    Returns:
+        Select: The IDs of the path's tasks, one per row.
+    """
+    step = PATH_SEGMENT_WIDTH + len(PATH_SEPARATOR)
+    path_value = db.literal(path, db.Text)
+    starts = db.select(db.literal(1).label("start")).cte("path_segment_starts", recursive=True)
+    starts = starts.union_all(
+        db.select(starts.c.start + step).where(starts.c.start + step <= db.func.length(path_value))
+    )
+    return db.select(
+        db.cast(db.func.substr(path_value, starts.c.start, PATH_SEGMENT_WIDTH), db.Integer)
+    ).where(starts.c.start < db.func.length(path_value))
+
+
+def ancestors_query(task):
+    """
+    Build a query selecting the IDs of a task's ancestors, for filters such as Task.id.in_().
+
+    Args:
+        task (Task): The task whose ancestors are requested.
+
+    Returns:
+        Select: The ancestor IDs, or an empty list for a top-level task.
+    """
+    parent_path = task.path[:-(PATH_SEGMENT_WIDTH + len(PATH_SEPARATOR))]
+    return path_ids_query(parent_path) if parent_path else []
+
+
+def in_subtree(path):
+    """
+    Build a filter selecting a task and all of its descendants through the path index.
+
+    A half-open range is used instead of LIKE, which SQLite cannot serve from a
+    case-sensitive index: every path starting with 'prefix/' sorts at or after it and
+    before 'prefix0', the next character after the separator.
+
+    Args:
+        path (str): The materialized path of the subtree's root.
+
+    Returns:
+        A SQLAlchemy filter expression.
+    """
+    upper_bound = path[:-1] + chr(ord(PATH_SEPARATOR) + 1)
+    return db.and_(Task.path >= path, Task.path < upper_bound)
+
+
+def in_any_subtree(paths):
+    """
+    Build a filter selecting several tasks and all of their descendants.
+
+    SQLite answers the OR of path ranges with one index range scan per subtree.
+
+    Args:
+        paths (list): The materialized paths of the subtrees' roots.
+
+    Returns:
+        A SQLAlchemy filter expression.
+    """
+    return db.or_(*(in_subtree(path) for path in paths))
+
+
+def assign_path(task, parent=None):
+    """
+    Set the materialized path and depth of a newly flushed task.
+
+    Args:
+        task (Task): The task to update; it must already have an ID.
+        parent (Task, optional): The task's parent, or None for top-level tasks.
+    """
+    parent_path = parent.path if parent is not None else ""
+    task.path = parent_path + path_segment(task.id)
+    task.depth = path_depth(task.path)
+
+
+def subtree_ids_query(path):
+    """
+    Build the query selecting the IDs of a task and all of its descendants.
+
+    Args:
+        path (str): The materialized path of the subtree's root.
+
+    Returns:
+        Select: A statement yielding task IDs in pre-order.
+    """
+    return db.select(Task.id).where(in_subtree(path)).order_by(Task.path)
+
+
+def subtree_ids(path):
+    """
+    Select the IDs of a task and all of its descendants with one indexed query.
+
+    Args:
+        path (str): The materialized path of the subtree's root.
+
+    Returns:
+        list: The task IDs of the subtree, in pre-order.
+    """
+    return db.session.execute(subtree_ids_query(path)).scalars().all()
+
+
+def delete_subtree(path):
+    """
+    Delete a task and all of its descendants with one DELETE over the path range.
+
+    No instances are loaded; loaded ones stay in the session until it is committed or
+    rolled back, which expires them.
+
+    Args:
+        path (str): The materialized path of the subtree's root.
+
+    Returns:
+        int: The number of deleted tasks.
+    """
+    result = db.session.execute(
+        db.delete(Task)
+        .where(in_subtree(path))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def delete_list_tasks(list_id):
+    """
+    Delete every task of a list with one DELETE over the list_id index.
+
+    Subtasks always share their parent's list, so this removes whole subtrees.
+
+    Args:
+        list_id (int): The ID of the list.
+
+    Returns:
+        int: The number of deleted tasks.
+    """
+    result = db.session.execute(
+        db.delete(Task)
+        .where(Task.list_id == list_id)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def move_subtree(task, new_list_id, new_parent=None, change_seq=None):
+    """
+    Re-root a task and all of its descendants with set-based statements.
+
+    The subtree IDs are selected once, then a single UPDATE moves every node to
+    new_list_id, rewrites its path prefix, shifts its depth by a common offset and
+    re-parents the subtree root under new_parent (or makes it a top-level task),
+    placing it after its new siblings, or keeping its position when the list and
+    parent do not change. The rollup counts of the old and new
+    ancestors and lists are shifted by the subtree's totals.
+
+    Args:
+        task (Task): The root of the subtree to move.
+        new_list_id (int): The ID of the target list.
+        new_parent (Task, optional): The new parent of the moved task.
+        change_seq (int, optional): Change sequence to stamp on the moved tasks.
+
+    Returns:
+        list: The IDs of the moved tasks.
+    """
+    old_path = task.path
+    new_path = (new_parent.path if new_parent is not None else "") + path_segment(task.id)
+    depth_offset = path_depth(new_path) - path_depth(old_path)
+    new_parent_id = new_parent.id if new_parent is not None else None
+
+    moved_ids = subtree_ids(old_path)
+    if new_list_id == task.list_id and new_parent_id == task.parent_id:
+        # Staying under the same parent keeps the task's place among its siblings
+        new_position = task.position
+    else:
+        new_position = next_position(new_list_id, new_parent_id)
+
+    # The subtree's totals leave the old ancestors and list and join the new ones
+    moved_tasks = 1 + task.descendant_count
+    moved_completed = int(task.completed) + task.completed_descendant_count
+    adjust_rollups(task.list_id, ancestors_query(task), -moved_tasks, -moved_completed, change_seq)
+    new_ancestors = path_ids_query(new_parent.path) if new_parent is not None else []
+    adjust_rollups(new_list_id, new_ancestors, moved_tasks, moved_completed, change_seq)
+
+    values = {
+        "list_id": new_list_id,
+        "path": db.literal(new_path, db.Text) + db.func.substr(Task.path, len(old_path) + 1),
+        "depth": Task.depth + depth_offset,
+        "parent_id": db.case((Task.id == task.id, new_parent_id), else_=Task.parent_id),
+        "position": db.case((Task.id == task.id, new_position), else_=Task.position),
+    }
+    if change_seq is not None:
+        values["change_seq"] = change_seq
+
+    db.session.execute(
+        db.update(Task)
+        .where(in_subtree(old_path))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+    # Loaded instances no longer match the database
+    db.session.expire_all()
+    return moved_ids
+
+
+def set_subtree_completed(task, completed, change_seq=None):
+    """
+    Mark a task and all of its descendants as completed (or not) with one set-based UPDATE.
+
+    The IDs whose status flips are selected first through the path index. The UPDATE then
+    also sets every node's completed_descendant_count, which becomes its descendant_count
+    or zero, and the flipped count is added to the ancestors' rollups.
+
+    Args:
+        task (Task): The root of the subtree.
+        completed (bool): The new completion status.
+        change_seq (int, optional): Change sequence to stamp on the updated tasks.
+
+    Returns:
+        list: The IDs of the tasks whose completion status changed, in tree order.
+    """
+    changed_ids = db.session.execute(
+        db.select(Task.id)
+        .where(in_subtree(task.path), Task.completed != completed)
+        .order_by(Task.path)
+    ).scalars().all()
+
+    values = {
+        "completed": completed,
+        "completed_descendant_count": Task.descendant_count if completed else 0,
+    }
+    if change_seq is not None:
+        values["change_seq"] = change_seq
+
+    db.session.execute(
+        db.update(Task)
+        .where(in_subtree(task.path))
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+
+    completed_delta = len(changed_ids) if completed else -len(changed_ids)
+    adjust_rollups(task.list_id, ancestors_query(task), 0, completed_delta, change_seq)
+
+    # Loaded instances no longer match the database
+    db.session.expire_all()
+    return changed_ids
+
+
+def wants_subtree(args):
+    """
+    Check whether a request's query string asked to apply a change to the whole subtree (?subtree=true).
+
+    Args:
+        args: The request's query arguments.
+
+    Returns:
+        bool: True for '1', 'true' or 'yes' (case-insensitive).
+    """
+    return args.get("subtree", "").strip().lower() in ("1", "true", "yes")
+
+
+def next_position(list_id, parent_id):
+    """
+    Compute the position placing a new task after all of its siblings.
+
+    Args:
+        list_id (int): The ID of the list.
+        parent_id (int): The ID of the parent task, or None for top-level tasks.
+
+    Returns:
+        int: The position one gap past the last sibling.
+    """
+    last = db.session.execute(
+        db.select(db.func.max(Task.position)).where(Task.list_id == list_id, Task.parent_id == parent_id)
+    ).scalar()
+    return (last or 0) + POSITION_GAP
+
+
+def renumber_siblings(list_id, parent_id, change_seq=None):
+    """
+    Spread the positions of a task's siblings POSITION_GAP apart, keeping their order.
+
+    Only needed when reordering has exhausted the gap between two neighbours.
+
+    Args:
+        list_id (int): The ID of the list.
+        parent_id (int): The ID of the parent task, or None for top-level tasks.
+        change_seq (int, optional): Change sequence to stamp on every renumbered task, so
+            delta syncs pick up their new positions.
+
+    Returns:
+        list: The new {'id', 'position'} of every renumbered task, in sibling order.
+    """
+    sibling_ids = db.session.execute(
+        db.select(Task.id)
+        .where(Task.list_id == list_id, Task.parent_id == parent_id)
+        .order_by(Task.position, Task.id)
+    ).scalars().all()
+    renumbered = [
+        {"id": task_id, "position": (index + 1) * POSITION_GAP}
+        for index, task_id in enumerate(sibling_ids)
+    ]
+    if renumbered:
+        stamp = {} if change_seq is None else {"change_seq": change_seq}
+        db.session.execute(db.update(Task), [dict(values, **stamp) for values in renumbered])
+    return renumbered
+
+
+def following_position(task, after=None):
+    """
+    Read the position of the sibling that will follow a reordered task.
+
+    Args:
+        task (Task): The task being moved.
+        after (Task, optional): The sibling the task will follow, or None to make it the first.
+
+    Returns:
+        int: The following sibling's position, or None if the task will be the last.
+    """
+    statement = (
+        db.select(Task.position)
+        .where(Task.list_id == task.list_id, Task.parent_id == task.parent_id, Task.id != task.id)
+        .order_by(Task.position, Task.id)
+        .limit(1)
+    )
+    if after is not None:
+        statement = statement.where(
+            db.or_(
+                Task.position > after.position,
+                db.and_(Task.position == after.position, Task.id > after.id),
+            )
+        )
+    return db.session.execute(statement).scalar()
+
+
+def reorder_task(task, after=None, change_seq=None):
+    """
+    Move a task among its siblings so it directly follows another one, updating only its own row.
+
+    The new position is the midpoint between the task's new neighbours. If they are
+    adjacent integers, the siblings are renumbered first, which is the only case
+    touching other rows.
+
+    Args:
+        task (Task): The task to move.
+        after (Task, optional): The sibling the task should follow, or None to make it the first.
+        change_seq (int, optional): Change sequence to stamp on siblings that get renumbered.
+
+    Returns:
+        tuple: The task's new position, and the new {'id', 'position'} of every other
+            renumbered sibling (empty unless the gap was used up).
+    """
+    previous = after.position if after is not None else 0
+    following = following_position(task, after)
+    if following is None:
+        task.position = previous + POSITION_GAP
+        return task.position, []
+
+    renumbered = []
+    if following - previous < 2:
+        # No room left between the neighbours; spread the siblings out first
+        renumbered = [
+            sibling
+            for sibling in renumber_siblings(task.list_id, task.parent_id, change_seq)
+            if sibling["id"] != task.id
+        ]
+        db.session.expire_all()
+        previous = after.position if after is not None else 0
+        following = following_position(task, after)
+
+    task.position = (previous + following) // 2
+    return task.position, renumbered
+
+
+def reserve_task_ids(count):
+    """
+    Reserve a block of consecutive task IDs, where the database allows choosing IDs up front.
+
+    SQLite allocates max(id) + 1 anyway. The reservation is only safe while the caller's
+    transaction holds SQLite's single write lock, so no other writer can take the same IDs
+    before the INSERT: write requests take it when their transaction begins (see
+    server.configure_sqlite), other callers once they have written. Calling it earlier
+    raises. Databases with ID sequences return None and let the INSERT generate the IDs.
+
+    Args:
+        count (int): The number of IDs needed.
+
+    Returns:
+        int: The first reserved ID, or None if IDs must be generated by the INSERT.
+
+    Raises:
+        RuntimeError: If called on SQLite outside a write transaction.
+    """
+    if db.engine.dialect.name != "sqlite":
+        return None
+    if not db.session.connection().connection.driver_connection.in_transaction:
+        raise RuntimeError("reserve_task_ids needs the write lock: write in the transaction first.")
+    return (db.session.execute(db.select(db.func.max(Task.id))).scalar() or 0) + 1
+
+
+def insert_task_batch(specs, parents, change_seq=0):
+    """
+    Insert a batch of new tasks with a single executemany INSERT.
+
+    IDs are reserved up front (see reserve_task_ids), so paths, depths and the new tasks'
+    rollup counts are all computed in memory and written by the INSERT itself; existing
+    ancestors and lists get one executemany UPDATE each. Where IDs cannot be reserved,
+    each hierarchy level is inserted with RETURNING and the paths are written afterwards
+    with one executemany UPDATE. New tasks follow their existing siblings in request
+    order. The caller commits the transaction.
+
+    Args:
+        specs (list): Task specs from batch.flatten_batch, ordered by level.
+        parents (dict): Existing parent tasks referenced by 'parent_id', keyed by ID,
+            each exposing 'list_id' and 'path'.
+        change_seq (int, optional): Change sequence to stamp on the created tasks.
+
+    Returns:
+        dict: Mapping of each spec's 'ref' to the ID of the created task.
+    """
+    # Every created task counts towards each of its ancestors and its list. Subtree totals
+    # are summed into parents deepest level first, so each task is visited once however
+    # deep the batch nests; existing ancestors then receive their parents' totals.
+    totals = {spec["ref"]: [0, 0] for spec in specs}
+    parent_totals = defaultdict(lambda: [0, 0])
+    for spec in reversed(specs):
+        descendants, completed_descendants = totals[spec["ref"]]
+        completed = int(bool(spec["completed"]))
+        if spec["parent_ref"] is not None:
+            target = totals[spec["parent_ref"]]
+        elif spec["parent_id"] is not None:
+            target = parent_totals[spec["parent_id"]]
+        else:
+            target = None
+        if target is not None:
+            target[0] += 1 + descendants
+            target[1] += completed + completed_descendants
+
+    next_id = reserve_task_ids(len(specs)) if specs else None
+    ids = {}
+    paths = {}
+    list_ids = {}
+    pending = []
+    # Next free position per (list_id, parent_id), read once for existing parents
+    positions = {}
+
+    for _, level_specs in groupby(specs, key=lambda spec: spec["level"]):
+        level_specs = list(level_specs)
+        rows = []
+        parent_paths = []
+
+        for spec in level_specs:
+            if spec["parent_ref"] is not None:
+                parent_id = ids[spec["parent_ref"]]
+                parent_path = paths[spec["parent_ref"]]
+                list_id = list_ids[spec["parent_ref"]]
+            elif spec["parent_id"] is not None:
+                parent = parents[spec["parent_id"]]
+                parent_id, parent_path, list_id = spec["parent_id"], parent.path, parent.list_id
+            else:
+                parent_id, parent_path, list_id = None, "", spec["list_id"]
+
+            sibling_key = (list_id, parent_id)
+            if sibling_key not in positions:
+                positions[sibling_key] = (
+                    POSITION_GAP if spec["parent_ref"] is not None else next_position(list_id, parent_id)
+                )
+            position = positions[sibling_key]
+            positions[sibling_key] += POSITION_GAP
+
+            parent_paths.append(parent_path)
+            rows.append({
+                "name": spec["name"],
+                "completed": spec["completed"],
+                "list_id": list_id,
+                "parent_id": parent_id,
+                "depth": path_depth(parent_path) + 1 if parent_path else 0,
+                "change_seq": change_seq,
+                "position": position,
+                "descendant_count": totals[spec["ref"]][0],
+                "completed_descendant_count": totals[spec["ref"]][1],
+            })
+
+        if next_id is not None:
+            created = range(next_id, next_id + len(rows))
+            next_id += len(rows)
+        else:
+            created = db.session.execute(
+                db.insert(Task).returning(Task.id, sort_by_parameter_order=True), rows
+            ).scalars().all()
+
+        for spec, row, parent_path, task_id in zip(level_specs, rows, parent_paths, created):
+            ids[spec["ref"]] = task_id
+            paths[spec["ref"]] = parent_path + path_segment(task_id)
+            list_ids[spec["ref"]] = row["list_id"]
+            if next_id is not None:
+                row["id"] = task_id
+                row["path"] = paths[spec["ref"]]
+                pending.append(row)
+
+    if pending:
+        # Parents precede their children, so foreign keys hold row by row; rendering NULLs
+        # keeps top-level tasks (parent_id None) in the same executemany as the others
+        db.session.execute(db.insert(Task).execution_options(render_nulls=True), pending)
+    elif ids:
+        db.session.execute(db.update(Task), [{"id": ids[ref], "path": paths[ref]} for ref in ids])
+
+    task_deltas = defaultdict(lambda: [0, 0])
+    for parent_id, (descendants, completed_descendants) in parent_totals.items():
+        for ancestor_id in path_ids(parents[parent_id].path):
+            task_deltas[ancestor_id][0] += descendants
+            task_deltas[ancestor_id][1] += completed_descendants
+
+    list_deltas = defaultdict(lambda: [0, 0])
+    for spec in specs:
+        list_deltas[list_ids[spec["ref"]]][0] += 1
+        list_deltas[list_ids[spec["ref"]]][1] += int(bool(spec["completed"]))
+
+    apply_rollup_deltas(task_deltas, list_deltas, change_seq)
+    return ids
+
+
+def backfill_task_paths():
+    """
+    Compute materialized paths for tasks created before the path column existed.
+
+    All (id, parent_id) pairs are read with one query, paths are resolved in memory,
+    and the missing ones are written back with a single bulk UPDATE.
+
+    Returns:
+        int: The number of tasks that were backfilled.
+    """
+    missing = db.session.execute(
+        db.select(db.func.count(Task.id)).where(Task.path.is_(None))
+    ).scalar()
+    if not missing:
+        return 0
+
+    parents = dict(db.session.execute(db.select(Task.id, Task.parent_id)).all())
+    paths = {}
+
+    for task_id in parents:
+        # Walk up until a task with a known path (or a root) is reached
+        chain = []
+        # Set mirror of chain, so cycle checks stay constant-time on deep chains
+        seen = set()
+        current = task_id
+        while current is not None and current not in paths and current not in seen:
+            chain.append(current)
+            seen.add(current)
+            current = parents.get(current)
+
+        prefix = paths.get(current, "")
+        for node_id in reversed(chain):
+            prefix += path_segment(node_id)
+            paths[node_id] = prefix
+
+    db.session.execute(
+        db.update(Task),
+        [
+            {"id": task_id, "path": path, "depth": path_depth(path)}
+            for task_id, path in paths.items()
+        ],
+    )
+    db.session.commit()
+    return len(paths)
@@ -0,0 +1,312 @@
+# instrumentation.py
+
+import bisect
+import json
+import logging
+import sys
+import threading
+import time
+from flask import Blueprint, current_app, g, has_app_context, jsonify, request
+from flask_login import login_required
+from sqlalchemy import event
+from traversal import DeepJSONProvider
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets; the last bucket is unbounded
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250, 1000)
+SIZE_BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Attributes of LogRecord itself; anything else was passed through 'extra'
+RESERVED_LOG_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message"}
+
+
+class JSONLogFormatter(logging.Formatter):
+    """
+    Format log records as one JSON object per line, including fields passed through 'extra'.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_LOG_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class Histogram:
+    """
+    Histogram with fixed bucket bounds, plus a running count and sum.
+
+    Attributes:
+        bounds (tuple): Upper bounds (inclusive) of the buckets.
+        counts (list): Observations per bucket; the extra last bucket holds larger values.
+        count (int): Total number of observations.
+        total (float): Sum of all observed values.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def to_dict(self):
+        buckets = [{"le": bound, "count": count} for bound, count in zip(self.bounds, self.counts)]
+        buckets.append({"le": None, "count": self.counts[-1]})
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "mean": round(self.total / self.count, 3) if self.count else None,
+            "buckets": buckets,
+        }
+
+
+class RequestMetrics:
+    """
+    Thread-safe per-endpoint histograms of latency, DB time, query count and response size.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, duration_ms, db_ms, serialize_ms, query_count, response_size):
+        with self._lock:
+            histograms = self._endpoints.get(endpoint)
+            if histograms is None:
+                histograms = self._endpoints[endpoint] = {
+                    "duration_ms": Histogram(LATENCY_BUCKETS_MS),
+                    "db_ms": Histogram(LATENCY_BUCKETS_MS),
+                    "serialize_ms": Histogram(LATENCY_BUCKETS_MS),
+                    "query_count": Histogram(QUERY_COUNT_BUCKETS),
+                    "response_bytes": Histogram(SIZE_BUCKETS_BYTES),
+                }
+            histograms["duration_ms"].observe(duration_ms)
+            histograms["db_ms"].observe(db_ms)
+            histograms["serialize_ms"].observe(serialize_ms)
+            histograms["query_count"].observe(query_count)
+            if response_size is not None:
+                histograms["response_bytes"].observe(response_size)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                endpoint: {name: histogram.to_dict() for name, histogram in histograms.items()}
+                for endpoint, histograms in self._endpoints.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+# Shared by every app in the process
+request_metrics = RequestMetrics()
+
+# Callbacks receiving (statement, parameters, executemany) for every executed statement,
+# e.g. the query-plan tests
+statement_observers = []
+
+# Extra sections of the metrics endpoint, e.g. cache statistics, keyed by name
+metrics_sources = {}
+
+
+def register_metrics_source(name, collect):
+    """
+    Add a section to the metrics endpoint.
+
+    Args:
+        name (str): The key of the section in the metrics response.
+        collect (callable): Returns the section's JSON-serializable content.
+    """
+    metrics_sources[name] = collect
+
+
+class TimedJSONProvider(DeepJSONProvider):
+    """
+    JSON provider that adds the time spent encoding responses to the current request's stats.
+    """
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().dumps(obj, **kwargs)
+        finally:
+            add_serialize_time(time.perf_counter() - started)
+
+
+def add_serialize_time(seconds):
+    """
+    Add serialization time to the current request's stats, if any.
+
+    Args:
+        seconds (float): Time spent serializing.
+    """
+    stats = g.get("request_stats") if has_app_context() else None
+    if stats is not None:
+        stats["serialize_seconds"] += seconds
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Remember when a statement started, on the connection executing it.
+    """
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """
+    Add a finished statement to the current request's query count and DB time.
+    """
+    started = conn.info["query_started"].pop()
+    for observer in statement_observers:
+        observer(statement, parameters, executemany)
+    stats = g.get("request_stats") if has_app_context() else None
+    if stats is not None:
+        stats["query_count"] += 1
+        stats["db_seconds"] += time.perf_counter() - started
+
+
+def handle_error(exception_context):
+    """
+    Forget the start time of a statement that failed, which after_cursor_execute never sees.
+    """
+    connection = exception_context.connection
+    # Errors raised before a statement reached the cursor have no execution context
+    if exception_context.execution_context is not None and connection is not None:
+        started = connection.info.get("query_started")
+        if started:
+            started.pop()
+
+
+def start_request_timer():
+    """
+    Start collecting stats for the current request.
+    """
+    g.request_stats = {
+        "started": time.perf_counter(),
+        "query_count": 0,
+        "db_seconds": 0.0,
+        "serialize_seconds": 0.0,
+    }
+
+
+def record_request(response):
+    """
+    Attach Server-Timing headers to the response and record the request's metrics.
+    """
+    stats = g.get("request_stats")
+    if stats is None:
+        return response
+
+    duration_ms = (time.perf_counter() - stats["started"]) * 1000
+    db_ms = stats["db_seconds"] * 1000
+    serialize_ms = stats["serialize_seconds"] * 1000
+    response_size = None if response.is_streamed else response.calculate_content_length()
+
+    response.headers["Server-Timing"] = (
+        f'db;dur={db_ms:.2f};desc="{stats["query_count"]} queries", '
+        f"serialize;dur={serialize_ms:.2f}, "
+        f"total;dur={duration_ms:.2f}"
+    )
+
+    request_metrics.record(
+        request.endpoint or "unmatched",
+        duration_ms,
+        db_ms,
+        serialize_ms,
+        stats["query_count"],
+        response_size,
+    )
+
+    fields = {
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "duration_ms": round(duration_ms, 2),
+        "db_ms": round(db_ms, 2),
+        "query_count": stats["query_count"],
+        "response_bytes": response_size,
+    }
+    if duration_ms >= current_app.config["SLOW_REQUEST_MS"]:
+        logger.warning("Slow request", extra=fields)
+    else:
+        logger.debug("Request", extra=fields)
+
+    return response
+
+
+def configure_logging(level):
+    """
+    Route application logs to stderr as one JSON object per line.
+
+    Handlers installed by the host (gunicorn, a test runner, an embedding app) are kept;
+    the JSON handler and level are only applied when the root logger has none.
+
+    Args:
+        level (str): The minimum log level, e.g. 'INFO'.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(JSONLogFormatter())
+    root.addHandler(handler)
+    root.setLevel(level)
+
+
+def init_instrumentation(app):
+    """
+    Hook SQL and request timing into an app and expose the collected metrics.
+
+    Args:
+        app (Flask): The application to instrument; its engine must already exist.
+    """
+    from db_init import db
+
+    app.json = TimedJSONProvider(app)
+    app.before_request(start_request_timer)
+    app.after_request(record_request)
+
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(db.engine, "after_cursor_execute", after_cursor_execute)
+        event.listen(db.engine, "handle_error", handle_error)
+
+    if app.config["METRICS_ENABLED"]:
+        app.register_blueprint(metrics_bp, url_prefix="/api")
+
+
+# Blueprint for the in-process metrics endpoint
+metrics_bp = Blueprint("metrics", __name__)
+
+
+@metrics_bp.route("/metrics", methods=["GET"])
+@login_required
+def get_metrics():
+    """
+    Retrieve the request metrics collected by this process, for authenticated users only.
+
+    Returns:
+        JSON response with per-endpoint histograms of total time, DB time,
+        serialization time, query count and response size, plus any registered
+        sections such as cache statistics, with HTTP status 200.
+    """
+    metrics = {name: collect() for name, collect in metrics_sources.items()}
+    metrics["endpoints"] = request_metrics.snapshot()
+    return jsonify(metrics), 200
@@ -0,0 +1,260 @@
+# json_stream.py
+
+import json
+from itertools import groupby
+from operator import attrgetter
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from db_init import db
+from models import Task
+from tree import TASK_COLUMNS, list_summary_query
+
+# Rows fetched from the database cursor per round trip while streaming
+STREAM_BATCH_SIZE = 1000
+
+# Encoded characters buffered before a chunk is handed to the server
+CHUNK_SIZE = 64 * 1024
+
+# Digits of each zero-padded number in a tree-order sort key; positions and IDs are
+# 32-bit integers, so one level adds 20 characters
+SORT_KEY_WIDTH = 10
+
+# Dialects whose recursive CTEs can build the sort keys; elsewhere trees are not streamed
+STREAMING_DIALECTS = ("sqlite", "postgresql")
+
+
+def encode(value):
+    """
+    Encode a value the way the app's JSON provider does (compact, sorted keys).
+    """
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+class sort_key_segment(FunctionElement):
+    """
+    One tree level's (position, id) pair as a fixed-width string that sorts like the pair.
+    """
+
+    type = db.String()
+    name = "sort_key_segment"
+    inherit_cache = True
+
+
+@compiles(sort_key_segment)
+def compile_sort_key_segment(element, compiler, **kw):
+    position, task_id = element.clauses
+    padded = [db.func.lpad(db.cast(value, db.Text), SORT_KEY_WIDTH, "0") for value in (position, task_id)]
+    return compiler.process(db.func.concat(*padded), **kw)
+
+
+@compiles(sort_key_segment, "sqlite")
+def compile_sort_key_segment_sqlite(element, compiler, **kw):
+    # SQLite has no lpad
+    position, task_id = element.clauses
+    number = f"%0{SORT_KEY_WIDTH}d"
+    return compiler.process(db.func.printf(number + number, position, task_id), **kw)
+
+
+def supports_streaming():
+    """
+    Check whether the database can order task trees for streaming (see tree_order_query).
+    """
+    return db.engine.dialect.name in STREAMING_DIALECTS
+
+
+def tree_order_query(list_ids):
+    """
+    Build the query selecting the tasks of the given lists in depth-first tree order.
+
+    A recursive CTE builds each task's sort key from the zero-padded (position, id)
+    pairs of its ancestors and itself, which lists every task right after its parent
+    and before its parent's next sibling, so the tree can be written out as rows
+    arrive. The sort happens in the database, not in the worker's memory.
+
+    Args:
+        list_ids (list): IDs of the lists whose tasks should be loaded.
+
+    Returns:
+        Select: A statement over TASK_COLUMNS, ordered by list ID and sort key.
+    """
+    ordered = (
+        db.select(Task.id, Task.list_id, sort_key_segment(Task.position, Task.id).label("sort_key"))
+        .where(Task.list_id.in_(list_ids), Task.parent_id.is_(None))
+        .cte("ordered", recursive=True)
+    )
+    child = db.aliased(Task)
+    ordered = ordered.union_all(
+        db.select(child.id, child.list_id, ordered.c.sort_key + sort_key_segment(child.position, child.id))
+        # Subtasks filed under another list are skipped, as in tree.build_task_tree
+        .join(ordered, db.and_(child.parent_id == ordered.c.id, child.list_id == ordered.c.list_id))
+    )
+    return (
+        db.select(*TASK_COLUMNS)
+        .join(ordered, Task.id == ordered.c.id)
+        .order_by(ordered.c.list_id, ordered.c.sort_key)
+    )
+
+
+def stream_rows(statement):
+    """
+    Execute a statement, fetching its rows from the cursor in batches.
+
+    Args:
+        statement: The SQLAlchemy statement.
+
+    Returns:
+        Result: An iterator over the rows that never holds more than one batch.
+    """
+    return db.session.execute(statement, execution_options={"yield_per": STREAM_BATCH_SIZE})
+
+
+def iter_task_tree_json(rows):
+    """
+    Encode task rows in tree order as the items of a nested 'tasks' array.
+
+    Only the chain of currently open ancestors is kept in memory. As in
+    tree.build_task_tree, tasks whose parent is not part of the rows are skipped
+    along with their subtasks.
+
+    Args:
+        rows (iterable): Task rows of one list, in tree order.
+
+    Yields:
+        str: JSON fragments; joined, they form the array's contents without brackets.
+    """
+    open_ids = []  # IDs of the tasks whose 'subtasks' array is still open
+    open_set = set()  # The same IDs, for constant-time membership checks on deep chains
+    need_comma = False
+
+    for row in rows:
+        if row.parent_id is not None and row.parent_id not in open_set:
+            continue
+
+        # Close the subtasks of everything below this task's parent
+        while open_ids and open_ids[-1] != row.parent_id:
+            open_set.discard(open_ids.pop())
+            yield "]}"
+            need_comma = True
+
+        node = encode({
+            "id": row.id,
+            "name": row.name,
+            "parent_id": row.parent_id,
+            "list_id": row.list_id,
+            "depth": row.depth,
+            "completed": row.completed,
+            "position": row.position,
+            "descendant_count": row.descendant_count,
+            "completed_descendant_count": row.completed_descendant_count,
+        })
+        # 'subtasks' sorts last, so it is appended after the other keys
+        yield ("," if need_comma else "") + node[:-1] + ',"subtasks":['
+        open_ids.append(row.id)
+        open_set.add(row.id)
+        need_comma = False
+
+    yield "]}" * len(open_ids)
+
+
+def chunked(fragments):
+    """
+    Join small JSON fragments into chunks of about CHUNK_SIZE encoded bytes.
+
+    Args:
+        fragments (iterable): The JSON fragments.
+
+    Yields:
+        bytes: The encoded chunks.
+    """
+    buffer = []
+    size = 0
+    for fragment in fragments:
+        buffer.append(fragment)
+        size += len(fragment)
+        if size >= CHUNK_SIZE:
+            yield "".join(buffer).encode()
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode()
+
+
+def stream_task_list(list_id, message):
+    """
+    Stream the GetTasks payload of a list.
+
+    Args:
+        list_id (int): The ID of the list.
+        message (str): The payload's success message.
+
+    Yields:
+        bytes: Chunks of the JSON document {"message": ..., "tasks": [...]}.
+    """
+    yield from chunked(_task_list_fragments(list_id, message))
+
+
+def _task_list_fragments(list_id, message):
+    yield '{"message":' + encode(message) + ',"tasks":['
+    yield from iter_task_tree_json(stream_rows(tree_order_query([list_id])))
+    yield "]}\n"
+
+
+def stream_list_summaries(user_id, message, include_tasks=False):
+    """
+    Stream the GetLists payload of a user.
+
+    Args:
+        user_id (int): The ID of the user whose lists should be summarized.
+        message (str): The payload's success message.
+        include_tasks (bool): Whether to embed each list's task tree.
+
+    Yields:
+        bytes: Chunks of the JSON document {"lists": [...], "message": ...}.
+    """
+    yield from chunked(_list_summary_fragments(user_id, message, include_tasks))
+
+
+def _list_summary_fragments(user_id, message, include_tasks):
+    # The summaries are one small row per list; only the tasks are worth streaming
+    summaries = db.session.execute(list_summary_query(user_id)).all()
+    groups = None
+    if include_tasks and summaries:
+        rows = stream_rows(tree_order_query([summary.id for summary in summaries]))
+        groups = groupby(rows, key=attrgetter("list_id"))
+    group = next(groups, None) if groups else None
+
+    yield '{"lists":['
+    for index, summary in enumerate(summaries):
+        node = encode({
+            "id": summary.id,
+            "name": summary.name,
+            "task_count": summary.task_count,
+            "completed_count": summary.completed_count,
+            "max_depth": summary.max_depth,
+        })
+        prefix = "," if index else ""
+        if not include_tasks:
+            yield prefix + node
+            continue
+
+        # 'tasks' sorts last, so it is appended after the other keys
+        yield prefix + node[:-1] + ',"tasks":['
+        if group is not None and group[0] == summary.id:
+            yield from iter_task_tree_json(group[1])
+            group = next(groups, None)
+        yield "]}"
+    yield '],"message":' + encode(message) + "}\n"
+
+
+def wants_stream(args):
+    """
+    Check whether a request's query string asked for a streamed response (?stream=true).
+
+    Args:
+        args: The request's query arguments.
+
+    Returns:
+        bool: True for '1', 'true' or 'yes' (case-insensitive), on databases that support
+            streaming; other databases answer with the same document, built in memory.
+    """
+    return args.get("stream", "").strip().lower() in ("1", "true", "yes") and supports_streaming()
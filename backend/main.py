@@ -1,9 +1,24 @@
 # main.py
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request, stream_with_context
 from models import List
 from db_init import db
+from tree import load_list_summaries, wants_tasks
+from hierarchy import delete_list_tasks
+from json_stream import stream_list_summaries, wants_stream
+from columnar import VARIANTS, columnar_response, load_list_columns, negotiate, representation_etag, vary_on_accept
+from changes import (
+    is_not_modified,
+    not_modified_response,
+    record_deletions,
+    record_list_change,
+    user_lists_version,
+    with_etag,
+)
 from flask_login import current_user, login_required
+import logging
+
+logger = logging.getLogger(__name__)
 
 # Initialize the Blueprint for main application routes related to Lists
 main = Blueprint("main", __name__)
@@ -14,8 +29,15 @@ def get_lists():
     """
     Retrieve all to-do lists associated with the currently authenticated user.
 
+    Each list is returned with its task count, completed count and maximum depth.
+    Pass '?include=tasks' to also embed the full task tree of every list, and '?stream=true'
+    to write the response incrementally as task rows are read, keeping memory flat for large lists.
+    Clients sending 'Accept: application/vnd.taskmanager.columnar+json' (or '+msgpack') get the
+    lists, and any embedded trees, as parallel arrays instead; those responses are never streamed.
+
     Returns:
-        JSON response containing a success message and a list of the user's to-do lists with HTTP status 200.
+        JSON response containing a success message and a list of the user's to-do lists with HTTP status 200,
+        carrying an ETag. If the client's copy is current, returns HTTP status 304.
         If an error occurs, returns an error message with HTTP status 400.
     """
     success_message = "Successfully retrieved user's lists from the database."
@@ -25,15 +47,38 @@ def get_lists():
     user_id = current_user.id
 
     try:
-        # Query all lists belonging to the current user
-        lists = List.query.filter_by(user_id=user_id).all()
-        print(f"Lists for user {user_id}: {lists}")
+        # Answer conditional requests from the lists version alone
+        mimetype = negotiate(request)
+        etag = representation_etag(f"lists-{user_id}-{user_lists_version(user_id)}", mimetype)
+        if is_not_modified(etag):
+            return vary_on_accept(not_modified_response(etag))
+
+        if mimetype in VARIANTS:
+            lists = load_list_columns(user_id, include_tasks=wants_tasks(request.args))
+            response = columnar_response({"message": success_message, "lists": lists}, mimetype)
+            return with_etag(response, etag), success_status
+
+        if wants_stream(request.args):
+            body = stream_with_context(
+                stream_list_summaries(user_id, success_message, include_tasks=wants_tasks(request.args))
+            )
+            response = current_app.response_class(body, mimetype="application/json")
+            return with_etag(vary_on_accept(response), etag), success_status
+
+        # Summarize all lists belonging to the current user
+        lists = load_list_summaries(user_id, include_tasks=wants_tasks(request.args))
+        logger.debug("Retrieved lists", extra={"user_id": user_id, "list_count": len(lists)})
         return (
-            jsonify(
-                {
-                    "message": success_message,
-                    "lists": [lst.to_dict() for lst in lists],
-                }
+            with_etag(
+                vary_on_accept(
+                    jsonify(
+                        {
+                            "message": success_message,
+                            "lists": lists,
+                        }
+                    )
+                ),
+                etag,
             ),
             success_status,
         )
@@ -67,6 +112,8 @@ def add_list():
 
         # Add and commit the new list to the database
         db.session.add(new_list)
+        new_list.change_seq = record_list_change(current_user.id, [])
+        new_list.version = new_list.change_seq
         db.session.commit()
         return jsonify({"message": "List added successfully!"}), 200
     except Exception as e:
@@ -94,7 +141,10 @@ def delete_list(list_id):
         if not list_to_delete:
             return jsonify({"message": "List not found!"}), 404
 
-        # Delete the list from the database
+        # Delete the list and its tasks from the database, leaving a tombstone for delta sync
+        change_seq = record_list_change(current_user.id, [list_id])
+        record_deletions(current_user.id, change_seq, "list", [list_id], list_id)
+        delete_list_tasks(list_id)
         db.session.delete(list_to_delete)
         db.session.commit()
         return jsonify({"message": "List deleted successfully!"}), 200
@@ -134,6 +184,7 @@ def edit_list(list_id):
 
         # Update the list's name
         list_to_edit.name = new_name
+        list_to_edit.change_seq = record_list_change(current_user.id, [list_id])
 
         # Commit the changes to the database
         db.session.commit()
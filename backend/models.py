@@ -2,6 +2,7 @@
 
 from db_init import db
 from flask_login import UserMixin
+from traversal import build_nested
 
 class User(UserMixin, db.Model):
     """
@@ -13,6 +14,10 @@ class User(UserMixin, db.Model):
         email (str): Unique email address for the user.
         name (str): Full name of the user.
         password_hash (str): Hashed password for authentication.
+        lists_version (int): Counter bumped whenever any of the user's lists or their tasks change;
+            it doubles as the user's change sequence for delta sync.
+        tombstones_pruned_seq (int): Change sequence up to which the user's tombstones were discarded;
+            delta sync from an older cursor must start over.
         lists (List): Relationship to the user's to-do lists.
     """
     __tablename__ = 'user'
@@ -22,6 +27,8 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(50), unique=True, nullable=False)
     name = db.Column(db.String(100), nullable=False)  # New field for user's full name
     password_hash = db.Column(db.String(128), nullable=False)
+    lists_version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    tombstones_pruned_seq = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     # Relationship to to-do lists
     lists = db.relationship("List", backref="user", lazy=True)
@@ -53,16 +60,31 @@ class List(db.Model):
         id (int): Primary key.
         name (str): Name of the list.
         user_id (int): Foreign key linking to the User who owns the list.
+        version (int): Counter bumped whenever the list or any of its tasks change.
+        change_seq (int): The owner's change sequence at the list's last modification.
+        task_count (int): Number of tasks in the list, maintained incrementally.
+        completed_count (int): Number of completed tasks in the list, maintained incrementally.
         tasks (Task): Relationship to tasks within the list.
     """
     __tablename__ = 'list'
+    __table_args__ = (
+        # Every list route filters on the owner, usually together with the list ID
+        db.Index("ix_list_user_id_id", "user_id", "id"),
+        # Delta sync selects a user's lists changed after a cursor
+        db.Index("ix_list_user_id_change_seq", "user_id", "change_seq"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    task_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    completed_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
-    # Relationship to tasks
-    tasks = db.relationship("Task", backref="list", lazy=True, cascade="all, delete-orphan")
+    # Relationship to tasks; deleting a list removes them with one DELETE
+    # (hierarchy.delete_list_tasks) instead of loading each one
+    tasks = db.relationship("Task", backref="list", lazy=True, cascade="all, delete-orphan", passive_deletes=True)
 
     def __repr__(self):
         return f"List('{self.name}', User ID: '{self.user_id}')"
@@ -77,6 +99,8 @@ class List(db.Model):
         return {
             "id": self.id,
             "name": self.name,
+            "task_count": self.task_count,
+            "completed_count": self.completed_count,
             "tasks": [task.to_dict() for task in self.tasks],
         }
 
@@ -90,59 +114,132 @@ class Task(db.Model):
         name (str): Name of the task.
         parent_id (int): Foreign key linking to the parent task, if any.
         list_id (int): Foreign key linking to the List the task belongs to.
-        depth (int): Depth level of the task in the hierarchy (0 to 3).
+        depth (int): Depth level of the task in the hierarchy (0 for top-level tasks).
+        path (str): Materialized path of zero-padded ancestor IDs ending with the task's own ID.
         completed (bool): Status indicating if the task is completed.
+        change_seq (int): The owner's change sequence at the task's last modification.
+        position (int): Sort key among the task's siblings; gaps leave room for reordering.
+        descendant_count (int): Number of tasks below this one, maintained incrementally.
+        completed_descendant_count (int): Number of completed tasks below this one, maintained incrementally.
         subtasks (Task): Relationship to subtasks.
     """
     __tablename__ = 'task'
+    __table_args__ = (
+        # Tree loads filter by list; sibling pages, neighbour lookups and appends
+        # (parent_id=None for top-level tasks) walk siblings in position order
+        db.Index("ix_task_list_id_parent_id_position", "list_id", "parent_id", "position"),
+        # Subtask relationship loads and cascades look children up by parent
+        db.Index("ix_task_parent_id", "parent_id"),
+        # Delta sync selects a list's tasks changed after a cursor
+        db.Index("ix_task_list_id_change_seq", "list_id", "change_seq"),
+        # List summaries read a list's deepest level from the end of this index
+        db.Index("ix_task_list_id_depth", "list_id", "depth"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
     parent_id = db.Column(db.Integer, db.ForeignKey("task.id"), nullable=True)
     list_id = db.Column(db.Integer, db.ForeignKey("list.id"), nullable=True)
     depth = db.Column(db.Integer, nullable=False, default=0)
+    path = db.Column(db.Text, nullable=True, index=True)
     completed = db.Column(db.Boolean, nullable=False, default=False)
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    position = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    descendant_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    completed_descendant_count = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
-    # Relationship to subtasks
+    # Relationship to subtasks; deleting a task removes its subtree with one DELETE
+    # (hierarchy.delete_subtree) instead of loading each descendant
     subtasks = db.relationship(
         "Task",
         backref=db.backref("parent", remote_side=[id]),
         cascade="all, delete, delete-orphan",
+        passive_deletes=True,
         lazy=True
     )
 
     def calculate_depth(self):
         """
-        Calculate the depth of the task in the hierarchy, ensuring it does not exceed 3.
+        Calculate the depth of the task in the hierarchy from its materialized path.
 
         Returns:
             int: The calculated depth of the task.
         """
-        def calculate_depth_recursive(task):
-            if task.parent is None:
-                return 0
-            else:
-                parent_depth = calculate_depth_recursive(task.parent)
-                return parent_depth + 1 if parent_depth < 3 else 3
-
-        if self.parent_id is not None:
-            return calculate_depth_recursive(self)
-        else:
+        if self.path is None:
             return 0
+        # Every path segment ends with a separator, one per level
+        return self.path.count("/") - 1
 
     def to_dict(self):
         """
         Serialize the Task object to a dictionary.
 
+        The subtree is walked with an explicit stack, so any depth can be serialized.
+
         Returns:
             dict: A dictionary containing task details, including subtasks.
         """
-        return {
-            "id": self.id,
-            "name": self.name,
-            "parent_id": self.parent_id,
-            "list_id": self.list_id,
-            "depth": self.depth,
-            "completed": self.completed,
-            "subtasks": [subtask.to_dict() for subtask in self.subtasks],
-        }
+        return build_nested(
+            self,
+            lambda task: sorted(task.subtasks, key=lambda subtask: (subtask.position, subtask.id)),
+            lambda task: {
+                "id": task.id,
+                "name": task.name,
+                "parent_id": task.parent_id,
+                "list_id": task.list_id,
+                "depth": task.depth,
+                "completed": task.completed,
+                "position": task.position,
+                "descendant_count": task.descendant_count,
+                "completed_descendant_count": task.completed_descendant_count,
+            },
+        )
+
+
+class Tombstone(db.Model):
+    """
+    Tombstone model recording a deleted task or list for delta sync.
+
+    Attributes:
+        id (int): Primary key.
+        user_id (int): The ID of the user who owned the deleted entity.
+        entity (str): Kind of the deleted entity, 'task' or 'list'.
+        entity_id (int): The ID of the deleted task or list.
+        list_id (int): The list the deleted task belonged to (the list itself for lists).
+        change_seq (int): The owner's change sequence at the deletion.
+    """
+    __tablename__ = 'tombstone'
+    __table_args__ = (
+        db.Index("ix_tombstone_user_id_change_seq", "user_id", "change_seq"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    list_id = db.Column(db.Integer, nullable=True)
+    change_seq = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"Tombstone('{self.entity}', ID: '{self.entity_id}', Seq: '{self.change_seq}')"
+
+
+class RevokedToken(db.Model):
+    """
+    RevokedToken model recording an access token revoked before its expiry.
+
+    Rows are shared by every worker process and deleted once the token would have expired.
+
+    Attributes:
+        token_id (str): The revoked token's unique ID (primary key).
+        user_id (int): The ID of the user the token was issued to.
+        expires_at (float): UNIX time at which the token expires.
+    """
+    __tablename__ = 'revoked_token'
+
+    token_id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    expires_at = db.Column(db.Float, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"RevokedToken('{self.token_id}', User: '{self.user_id}')"
@@ -0,0 +1,131 @@
+# passwords.py
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HasherBusy(Exception):
+    """
+    Raised when every hashing slot is taken, so the request can be answered with 503.
+    """
+
+
+class PasswordHasher:
+    """
+    Bounded worker pool for password hashing and verification.
+
+    Hashing is deliberately CPU-heavy. Running it on a few dedicated threads (hashlib
+    releases the GIL while it works) caps how many cores a burst of logins can occupy,
+    and requests beyond max_pending fail fast with HasherBusy instead of queuing
+    behind each other until every web worker is stuck.
+
+    Attributes:
+        method (str): Werkzeug hash method and cost parameters, e.g. 'scrypt:32768:8:1'
+            or 'pbkdf2:sha256:600000'.
+        workers (int): Hashes computed concurrently.
+        max_pending (int): Hashes running or waiting before new ones are rejected.
+    """
+
+    def __init__(self, method="scrypt", workers=2, max_pending=32):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._counters = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0}
+        self.configure(method, workers, max_pending)
+
+    def configure(self, method, workers, max_pending):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self.method = method
+            self.workers = workers
+            self.max_pending = max_pending
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hasher")
+            self._slots = threading.BoundedSemaphore(max_pending)
+            # Werkzeug fills in default cost parameters ('scrypt' stands for 'scrypt:32768:8:1'
+            # and so on), so read them off a sample hash once, at startup
+            self._method_prefix = generate_password_hash("", method).split("$", 1)[0]
+
+    def _run(self, counter, function, *args):
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            with self._lock:
+                self._counters["rejected"] += 1
+            raise HasherBusy("Too many password checks in progress, try again shortly.")
+        try:
+            result = self._executor.submit(function, *args).result()
+        finally:
+            slots.release()
+        with self._lock:
+            self._counters[counter] += 1
+        return result
+
+    def hash(self, password):
+        """
+        Hash a password with the configured method on the worker pool.
+
+        Args:
+            password (str): The plain-text password.
+
+        Returns:
+            str: The salted hash.
+
+        Raises:
+            HasherBusy: If max_pending hashes are already in progress.
+        """
+        return self._run("hashed", generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        """
+        Check a password against a stored hash on the worker pool.
+
+        Args:
+            password_hash (str): The stored hash, in any method Werkzeug understands.
+            password (str): The plain-text password.
+
+        Returns:
+            bool: Whether the password matches.
+
+        Raises:
+            HasherBusy: If max_pending hashes are already in progress.
+        """
+        return self._run("verified", check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """
+        Check whether a stored hash was made with other parameters than the configured ones.
+
+        Args:
+            password_hash (str): The stored hash.
+
+        Returns:
+            bool: True if the hash's method or cost parameters differ.
+        """
+        return password_hash.split("$", 1)[0] != self._method_prefix
+
+    def rehash(self, password):
+        """
+        Hash a password that was just verified, upgrading its stored hash.
+
+        Args:
+            password (str): The plain-text password.
+
+        Returns:
+            str: The hash made with the configured method.
+
+        Raises:
+            HasherBusy: If max_pending hashes are already in progress.
+        """
+        return self._run("rehashed", generate_password_hash, password, self.method)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats["method"] = self.method
+            stats["workers"] = self.workers
+            stats["max_pending"] = self.max_pending
+            return stats
+
+
+# Shared by the signup and login routes
+password_hasher = PasswordHasher()
@@ -0,0 +1,177 @@
+# rollups.py
+
+from collections import defaultdict
+from db_init import db
+from models import List, Task
+
+
+def adjust_rollups(list_id, ancestors, task_delta, completed_delta, change_seq=None):
+    """
+    Shift the rollup counts of a task's ancestors and of its list by the same amounts.
+
+    Called whenever tasks are added, removed, moved or (un)completed, so the counts never
+    have to be recomputed from the subtree. At most two UPDATEs are issued.
+
+    Args:
+        list_id (int): The ID of the list holding the tasks.
+        ancestors: The tasks whose descendants changed, as a query selecting their IDs
+            (see hierarchy.ancestors_query), which deep trees need, or a list of IDs.
+        task_delta (int): Change of the number of tasks.
+        completed_delta (int): Change of the number of completed tasks.
+        change_seq (int, optional): Change sequence to stamp on the ancestors, whose counts changed.
+    """
+    if not task_delta and not completed_delta:
+        return
+
+    if isinstance(ancestors, (list, tuple)) and not ancestors:
+        ancestors = None
+    if ancestors is not None:
+        values = {
+            "descendant_count": Task.descendant_count + task_delta,
+            "completed_descendant_count": Task.completed_descendant_count + completed_delta,
+        }
+        if change_seq is not None:
+            values["change_seq"] = change_seq
+        db.session.execute(
+            db.update(Task)
+            .where(Task.id.in_(ancestors))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+    db.session.execute(
+        db.update(List)
+        .where(List.id == list_id)
+        .values(
+            task_count=List.task_count + task_delta,
+            completed_count=List.completed_count + completed_delta,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def apply_rollup_deltas(task_deltas, list_deltas, change_seq=None):
+    """
+    Add precomputed rollup deltas to many tasks and lists, one executemany UPDATE per table.
+
+    Args:
+        task_deltas (dict): Mapping of task ID to a (task_delta, completed_delta) pair.
+        list_deltas (dict): Mapping of list ID to a (task_delta, completed_delta) pair.
+        change_seq (int, optional): Change sequence to stamp on the updated tasks.
+    """
+    if task_deltas:
+        values = {
+            "descendant_count": Task.descendant_count + db.bindparam("task_delta"),
+            "completed_descendant_count": Task.completed_descendant_count + db.bindparam("completed_delta"),
+        }
+        if change_seq is not None:
+            values["change_seq"] = change_seq
+        db.session.connection().execute(
+            db.update(Task).where(Task.id == db.bindparam("task_id")).values(**values),
+            [
+                {"task_id": task_id, "task_delta": delta[0], "completed_delta": delta[1]}
+                for task_id, delta in task_deltas.items()
+            ],
+        )
+
+    if list_deltas:
+        db.session.connection().execute(
+            db.update(List)
+            .where(List.id == db.bindparam("list_id"))
+            .values(
+                task_count=List.task_count + db.bindparam("task_delta"),
+                completed_count=List.completed_count + db.bindparam("completed_delta"),
+            ),
+            [
+                {"list_id": list_id, "task_delta": delta[0], "completed_delta": delta[1]}
+                for list_id, delta in list_deltas.items()
+            ],
+        )
+
+
+def check_rollups(repair=False):
+    """
+    Recompute every rollup count in bulk and report (or repair) the ones that drifted.
+
+    Tasks are read once, deepest first, so each task's totals are complete before they
+    are added to its parent's. Drifted rows are written back with one executemany
+    UPDATE per table. Requires an app context.
+
+    Args:
+        repair (bool): Whether to write the recomputed counts back.
+
+    Returns:
+        dict: Numbers of checked and drifted tasks and lists.
+    """
+    rows = db.session.execute(
+        db.select(
+            Task.id,
+            Task.parent_id,
+            Task.list_id,
+            Task.completed,
+            Task.descendant_count,
+            Task.completed_descendant_count,
+        ).order_by(Task.depth.desc())
+    ).all()
+
+    # [descendants, completed descendants] per task, and [tasks, completed] per list
+    totals = defaultdict(lambda: [0, 0])
+    list_totals = defaultdict(lambda: [0, 0])
+    drifted_tasks = []
+
+    for row in rows:
+        descendants, completed_descendants = totals[row.id]
+        if (descendants, completed_descendants) != (row.descendant_count, row.completed_descendant_count):
+            drifted_tasks.append({
+                "task_id": row.id,
+                "new_descendant_count": descendants,
+                "new_completed_descendant_count": completed_descendants,
+            })
+
+        if row.parent_id is not None:
+            parent_totals = totals[row.parent_id]
+            parent_totals[0] += 1 + descendants
+            parent_totals[1] += int(bool(row.completed)) + completed_descendants
+
+        list_totals[row.list_id][0] += 1
+        list_totals[row.list_id][1] += int(bool(row.completed))
+
+    drifted_lists = [
+        {
+            "list_id": row.id,
+            "new_task_count": list_totals[row.id][0],
+            "new_completed_count": list_totals[row.id][1],
+        }
+        for row in db.session.execute(db.select(List.id, List.task_count, List.completed_count))
+        if (row.task_count, row.completed_count) != tuple(list_totals[row.id])
+    ]
+
+    if repair:
+        if drifted_tasks:
+            db.session.connection().execute(
+                db.update(Task)
+                .where(Task.id == db.bindparam("task_id"))
+                .values(
+                    descendant_count=db.bindparam("new_descendant_count"),
+                    completed_descendant_count=db.bindparam("new_completed_descendant_count"),
+                ),
+                drifted_tasks,
+            )
+        if drifted_lists:
+            db.session.connection().execute(
+                db.update(List)
+                .where(List.id == db.bindparam("list_id"))
+                .values(
+                    task_count=db.bindparam("new_task_count"),
+                    completed_count=db.bindparam("new_completed_count"),
+                ),
+                drifted_lists,
+            )
+        db.session.commit()
+
+    return {
+        "tasks_checked": len(rows),
+        "tasks_drifted": len(drifted_tasks),
+        "lists_drifted": len(drifted_lists),
+        "repaired": repair,
+    }
@@ -0,0 +1,59 @@
+# schema.py
+
+from sqlalchemy.schema import CreateColumn
+from db_init import db
+from hierarchy import backfill_task_paths
+from rollups import check_rollups
+from search import ensure_search_index
+
+# Indexes replaced by wider ones, dropped from existing databases
+RETIRED_INDEXES = {
+    "task": ["ix_task_list_id_parent_id", "ix_task_list_id_path"],
+}
+
+
+def upgrade_schema():
+    """
+    Bring an existing database up to date with the models.
+
+    db.create_all() only creates missing tables, so columns and indexes added to
+    existing models are created here, followed by any data backfills they need.
+    New columns must be nullable or declare a server_default.
+    """
+    inspector = db.inspect(db.engine)
+    added_columns = set()
+
+    with db.engine.begin() as connection:
+        preparer = connection.dialect.identifier_preparer
+
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            # Add columns declared on the model but missing from the table
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_ddl = CreateColumn(column).compile(dialect=connection.dialect)
+                connection.execute(
+                    db.text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}")
+                )
+                added_columns.add((table.name, column.name))
+
+            # Create any missing indexes and drop superseded ones
+            for index in table.indexes:
+                index.create(connection, checkfirst=True)
+            existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index_name in RETIRED_INDEXES.get(table.name, []):
+                if index_name in existing_indexes:
+                    connection.execute(db.text(f"DROP INDEX {preparer.quote(index_name)}"))
+
+    backfill_task_paths()
+
+    # Rollup counts start at zero when their columns are added; compute them once
+    if ("task", "descendant_count") in added_columns or ("list", "task_count") in added_columns:
+        check_rollups(repair=True)
+
+    # The full-text index is created (and filled) once, then kept current by triggers
+    ensure_search_index()
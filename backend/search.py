@@ -0,0 +1,296 @@
+# search.py
+
+import logging
+import re
+from flask import Blueprint, jsonify, request
+from flask_login import current_user, login_required
+from db_init import db
+from models import List, Task
+from hierarchy import path_ids
+
+logger = logging.getLogger(__name__)
+
+# Results returned when the client does not choose a limit
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# One FTS5 table indexes both task and list names. Rowids encode the entity
+# (task ID * 2, list ID * 2 + 1) and 'owner' holds a 'u<user_id>' token, so per-user
+# scoping happens inside the full-text match instead of after it.
+SEARCH_TABLE = "search_index"
+TASK_ROWID = "{0}.id * 2"
+LIST_ROWID = "{0}.id * 2 + 1"
+
+search_index = db.table(SEARCH_TABLE, db.column("rowid"), db.column("name"), db.column("owner"))
+
+# Prefix indexes make 2- and 3-character prefix queries (the common typeahead case) cheap
+SEARCH_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        name, owner, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )""",
+    # Triggers keep the index in sync with every write, including set-based
+    # UPDATEs and DELETEs that bypass the ORM
+    f"""CREATE TRIGGER IF NOT EXISTS search_task_insert AFTER INSERT ON task BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, name, owner)
+        SELECT {TASK_ROWID.format("NEW")}, NEW.name, 'u' || list.user_id FROM list WHERE list.id = NEW.list_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_task_update AFTER UPDATE OF name, list_id ON task BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = {TASK_ROWID.format("OLD")};
+        INSERT INTO {SEARCH_TABLE} (rowid, name, owner)
+        SELECT {TASK_ROWID.format("NEW")}, NEW.name, 'u' || list.user_id FROM list WHERE list.id = NEW.list_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_task_delete AFTER DELETE ON task BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = {TASK_ROWID.format("OLD")};
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_list_insert AFTER INSERT ON list BEGIN
+        INSERT INTO {SEARCH_TABLE} (rowid, name, owner)
+        VALUES ({LIST_ROWID.format("NEW")}, NEW.name, 'u' || NEW.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_list_update AFTER UPDATE OF name, user_id ON list BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = {LIST_ROWID.format("OLD")};
+        INSERT INTO {SEARCH_TABLE} (rowid, name, owner)
+        VALUES ({LIST_ROWID.format("NEW")}, NEW.name, 'u' || NEW.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS search_list_delete AFTER DELETE ON list BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = {LIST_ROWID.format("OLD")};
+    END""",
+]
+
+# Words of a query; everything else (FTS5 operators included) is ignored
+QUERY_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def uses_fts():
+    """
+    Check whether the database supports the FTS5 index (SQLite) or searches fall back to LIKE.
+    """
+    return db.engine.dialect.name == "sqlite"
+
+
+def ensure_search_index():
+    """
+    Create the full-text index and its triggers if missing, filling the index when it is new.
+
+    Returns:
+        bool: True if the index was created (and filled) by this call.
+    """
+    if not uses_fts():
+        return False
+
+    inspector = db.inspect(db.engine)
+    created = not inspector.has_table(SEARCH_TABLE)
+    with db.engine.begin() as connection:
+        for statement in SEARCH_DDL:
+            connection.execute(db.text(statement))
+    if created:
+        rebuild_search_index()
+    return created
+
+
+def rebuild_search_index():
+    """
+    Refill the full-text index from the task and list tables.
+
+    Returns:
+        int: The number of indexed tasks and lists.
+    """
+    if not uses_fts():
+        return 0
+
+    with db.engine.begin() as connection:
+        connection.execute(db.text(f"DELETE FROM {SEARCH_TABLE}"))
+        tasks = connection.execute(db.text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, owner) "
+            f"SELECT {TASK_ROWID.format('task')}, task.name, 'u' || list.user_id "
+            "FROM task JOIN list ON list.id = task.list_id"
+        )).rowcount
+        lists = connection.execute(db.text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, owner) "
+            f"SELECT {LIST_ROWID.format('list')}, list.name, 'u' || list.user_id FROM list"
+        )).rowcount
+    return tasks + lists
+
+
+def match_expression(user_id, query):
+    """
+    Build the FTS5 query matching every word of a search as a prefix, within one user's names.
+
+    Args:
+        user_id (int): The ID of the searching user.
+        query (str): The user's search text.
+
+    Returns:
+        str: The MATCH expression, or None if the search has no words.
+    """
+    words = QUERY_WORD.findall(query)
+    if not words:
+        return None
+    terms = " ".join(f'"{word}"*' for word in words)
+    return f"owner : u{user_id} AND name : ({terms})"
+
+
+def fts_hits_query(user_id, query, limit):
+    """
+    Build the query selecting the best-ranked index rows for a search.
+
+    Args:
+        user_id (int): The ID of the searching user.
+        query (str): The user's search text.
+        limit (int): Maximum number of hits.
+
+    Returns:
+        Select: A statement yielding rowid and rank, best first; None if the search has no words.
+    """
+    expression = match_expression(user_id, query)
+    if expression is None:
+        return None
+    # bm25 weights: only the name column counts towards relevance
+    rank = db.func.bm25(db.literal_column(SEARCH_TABLE), 1.0, 0.0)
+    return (
+        db.select(search_index.c.rowid, rank.label("rank"))
+        .where(db.literal_column(SEARCH_TABLE).op("MATCH")(expression))
+        .order_by(rank)
+        .limit(limit)
+    )
+
+
+def like_hits(user_id, query, limit):
+    """
+    Find hits without a full-text index: names containing every word, unranked.
+
+    Returns:
+        list: (kind, id) pairs.
+    """
+    words = QUERY_WORD.findall(query)
+    if not words:
+        return []
+
+    def contains_words(column):
+        return db.and_(*(db.func.lower(column).contains(word.lower(), autoescape=True) for word in words))
+
+    lists = db.session.execute(
+        db.select(List.id).where(List.user_id == user_id, contains_words(List.name)).order_by(List.id).limit(limit)
+    ).scalars().all()
+    tasks = db.session.execute(
+        db.select(Task.id)
+        .join(List, Task.list_id == List.id)
+        .where(List.user_id == user_id, contains_words(Task.name))
+        .order_by(Task.id)
+        .limit(limit - len(lists))
+    ).scalars().all()
+    return [("list", list_id) for list_id in lists] + [("task", task_id) for task_id in tasks]
+
+
+def search_hits(user_id, query, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    Search a user's task and list names.
+
+    Task hits carry their list's name and their ancestors, read by one query from the
+    hits' materialized paths rather than by loading any tree. At most four queries are
+    issued.
+
+    Args:
+        user_id (int): The ID of the searching user.
+        query (str): The search text; every word is matched as a prefix.
+        limit (int): Maximum number of hits.
+
+    Returns:
+        list: Hit dictionaries, best-ranked first.
+    """
+    if uses_fts():
+        statement = fts_hits_query(user_id, query, limit)
+        rows = db.session.execute(statement).all() if statement is not None else []
+        hits = [("list" if row.rowid % 2 else "task", row.rowid // 2) for row in rows]
+    else:
+        hits = like_hits(user_id, query, limit)
+
+    task_ids = [entity_id for kind, entity_id in hits if kind == "task"]
+    list_ids = [entity_id for kind, entity_id in hits if kind == "list"]
+
+    tasks = {}
+    if task_ids:
+        tasks = {
+            row.id: row
+            for row in db.session.execute(
+                db.select(
+                    Task.id, Task.name, Task.list_id, Task.path, Task.depth, Task.completed,
+                    List.name.label("list_name"),
+                )
+                .join(List, Task.list_id == List.id)
+                .where(Task.id.in_(task_ids), List.user_id == user_id)
+            )
+        }
+
+    ancestor_ids = {ancestor_id for row in tasks.values() for ancestor_id in path_ids(row.path)[:-1]}
+    ancestor_names = {}
+    if ancestor_ids:
+        ancestor_names = dict(
+            db.session.execute(db.select(Task.id, Task.name).where(Task.id.in_(ancestor_ids))).all()
+        )
+
+    lists = {}
+    if list_ids:
+        lists = dict(
+            db.session.execute(
+                db.select(List.id, List.name).where(List.id.in_(list_ids), List.user_id == user_id)
+            ).all()
+        )
+
+    results = []
+    for kind, entity_id in hits:
+        if kind == "list" and entity_id in lists:
+            results.append({"type": "list", "id": entity_id, "name": lists[entity_id]})
+        elif kind == "task" and entity_id in tasks:
+            row = tasks[entity_id]
+            results.append({
+                "type": "task",
+                "id": row.id,
+                "name": row.name,
+                "list_id": row.list_id,
+                "list_name": row.list_name,
+                "depth": row.depth,
+                "completed": row.completed,
+                "ancestors": [
+                    {"id": ancestor_id, "name": ancestor_names.get(ancestor_id)}
+                    for ancestor_id in path_ids(row.path)[:-1]
+                ],
+            })
+    return results
+
+
+# Blueprint for full-text search
+search_bp = Blueprint("search", __name__)
+
+
+@search_bp.route("/search", methods=["GET"])
+@login_required
+def search():
+    """
+    Search the authenticated user's task and list names.
+
+    Query Parameters:
+        q (str): The search text; every word must match the start of a word in the name.
+        limit (int, optional): Maximum number of results (default 20, at most 100).
+
+    Returns:
+        JSON response with the ranked 'results' and HTTP status 200. Task results include
+        their list's name and their 'ancestors' from the top-level task down.
+        If q is missing or limit is invalid, returns an error message with HTTP status 400.
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "q is required."}), 400
+
+    raw_limit = request.args.get("limit", "")
+    if raw_limit and not raw_limit.isdigit():
+        return jsonify({"error": "limit must be a positive integer."}), 400
+    limit = min(int(raw_limit), MAX_SEARCH_LIMIT) if raw_limit else DEFAULT_SEARCH_LIMIT
+    if limit == 0:
+        return jsonify({"error": "limit must be a positive integer."}), 400
+
+    try:
+        results = search_hits(current_user.id, query, limit)
+        return jsonify({"results": results}), 200
+    except Exception:
+        logger.exception("Error searching")
+        return jsonify({"error": "An error occurred while searching."}), 500
@@ -1,76 +1,305 @@
 # server.py
 
-from flask import Flask, jsonify
+from flask import Flask, has_request_context, jsonify, request
 from flask_cors import CORS
 from db_init import db
-from models import User
 from main import main
 from tasks import tasks
 from auth import auth_bp
+from events import broker, events_bp
+from schema import upgrade_schema
+from rollups import check_rollups
+from instrumentation import configure_logging, init_instrumentation, register_metrics_source
+from tree_cache import configure_tree_cache, tree_cache
+from user_cache import load_cached_user, user_cache
+from passwords import password_hasher
+from tokens import READ_METHODS, denylist, load_token_user
+from search import rebuild_search_index, search_bp
 from flask_login import LoginManager
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 import os
+import click
 from dotenv import load_dotenv
 
 # Load environment variables from a .env file if present
 load_dotenv()
 
-# Initialize the Flask application
-app = Flask(__name__)
 
-# Enable Cross-Origin Resource Sharing (CORS) with support for credentials
-CORS(app, supports_credentials=True)
+def env_flag(name, default):
+    """
+    Read a boolean flag from the environment.
+
+    Args:
+        name (str): The environment variable name.
+        default (bool): The value used when the variable is unset.
+
+    Returns:
+        bool: True for '1', 'true', 'yes' or 'on' (case-insensitive).
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def default_event_connections():
+    """
+    Default cap on open event streams per process: one fewer than the worker's threads.
+
+    Under gunicorn's gthread workers each open stream holds a thread until it closes, so
+    this always leaves a thread free for the rest of the API.
+
+    Returns:
+        int: The number of concurrent event streams to accept.
+    """
+    threads = int(os.getenv("GUNICORN_THREADS", "4"))
+    return max(threads - 1, 0)
 
-# Configuration settings for SQLAlchemy and session cookies
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URI", "sqlite:///database.db")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SESSION_COOKIE_SAMESITE"] = "None"
-app.config["SESSION_COOKIE_SECURE"] = True
-app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "your_default_secret_key")  # Replace with a strong secret key
 
-# Register Blueprints for different route groups
-app.register_blueprint(main, url_prefix="/api")
-app.register_blueprint(tasks, url_prefix="/api")
-app.register_blueprint(auth_bp, url_prefix="/api")
+def default_user_cache_size():
+    """
+    Default size of the per-process user cache: off when several worker processes serve the app.
 
-# Initialize SQLAlchemy with the Flask app
-db.init_app(app)
+    Invalidation only reaches the process that changed a user, so with more than one
+    worker a deleted or changed user would stay authenticated on the others until the
+    entry expired.
 
-# Initialize Flask-Login for managing user sessions
-login_manager = LoginManager()
-login_manager.init_app(app)
+    Returns:
+        int: The number of identities to cache (0 disables the cache).
+    """
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    return 1024 if workers <= 1 else 0
 
 
-@login_manager.user_loader
-def load_user(user_id):
+def engine_options(database_uri):
     """
-    Load a user from the database by their user ID.
+    Build SQLAlchemy engine options (connection pool tuning) from the environment.
 
     Args:
-        user_id (str): The unique identifier of the user.
+        database_uri (str): The database URI the engine will connect to.
 
     Returns:
-        User: The user object if found, else None.
+        dict: Keyword arguments for SQLAlchemy's create_engine.
     """
-    return User.query.get(int(user_id))
+    options = {
+        "pool_pre_ping": env_flag("DB_POOL_PRE_PING", True),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    }
 
+    # In-memory SQLite uses a single static connection, which has no pool to size
+    url = make_url(database_uri)
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options["pool_size"] = int(os.getenv("DB_POOL_SIZE", "10"))
+        options["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", "20"))
 
-# Create all database tables before the first request
-with app.app_context():
-    db.create_all()
+    return options
 
 
-# **Add the Root Route Here**
-@app.route("/", methods=["GET"])
-def home():
+def configure_sqlite(engine, wal, busy_timeout_ms):
     """
-    Root route to confirm that the Flask app is running.
+    Apply concurrency pragmas to every new SQLite connection, and begin write requests' transactions immediately.
+
+    WAL lets readers proceed while a writer commits, and the busy timeout makes
+    concurrent writers wait for the lock instead of failing immediately. The driver
+    only opens a transaction before the first write, so what a request read before
+    that may have been changed by another worker by the time it writes; a deferred
+    BEGIN would keep those reads consistent but fail the write at once with
+    SQLITE_BUSY_SNAPSHOT instead. So the transactions of write requests begin with
+    BEGIN IMMEDIATE, waiting for the lock before reading anything. Everything else
+    (reads, CLI commands) keeps the driver's lazy transactions.
+
+    Args:
+        engine: The SQLAlchemy engine.
+        wal (bool): Whether to switch the database to write-ahead logging.
+        busy_timeout_ms (int): How long to wait for a locked database, in milliseconds.
+    """
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def begin_transaction(connection):
+        dbapi_connection = connection.connection.driver_connection
+        if has_request_context() and request.method not in READ_METHODS:
+            # Manage the transaction here rather than letting the driver open it lazily
+            dbapi_connection.isolation_level = None
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            # The driver's default: BEGIN (deferred) before the first write
+            dbapi_connection.isolation_level = ""
+
+
+def create_app(config=None):
+    """
+    Create and configure the Flask application.
+
+    Args:
+        config (dict, optional): Settings overriding those read from the environment.
 
     Returns:
-        JSON response with a confirmation message.
+        Flask: The configured application.
+    """
+    app = Flask(__name__)
+
+    # Enable Cross-Origin Resource Sharing (CORS) with support for credentials
+    CORS(app, supports_credentials=True, expose_headers=["Server-Timing"])
+
+    # Configuration settings for SQLAlchemy and session cookies
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URI", "sqlite:///database.db")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SESSION_COOKIE_SAMESITE"] = "None"
+    app.config["SESSION_COOKIE_SECURE"] = True
+    app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "your_default_secret_key")  # Replace with a strong secret key
+    app.config["USER_CACHE_SIZE"] = int(os.getenv("USER_CACHE_SIZE", str(default_user_cache_size())))
+    # Invalidation only reaches the worker process that changed the user, so the cache is
+    # off by default under several workers; when enabled there, keep the TTL short
+    app.config["USER_CACHE_TTL"] = float(os.getenv("USER_CACHE_TTL", "30"))
+    app.config["SQLITE_WAL"] = env_flag("SQLITE_WAL", True)
+    app.config["SQLITE_BUSY_TIMEOUT_MS"] = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    app.config["AUTO_UPGRADE_SCHEMA"] = env_flag("AUTO_UPGRADE_SCHEMA", True)
+    # Change sequences a user's deletion tombstones are kept for delta sync
+    app.config["TOMBSTONE_RETENTION"] = int(os.getenv("TOMBSTONE_RETENTION", "10000"))
+    app.config["LOG_LEVEL"] = os.getenv("LOG_LEVEL", "INFO").upper()
+    app.config["SLOW_REQUEST_MS"] = float(os.getenv("SLOW_REQUEST_MS", "500"))
+    app.config["METRICS_ENABLED"] = env_flag("METRICS_ENABLED", False)
+    app.config["TREE_CACHE_BACKEND"] = os.getenv("TREE_CACHE_BACKEND", "memory")
+    app.config["TREE_CACHE_MAX_BYTES"] = int(os.getenv("TREE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+    app.config["TREE_CACHE_DIR"] = os.getenv("TREE_CACHE_DIR", os.path.join(app.instance_path, "tree_cache"))
+    app.config["EVENTS_ENABLED"] = env_flag("EVENTS_ENABLED", True)
+    app.config["EVENTS_QUEUE_SIZE"] = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+    app.config["EVENTS_MAX_CONNECTIONS"] = int(
+        os.getenv("EVENTS_MAX_CONNECTIONS", str(default_event_connections()))
+    )
+    app.config["EVENTS_HEARTBEAT_SECONDS"] = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+    app.config["API_TOKENS_ENABLED"] = env_flag("API_TOKENS_ENABLED", False)
+    app.config["API_TOKEN_TTL"] = int(os.getenv("API_TOKEN_TTL", "900"))
+    app.config["PASSWORD_HASH_METHOD"] = os.getenv("PASSWORD_HASH_METHOD", "scrypt")
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    app.config["PASSWORD_HASH_MAX_PENDING"] = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+    if config:
+        app.config.update(config)
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS", engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    )
+
+    # Register Blueprints for different route groups
+    app.register_blueprint(main, url_prefix="/api")
+    app.register_blueprint(tasks, url_prefix="/api")
+    app.register_blueprint(auth_bp, url_prefix="/api")
+    app.register_blueprint(search_bp, url_prefix="/api")
+
+    # Initialize SQLAlchemy with the Flask app
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            configure_sqlite(db.engine, app.config["SQLITE_WAL"], app.config["SQLITE_BUSY_TIMEOUT_MS"])
+
+    # Structured logs, per-request SQL/timing stats and the metrics endpoint
+    configure_logging(app.config["LOG_LEVEL"])
+    init_instrumentation(app)
+
+    # Serialized task trees, invalidated by every list and task write
+    configure_tree_cache(
+        app.config["TREE_CACHE_BACKEND"], app.config["TREE_CACHE_MAX_BYTES"], app.config["TREE_CACHE_DIR"]
+    )
+    register_metrics_source("tree_cache", tree_cache.stats)
+
+    # Server-Sent Events stream of task changes, fanned out in-process
+    if app.config["EVENTS_ENABLED"]:
+        broker.configure(app.config["EVENTS_QUEUE_SIZE"], app.config["EVENTS_MAX_CONNECTIONS"])
+        app.register_blueprint(events_bp, url_prefix="/api")
+        register_metrics_source("events", broker.stats)
+
+    # Initialize Flask-Login for managing user sessions
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    user_cache.configure(app.config["USER_CACHE_SIZE"], app.config["USER_CACHE_TTL"])
+
+    # Password hashing runs on a bounded pool so login bursts cannot take every core
+    password_hasher.configure(
+        app.config["PASSWORD_HASH_METHOD"],
+        app.config["PASSWORD_HASH_WORKERS"],
+        app.config["PASSWORD_HASH_MAX_PENDING"],
+    )
+    register_metrics_source("passwords", password_hasher.stats)
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        """
+        Load a user's identity by their user ID, served from the per-process cache when possible.
+
+        Args:
+            user_id (str): The unique identifier of the user.
+
+        Returns:
+            CachedUser: The user's identity if found, else None.
+        """
+        return load_cached_user(int(user_id))
+
+    # Optional bearer tokens let API clients skip the session cookie and the user lookup
+    if app.config["API_TOKENS_ENABLED"]:
+        login_manager.request_loader(load_token_user)
+        register_metrics_source("tokens", denylist.stats)
+
+    @app.cli.command("init-db")
+    def init_db_command():
+        """
+        Create missing tables and upgrade existing ones.
+        """
+        init_db()
+        print("Database schema is up to date.")
+
+    @app.cli.command("check-rollups")
+    @click.option("--repair", is_flag=True, help="Write the recomputed counts back.")
+    def check_rollups_command(repair):
+        """
+        Recompute the task and list rollup counts and report (or repair) drift.
+        """
+        report = check_rollups(repair=repair)
+        print(
+            f"Checked {report['tasks_checked']} tasks: {report['tasks_drifted']} tasks and "
+            f"{report['lists_drifted']} lists drifted{' and were repaired' if repair else ''}."
+        )
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index_command():
+        """
+        Refill the full-text search index from the task and list tables.
+        """
+        print(f"Indexed {rebuild_search_index()} tasks and lists.")
+
+    # Create all database tables before the first request, unless a deployment does it once up front
+    if app.config["AUTO_UPGRADE_SCHEMA"]:
+        with app.app_context():
+            init_db()
+
+    @app.route("/", methods=["GET"])
+    def home():
+        """
+        Root route to confirm that the Flask app is running.
+
+        Returns:
+            JSON response with a confirmation message.
+        """
+        return jsonify({"message": "Flask app is running successfully!"}), 200
+
+    return app
+
+
+def init_db():
+    """
+    Create all database tables, then upgrade existing ones. Requires an app context.
     """
-    return jsonify({"message": "Flask app is running successfully!"}), 200
+    db.create_all()
+    upgrade_schema()
 
 
 if __name__ == "__main__":
     # Run the Flask development server
-    app.run(port=8000, debug=True)
+    create_app().run(port=int(os.getenv("PORT", "8000")), debug=True)
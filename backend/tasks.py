@@ -1,33 +1,56 @@
 #tasks.py
 
-from flask import Blueprint, jsonify, request, make_response
+import logging
+import time
+from flask import Blueprint, current_app, jsonify, request, make_response, stream_with_context
 from models import List, Task
 from db_init import db
+from batch import flatten_batch
+from changes import (
+    changes_since,
+    is_not_modified,
+    list_etag,
+    list_version,
+    not_modified_response,
+    record_deletions,
+    record_list_change,
+    with_etag,
+)
+from events import publish_on_commit, task_event_data
+from json_stream import stream_task_list, wants_stream
+from columnar import (
+    JSON_MIMETYPE,
+    VARIANTS,
+    columnar_response,
+    encode as encode_columnar,
+    load_task_columns,
+    negotiate,
+    representation_etag,
+    tree_columns,
+    vary_on_accept,
+)
+from hierarchy import (
+    ancestors_query,
+    assign_path,
+    delete_subtree,
+    insert_task_batch,
+    move_subtree,
+    next_position,
+    reorder_task,
+    set_subtree_completed,
+    subtree_ids,
+    wants_subtree,
+)
+from rollups import adjust_rollups
+from tree import load_task_page, load_task_tree, page_args, wants_page
+from tree_cache import tree_cache
 from flask_login import current_user, login_required
 
+logger = logging.getLogger(__name__)
+
 # Initialize the Blueprint for task-related routes
 tasks = Blueprint("tasks", __name__)
 
-@tasks.route("/GetLists", methods=["GET"])
-@login_required
-def get_lists():
-    """
-    Retrieve all lists for the authenticated user.
-
-    Returns:
-        JSON response with a list of lists associated with the current user.
-        HTTP status 200 on success, 500 on error.
-    """
-    try:
-        # Fetch all lists for the current user
-        lists = List.query.filter_by(user_id=current_user.id).all()
-        # Return the lists in JSON format
-        return jsonify({"lists": [list.to_dict() for list in lists]}), 200
-    except Exception as e:
-        # Log and handle exceptions
-        print(f"Error fetching lists: {e}")
-        return jsonify({"error": "Failed to fetch lists."}), 500
-
 @tasks.route("/GetTasks/<int:list_id>", methods=["GET"])
 @login_required
 def get_tasks(list_id):
@@ -38,30 +61,85 @@ def get_tasks(list_id):
     Args:
         list_id (int): The ID of the list to retrieve tasks for.
 
+    Query Parameters:
+        stream (bool, optional): Pass 'true' to write the tree incrementally as rows are read
+            instead of building it in memory; streamed trees are not cached.
+        limit (int, optional): Return one page of at most this many top-level tasks.
+        after (str, optional): Keyset cursor, the 'next_after' value of the previous page.
+        depth (int, optional): Subtask levels expanded below each top-level task of a page;
+            tasks on the deepest level carry a 'child_count' instead of their subtasks.
+
+    Headers:
+        Accept (optional): 'application/vnd.taskmanager.columnar+json' (or '+msgpack', when
+            MessagePack is installed) returns the tree as parallel arrays instead of nested
+            objects; such responses are never streamed.
+
     Returns:
-        JSON response containing a success message and a list of tasks with HTTP status 200.
+        JSON response containing a success message and a list of tasks with HTTP status 200,
+        carrying an ETag; paged responses add the 'next_after' cursor (null on the last page).
+        If the client's copy is current, returns HTTP status 304 without loading any task.
+        If a pagination argument is invalid, returns an error message with HTTP status 400.
         If an error occurs, returns an error message with HTTP status 500.
     """
     try:
-        # Ensure the list belongs to the current user
-        task_list = List.query.filter_by(id=list_id, user_id=current_user.id).first()
-        if not task_list:
+        paged = wants_page(request.args)
+        if paged:
+            try:
+                pagination = page_args(request.args)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+
+        # Ensure the list belongs to the current user and read its version
+        version = list_version(list_id, current_user.id)
+        if version is None:
             return jsonify({"error": "List not found or unauthorized access."}), 404
 
-        # Retrieve all tasks for the specified list
-        tasks = Task.query.filter_by(list_id=list_id, parent_id=None).all()
-        success_message = "Successfully retrieved all tasks from the database."
-        success_status = 200
-
-        # Convert tasks and their subtasks to dictionaries
-        return jsonify({
-            "message": success_message,
-            "tasks": [task.to_dict() for task in tasks],
-        }), success_status
+        # Each representation (nested or columnar) has its own ETag and cache entry
+        mimetype = negotiate(request)
+        variant = VARIANTS.get(mimetype)
+        etag = representation_etag(list_etag(current_user.id, list_id, version), mimetype)
+        if is_not_modified(etag):
+            return vary_on_accept(not_modified_response(etag))
 
-    except Exception as e:
+        success_message = "Successfully retrieved all tasks from the database."
+        if paged:
+            # Load one window of top-level tasks with their first levels of subtasks
+            task_page, next_after = load_task_page(list_id, **pagination)
+            document = {"message": success_message, "tasks": task_page, "next_after": next_after}
+            if variant is not None:
+                document["tasks"] = tree_columns(task_page)
+                return with_etag(columnar_response(document, mimetype), etag), 200
+            return with_etag(vary_on_accept(jsonify(document)), etag), 200
+
+        # Serve the serialized tree from the cache when it matches the list version
+        payload = tree_cache.get(current_user.id, list_id, version, variant)
+        if payload is None and variant is not None:
+            # Lay the rows out as parallel arrays, skipping the per-task dictionaries
+            payload = encode_columnar(
+                {"message": success_message, "tasks": load_task_columns(list_id)}, mimetype
+            )
+            tree_cache.put(current_user.id, list_id, version, payload, variant)
+
+        if payload is None and wants_stream(request.args):
+            body = stream_with_context(stream_task_list(list_id, success_message))
+            response = vary_on_accept(current_app.response_class(body, mimetype=JSON_MIMETYPE))
+            return with_etag(response, etag), 200
+
+        if payload is None:
+            # Load every task of the list in one query and nest them in memory
+            task_tree = load_task_tree(list_id)
+            # Compact separators, as jsonify uses outside debug mode
+            payload = current_app.json.dumps(
+                {"message": success_message, "tasks": task_tree}, separators=(",", ":")
+            ).encode()
+            tree_cache.put(current_user.id, list_id, version, payload)
+
+        response = vary_on_accept(current_app.response_class(payload, mimetype=mimetype))
+        return with_etag(response, etag), 200
+
+    except Exception:
         # Log the exception and return an error response
-        print(str(e))
+        logger.exception("Error fetching the tasks")
         return make_response(
             jsonify({"error": "An error occurred while fetching the tasks."}),
             500,
@@ -77,21 +155,28 @@ def get_list_details(list_id):
         list_id (int): The ID of the list to retrieve details for.
 
     Returns:
-        JSON response with the list's details, including its name, with HTTP status 200.
+        JSON response with the list's details, including its name, with HTTP status 200 and an ETag.
+        If the client's copy is current, returns HTTP status 304.
         If the list is not found or access is unauthorized, returns an error message with HTTP status 404.
     """
     try:
         # Ensure the list belongs to the current user
-        task_list = List.query.filter_by(id=list_id, user_id=current_user.id).first()
+        task_list = db.session.execute(
+            db.select(List.name, List.version).where(List.id == list_id, List.user_id == current_user.id)
+        ).first()
         if not task_list:
             return jsonify({"error": "List not found or unauthorized access."}), 404
 
+        etag = list_etag(current_user.id, list_id, task_list.version)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+
         # Return the list details
-        return jsonify({"listName": task_list.name}), 200
+        return with_etag(jsonify({"listName": task_list.name}), etag), 200
 
-    except Exception as e:
+    except Exception:
         # Log the exception and return an error response
-        print(f"Error fetching list details: {e}")
+        logger.exception("Error fetching list details")
         return jsonify({"error": "An error occurred while fetching list details."}), 500
 
 @tasks.route("/AddTask/<int:list_id>", methods=["POST"])
@@ -122,16 +207,21 @@ def add_task(list_id):
         if not task_list:
             return jsonify({"error": "List not found or unauthorized access."}), 404
 
-        # Create and add the task with initial depth
-        task = Task(name=task_name, list_id=list_id, depth=0)
+        # Create the task, then derive its path from the ID assigned on flush
+        task = Task(name=task_name, list_id=list_id, depth=0, position=next_position(list_id, None))
         db.session.add(task)
+        db.session.flush()
+        assign_path(task)
+        task.change_seq = record_list_change(current_user.id, [list_id])
+        adjust_rollups(list_id, [], 1, 0)
+        publish_on_commit(current_user.id, "task_added", {"seq": task.change_seq, "task": task_event_data(task)})
         db.session.commit()
 
         return jsonify({"message": "Task added successfully!"}), 200
 
-    except Exception as e:
+    except Exception:
         # Log the error and return an error response
-        print(f"An error occurred: {e}")
+        logger.exception("Error adding the task")
         return jsonify({"error": "An error occurred while adding the task."}), 500
 
 @tasks.route("/AddSubtasks", methods=["POST"])
@@ -166,22 +256,98 @@ def add_subtask():
         subtask = Task(
             name=subtask_name,
             list_id=subtask_list_id,
-            parent_id=parent_id
+            parent_id=parent_id,
+            position=next_position(subtask_list_id, parent_id),
         )
         db.session.add(subtask)
-        db.session.commit()
-
-        # Calculate and update the depth of the subtask
-        subtask.depth = subtask.calculate_depth()
+        db.session.flush()
+
+        # Derive the subtask's path and depth from its parent
+        assign_path(subtask, parent_task)
+        subtask.change_seq = record_list_change(current_user.id, [subtask_list_id])
+        adjust_rollups(subtask_list_id, ancestors_query(subtask), 1, 0, subtask.change_seq)
+        publish_on_commit(
+            current_user.id, "task_added", {"seq": subtask.change_seq, "task": task_event_data(subtask)}
+        )
         db.session.commit()
 
         return jsonify({"message": "Subtask added successfully!"}), 200
 
-    except Exception as e:
+    except Exception:
         # Handle unexpected errors
-        print(f"An error occurred: {e}")
+        logger.exception("Error adding the subtask")
         return jsonify({"error": "An error occurred while adding the subtask."}), 500
 
+@tasks.route("/tasks:batch", methods=["POST"])
+@login_required
+def add_tasks_batch():
+    """
+    Create many tasks and subtasks for the authenticated user in one transaction.
+
+    Expects:
+        JSON payload with a 'tasks' array and an optional default 'list_id'. Tasks may be
+        nested through 'subtasks', or flat with client-side 'temp_id' and 'parent_ref'
+        fields; 'parent_id' attaches a task to an existing one.
+
+    Returns:
+        JSON response with the number of created tasks, their IDs in request order and a
+        mapping of client 'temp_id' values to IDs, with HTTP status 201.
+        If the payload is invalid, returns an error message with HTTP status 400.
+        If a list or parent task is not found, returns an error message with HTTP status 404.
+    """
+    try:
+        try:
+            specs = flatten_batch(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Validate ownership once per referenced list and existing parent task
+        list_ids = {spec["list_id"] for spec in specs if spec["list_id"] is not None}
+        owned_list_ids = set(db.session.execute(
+            db.select(List.id).where(List.id.in_(list_ids), List.user_id == current_user.id)
+        ).scalars())
+        if owned_list_ids != list_ids:
+            return jsonify({"error": "List not found or unauthorized access."}), 404
+
+        parent_ids = {spec["parent_id"] for spec in specs if spec["parent_id"] is not None}
+        parents = {
+            row.id: row
+            for row in db.session.execute(
+                db.select(Task.id, Task.list_id, Task.path)
+                .join(List)
+                .where(Task.id.in_(parent_ids), List.user_id == current_user.id)
+            )
+        }
+        if set(parents) != parent_ids:
+            return jsonify({"error": "Parent task not found or unauthorized access."}), 404
+
+        change_seq = record_list_change(current_user.id, list_ids | {parent.list_id for parent in parents.values()})
+        ids = insert_task_batch(specs, parents, change_seq)
+
+        # specs are ordered by level; report IDs in the order the tasks were sent
+        request_order = sorted(specs, key=lambda spec: spec["index"])
+        publish_on_commit(current_user.id, "tasks_added", {
+            "seq": change_seq,
+            "list_ids": sorted(list_ids | {parent.list_id for parent in parents.values()}),
+            "ids": [ids[spec["ref"]] for spec in request_order],
+        })
+        db.session.commit()
+        return jsonify({
+            "message": "Tasks added successfully!",
+            "created": len(ids),
+            "ids": [ids[spec["ref"]] for spec in request_order],
+            "temp_ids": {
+                str(spec["temp_id"]): ids[spec["ref"]]
+                for spec in specs if spec["temp_id"] is not None
+            },
+        }), 201
+
+    except Exception:
+        # Handle unexpected errors
+        logger.exception("Error adding the tasks")
+        db.session.rollback()
+        return jsonify({"error": "An error occurred while adding the tasks."}), 500
+
 @tasks.route("/DeleteTask/<int:task_id>", methods=["DELETE"])
 @login_required
 def delete_task(task_id):
@@ -205,14 +371,29 @@ def delete_task(task_id):
         if not task_to_delete:
             return jsonify({"message": "Task not found or unauthorized access!"}), 404
 
-        # Delete the task and its subtasks due to cascade
-        db.session.delete(task_to_delete)
+        # Record tombstones for the task and its subtasks, which are deleted together
+        change_seq = record_list_change(current_user.id, [task_to_delete.list_id])
+        deleted_ids = subtree_ids(task_to_delete.path)
+        record_deletions(current_user.id, change_seq, "task", deleted_ids, task_to_delete.list_id)
+        adjust_rollups(
+            task_to_delete.list_id,
+            ancestors_query(task_to_delete),
+            -(1 + task_to_delete.descendant_count),
+            -(int(task_to_delete.completed) + task_to_delete.completed_descendant_count),
+            change_seq,
+        )
+        publish_on_commit(current_user.id, "task_deleted", {
+            "seq": change_seq,
+            "list_id": task_to_delete.list_id,
+            "ids": deleted_ids,
+        })
+        delete_subtree(task_to_delete.path)
         db.session.commit()
         return jsonify({"message": "Task deleted successfully!"}), 200
 
-    except Exception as e:
+    except Exception:
         # Log the exception and return an error response
-        print(str(e))
+        logger.exception("Error deleting the task")
         return jsonify({"error": "An error occurred while deleting the task."}), 500
 
 @tasks.route("/EditTask/<int:task_id>", methods=["PUT"])
@@ -225,10 +406,12 @@ def edit_task(task_id):
         task_id (int): The unique identifier of the task to be edited.
 
     Expects:
-        JSON payload with optional 'name' and 'completed' fields.
+        JSON payload with optional 'name' and 'completed' fields. With 'subtree': true, the
+        'completed' status is applied to the task and all of its subtasks.
 
     Returns:
-        JSON response indicating the successful update with HTTP status 200.
+        JSON response indicating the successful update with HTTP status 200; in subtree mode it
+        includes the 'ids' of the tasks whose completion status changed.
         If the task is not found, returns an error message with HTTP status 404.
     """
     try:
@@ -246,16 +429,50 @@ def edit_task(task_id):
         if new_name:
             task_to_edit.name = new_name
 
+        if data.get("subtree") and "completed" in data:
+            # Apply the status to the whole subtree with one set-based update
+            completed = bool(data["completed"])
+            change_seq = record_list_change(current_user.id, [task_to_edit.list_id])
+            list_id = task_to_edit.list_id
+            changed_ids = set_subtree_completed(task_to_edit, completed, change_seq)
+            if new_name:
+                publish_on_commit(current_user.id, "task_edited", {
+                    "seq": change_seq,
+                    "task": task_event_data(task_to_edit),
+                })
+            publish_on_commit(current_user.id, "subtree_completed", {
+                "seq": change_seq,
+                "id": task_id,
+                "list_id": list_id,
+                "completed": completed,
+                "ids": changed_ids,
+            })
+            db.session.commit()
+            return jsonify({"message": "Task edited successfully!", "completed": completed, "ids": changed_ids}), 200
+
         # Update the task's completion status if provided
+        was_completed = task_to_edit.completed
         if "completed" in data:
-            task_to_edit.completed = data["completed"]
-
+            task_to_edit.completed = bool(data["completed"])
+
+        task_to_edit.change_seq = record_list_change(current_user.id, [task_to_edit.list_id])
+        adjust_rollups(
+            task_to_edit.list_id,
+            ancestors_query(task_to_edit),
+            0,
+            int(task_to_edit.completed) - int(was_completed),
+            task_to_edit.change_seq,
+        )
+        publish_on_commit(current_user.id, "task_edited", {
+            "seq": task_to_edit.change_seq,
+            "task": task_event_data(task_to_edit),
+        })
         db.session.commit()
         return jsonify({"message": "Task edited successfully!"}), 200
 
-    except Exception as e:
+    except Exception:
         # Handle unexpected errors
-        print(str(e))
+        logger.exception("Error editing the task")
         return jsonify({"error": "An error occurred while editing the task."}), 500
 
 @tasks.route("/TaskCompleted/<int:task_id>", methods=["PUT"])
@@ -267,8 +484,12 @@ def task_completed(task_id):
     Args:
         task_id (int): The unique identifier of the task to toggle.
 
+    Query Parameters:
+        subtree (bool, optional): Pass 'true' to give all of the task's subtasks its new status.
+
     Returns:
-        JSON response indicating the successful toggle with HTTP status 200.
+        JSON response indicating the successful toggle with HTTP status 200; in subtree mode it
+        includes the new 'completed' status and the 'ids' of the tasks whose status changed.
         If the task is not found, returns an error message with HTTP status 404.
     """
     try:
@@ -281,17 +502,98 @@ def task_completed(task_id):
         if task_to_edit is None:
             return jsonify({"error": "Task not found or unauthorized access!"}), 404
 
+        if wants_subtree(request.args):
+            # Toggle the task and give its whole subtree the same status in one set-based update
+            completed = not task_to_edit.completed
+            change_seq = record_list_change(current_user.id, [task_to_edit.list_id])
+            list_id = task_to_edit.list_id
+            changed_ids = set_subtree_completed(task_to_edit, completed, change_seq)
+            publish_on_commit(current_user.id, "subtree_completed", {
+                "seq": change_seq,
+                "id": task_id,
+                "list_id": list_id,
+                "completed": completed,
+                "ids": changed_ids,
+            })
+            db.session.commit()
+            return jsonify({
+                "message": "Task completion status toggled successfully!",
+                "completed": completed,
+                "ids": changed_ids,
+            }), 200
+
         # Toggle the 'completed' status of the task
         task_to_edit.completed = not task_to_edit.completed
 
+        task_to_edit.change_seq = record_list_change(current_user.id, [task_to_edit.list_id])
+        adjust_rollups(
+            task_to_edit.list_id,
+            ancestors_query(task_to_edit),
+            0,
+            1 if task_to_edit.completed else -1,
+            task_to_edit.change_seq,
+        )
+        publish_on_commit(current_user.id, "task_completed", {
+            "seq": task_to_edit.change_seq,
+            "id": task_to_edit.id,
+            "list_id": task_to_edit.list_id,
+            "completed": task_to_edit.completed,
+        })
         db.session.commit()
         return jsonify({"message": "Task completion status toggled successfully!"}), 200
 
-    except Exception as e:
+    except Exception:
         # Handle unexpected errors
-        print(str(e))
+        logger.exception("Error toggling the task")
         return jsonify({"error": "An error occurred while editing the task."}), 500
 
+@tasks.route("/tasks/<int:task_id>/children", methods=["GET"])
+@login_required
+def get_task_children(task_id):
+    """
+    Retrieve one page of a task's children for the authenticated user, to expand a collapsed task.
+
+    Args:
+        task_id (int): The ID of the parent task.
+
+    Query Parameters:
+        limit (int, optional): Maximum number of children returned.
+        after (str, optional): Keyset cursor, the 'next_after' value of the previous page.
+        depth (int, optional): Subtask levels expanded below each child.
+
+    Returns:
+        JSON response with the children, each carrying a 'child_count', and the 'next_after' cursor
+        (null on the last page), with HTTP status 200 and an ETag.
+        If a pagination argument is invalid, returns an error message with HTTP status 400.
+        If the task is not found, returns an error message with HTTP status 404.
+    """
+    try:
+        try:
+            pagination = page_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        # Ensure the task belongs to the current user, reading its list's version along the way
+        parent = db.session.execute(
+            db.select(Task.id, Task.list_id, Task.path, Task.depth, List.version)
+            .join(List)
+            .where(Task.id == task_id, List.user_id == current_user.id)
+        ).first()
+        if parent is None:
+            return jsonify({"error": "Task not found or unauthorized access!"}), 404
+
+        etag = list_etag(current_user.id, parent.list_id, parent.version)
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+
+        children, next_after = load_task_page(parent.list_id, parent=parent, **pagination)
+        return with_etag(jsonify({"tasks": children, "next_after": next_after}), etag), 200
+
+    except Exception:
+        # Log the exception and return an error response
+        logger.exception("Error fetching the subtasks")
+        return jsonify({"error": "An error occurred while fetching the subtasks."}), 500
+
 @tasks.route("/getUserIdByListId/<int:list_id>", methods=["GET"])
 @login_required
 def get_user_id_by_list_id(list_id):
@@ -314,9 +616,9 @@ def get_user_id_by_list_id(list_id):
         user_id = lst.user_id
         return jsonify({"userId": user_id}), 200
 
-    except Exception as e:
+    except Exception:
         # Log the exception and return an error response
-        print(f"An error occurred: {e}")
+        logger.exception("Error retrieving the user ID")
         return jsonify({"error": "An error occurred while retrieving the user ID."}), 500
 
 
@@ -333,10 +635,11 @@ def move_task_with_subtasks(task_id):
         JSON payload with 'new_list_id' indicating the target list.
 
     Returns:
-        JSON response indicating the successful move with HTTP status 200.
+        JSON response with the number of tasks moved and the elapsed time in milliseconds, with HTTP status 200.
         If the task or target list is not found, returns an error message with appropriate HTTP status.
         If an error occurs, returns an error message with HTTP status 500.
     """
+    started = time.perf_counter()
     try:
         data = request.json
         new_list_id = data.get("new_list_id")
@@ -357,36 +660,128 @@ def move_task_with_subtasks(task_id):
         if task_to_move is None:
             return jsonify({"error": "Task not found or unauthorized access."}), 404
 
-        # If this is a subtask being moved to a new list, update its parent relationship
-        if task_to_move.parent_id is not None:
-            task_to_move.parent_id = None  # Remove parent relationship when moving to new list
-            task_to_move.depth = 0  # Reset depth since it's now a top-level task
-
-        # Move the task and all its subtasks recursively to the new list
-        move_task_recursively(task_to_move, new_list_id)
+        # Move the task and all its subtasks to the new list as a top-level task
+        source_list_id = task_to_move.list_id
+        change_seq = record_list_change(current_user.id, [source_list_id, new_list_id])
+        moved_ids = move_subtree(task_to_move, new_list_id, change_seq=change_seq)
+        publish_on_commit(current_user.id, "task_moved", {
+            "seq": change_seq,
+            "id": task_id,
+            "from_list_id": source_list_id,
+            "list_id": new_list_id,
+            "ids": moved_ids,
+        })
 
         db.session.commit()
-        return jsonify({"message": "Task and all subtasks moved successfully!"}), 200
+        return jsonify({
+            "message": "Task and all subtasks moved successfully!",
+            "moved": len(moved_ids),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }), 200
 
-    except Exception as e:
+    except Exception:
         # Handle unexpected errors
-        print(f"An error occurred while moving the task: {e}")
+        logger.exception("Error moving task")
         db.session.rollback()  # Rollback changes in case of error
         return jsonify({"error": "An error occurred while moving the task."}), 500
 
-def move_task_recursively(task, new_list_id):
+
+@tasks.route("/reorderTask/<int:task_id>", methods=["PUT"])
+@login_required
+def reorder_task_among_siblings(task_id):
     """
-    Recursively move a task and all its subtasks to a new list.
+    Move a task to a new place among its siblings for the authenticated user.
+
+    Only the moved task's position changes, except in the rare case where the gap between
+    its new neighbours is used up and the siblings are renumbered first. Renumbered siblings
+    are stamped with the same change sequence and listed in the 'task_reordered' event.
 
     Args:
-        task (Task): The task to be moved.
-        new_list_id (int): The ID of the target list.
+        task_id (int): The ID of the task to be moved.
+
+    Expects:
+        JSON payload with 'after_id', the sibling the task should follow, or null to make it the first.
+
+    Returns:
+        JSON response with the task's new 'position' and the 'renumbered' siblings' new
+        positions, with HTTP status 200.
+        If the task or sibling is not found, returns an error message with HTTP status 404.
+        If an error occurs, returns an error message with HTTP status 500.
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        if "after_id" not in data:
+            return jsonify({"error": "after_id is required (null to move the task first)."}), 400
+
+        # Retrieve the task to be moved, ensuring it belongs to the current user
+        task_to_move = Task.query.join(List).filter(
+            Task.id == task_id,
+            List.user_id == current_user.id
+        ).first()
+        if task_to_move is None:
+            return jsonify({"error": "Task not found or unauthorized access."}), 404
+
+        after = None
+        if data["after_id"] is not None:
+            # The task can only be placed after one of its own siblings
+            after = Task.query.filter(
+                Task.id == data["after_id"],
+                Task.id != task_id,
+                Task.list_id == task_to_move.list_id,
+                Task.parent_id == task_to_move.parent_id,
+            ).first()
+            if after is None:
+                return jsonify({"error": "Sibling task not found."}), 404
+
+        change_seq = record_list_change(current_user.id, [task_to_move.list_id])
+        position, renumbered = reorder_task(task_to_move, after, change_seq)
+        task_to_move.change_seq = change_seq
+        publish_on_commit(current_user.id, "task_reordered", {
+            "seq": change_seq,
+            "id": task_id,
+            "list_id": task_to_move.list_id,
+            "parent_id": task_to_move.parent_id,
+            "position": position,
+            "renumbered": renumbered,
+        })
+        db.session.commit()
+        return jsonify({
+            "message": "Task reordered successfully!",
+            "position": position,
+            "renumbered": renumbered,
+        }), 200
+
+    except Exception:
+        # Handle unexpected errors
+        logger.exception("Error reordering task")
+        db.session.rollback()
+        return jsonify({"error": "An error occurred while reordering the task."}), 500
+
+
+@tasks.route("/changes", methods=["GET"])
+@login_required
+def get_changes():
+    """
+    Retrieve the lists and tasks of the authenticated user that changed after a cursor.
+
+    Query Parameters:
+        since (int, optional): The cursor returned by the previous call; omit it for a full sync.
+
+    Returns:
+        JSON response with the new 'cursor', changed 'lists' and 'tasks' (without nested subtasks),
+        and the IDs of 'deleted' lists and tasks, with HTTP status 200. Tasks of a deleted list are
+        deleted with it and not listed individually. 'reset' is true when the response is a full
+        sync the client must replace its copy with, e.g. because the cursor is too old.
+        If the cursor is invalid, returns an error message with HTTP status 400.
     """
-    task.list_id = new_list_id
-    
-    # Update depths for all subtasks
-    for subtask in task.subtasks:
-        subtask.list_id = new_list_id
-        # Recalculate depth after move
-        subtask.depth = subtask.calculate_depth()
-        move_task_recursively(subtask, new_list_id)
\ No newline at end of file
+    since = request.args.get("since", "0")
+    if not since.isdigit():
+        return jsonify({"error": "since must be a non-negative integer cursor."}), 400
+
+    try:
+        return jsonify(changes_since(current_user.id, int(since))), 200
+
+    except Exception:
+        # Log the exception and return an error response
+        logger.exception("Error fetching changes")
+        return jsonify({"error": "An error occurred while fetching changes."}), 500
@@ -0,0 +1,90 @@
+# conftest.py
+
+import pytest
+from server import create_app
+from instrumentation import statement_observers
+
+# Session cookies are marked Secure, so requests go through an https URL
+BASE_URL = "https://localhost/api"
+PASSWORD = "test-password"
+
+# A small tree used by most tests: two top-level tasks, the first nesting three levels deep
+TREE = [
+    {
+        "name": "alpha",
+        "subtasks": [
+            {"name": "alpha one", "subtasks": [{"name": "alpha one a", "subtasks": [{"name": "alpha leaf"}]}]},
+            {"name": "alpha two", "completed": True},
+        ],
+    },
+    {"name": "beta", "subtasks": [{"name": "beta one"}]},
+]
+
+
+@pytest.fixture
+def app_config():
+    """
+    Extra configuration for the app fixture; override it in a test module to change settings.
+    """
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    """
+    An app backed by a throwaway SQLite file, with the tree cache disabled so every
+    read reaches the database, and cheap password hashing.
+    """
+    return create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+        "TREE_CACHE_BACKEND": "none",
+        "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+        "LOG_LEVEL": "WARNING",
+        **app_config,
+    })
+
+
+@pytest.fixture
+def api(app):
+    """
+    Call the API as a signed-up, logged-in user.
+
+    Returns:
+        callable: api(method, path, json=None, headers=None, data=None) returning the response.
+    """
+    client = app.test_client()
+
+    def call(method, path, json=None, headers=None, data=None):
+        return getattr(client, method)(BASE_URL + path, json=json, headers=headers, data=data)
+
+    call("post", "/signup", {"username": "owner", "email": "owner@example.com", "password": PASSWORD, "name": "Owner"})
+    call("post", "/login", {"login": "owner", "password": PASSWORD})
+    return call
+
+
+@pytest.fixture
+def seeded(api):
+    """
+    Two lists: list 1 holds TREE (task IDs 1-7, level by level), list 2 one task (ID 8).
+    """
+    api("post", "/Addlists", {"name": "first"})
+    api("post", "/Addlists", {"name": "second"})
+    assert api("post", "/tasks:batch", {"list_id": 1, "tasks": TREE}).status_code == 201
+    assert api("post", "/AddTask/2", {"name": "gamma"}).status_code == 200
+    return api
+
+
+@pytest.fixture
+def statements():
+    """
+    Collect the (statement, parameters) of every SQL statement executed while the test runs.
+    """
+    captured = []
+
+    def observe(statement, parameters, executemany):
+        captured.append((statement, parameters[0] if executemany else parameters))
+
+    statement_observers.append(observe)
+    yield captured
+    statement_observers.remove(observe)
@@ -0,0 +1,62 @@
+# test_auth.py
+
+"""
+Tests for logins whose stored password hash is upgraded after verification.
+"""
+
+import pytest
+
+from db_init import db
+from models import User
+from passwords import HasherBusy, password_hasher
+from conftest import PASSWORD
+
+
+def stored_hash(app):
+    with app.app_context():
+        return db.session.execute(db.select(User.password_hash)).scalar()
+
+
+def log_in(api):
+    return api("post", "/login", {"login": "owner", "password": PASSWORD})
+
+
+def test_login_upgrades_outdated_hash(app, api):
+    password_hasher.configure("pbkdf2:sha256:2000", password_hasher.workers, password_hasher.max_pending)
+
+    assert log_in(api).status_code == 200
+    assert stored_hash(app).startswith("pbkdf2:sha256:2000$")
+
+
+def test_login_succeeds_when_rehash_is_busy(app, api, monkeypatch):
+    password_hasher.configure("pbkdf2:sha256:2000", password_hasher.workers, password_hasher.max_pending)
+
+    def busy(password):
+        raise HasherBusy("busy")
+
+    monkeypatch.setattr(password_hasher, "rehash", busy)
+
+    assert log_in(api).status_code == 200
+    assert stored_hash(app).startswith("pbkdf2:sha256:1000$")
+
+
+def test_login_succeeds_when_rehash_cannot_be_saved(app, api):
+    password_hasher.configure("pbkdf2:sha256:2000", password_hasher.workers, password_hasher.max_pending)
+    with app.app_context():
+        # Stands in for a database that rejects the write, e.g. one locked by another process
+        db.session.execute(db.text(
+            "CREATE TRIGGER reject_rehash BEFORE UPDATE OF password_hash ON user "
+            "BEGIN SELECT RAISE(ABORT, 'database is locked'); END"
+        ))
+        db.session.commit()
+
+    assert log_in(api).status_code == 200
+    assert api("get", "/current_user").get_json()["username"] == "owner"
+    assert stored_hash(app).startswith("pbkdf2:sha256:1000$")
+
+
+@pytest.mark.parametrize("login, password", [("owner", "wrong"), ("nobody", PASSWORD)])
+def test_login_rejects_wrong_credentials(api, login, password):
+    api("post", "/logout")
+    assert api("post", "/login", {"login": login, "password": password}).status_code == 400
+    assert api("get", "/current_user").status_code == 401
@@ -0,0 +1,105 @@
+# test_batch.py
+
+"""
+Tests for batch task creation: nested and flat payloads, validation and the size limit.
+"""
+
+import pytest
+from batch import MAX_BATCH_SIZE
+from db_init import db
+from hierarchy import reserve_task_ids
+from models import Task
+from rollups import check_rollups
+
+
+def batch(api, payload):
+    return api("post", "/tasks:batch", payload)
+
+
+def tasks_by_id(app):
+    with app.app_context():
+        return {task.id: task for task in db.session.execute(db.select(Task)).scalars()}
+
+
+def test_nested_payload_builds_the_tree(app, seeded):
+    response = batch(seeded, {"list_id": 2, "tasks": [
+        {"name": "top", "subtasks": [{"name": "child", "subtasks": [{"name": "grandchild"}]}, {"name": "second"}]},
+    ]})
+    assert response.status_code == 201
+    top, child, grandchild, second = response.get_json()["ids"]
+
+    tasks = tasks_by_id(app)
+    assert tasks[child].parent_id == top and tasks[second].parent_id == top
+    assert tasks[grandchild].parent_id == child and tasks[grandchild].depth == 2
+    assert tasks[child].position < tasks[second].position
+    assert tasks[top].descendant_count == 3
+    with app.app_context():
+        assert check_rollups()["tasks_drifted"] == 0
+
+
+def test_flat_payload_resolves_temp_ids_in_any_order(app, seeded):
+    response = batch(seeded, {"list_id": 2, "tasks": [
+        {"temp_id": "leaf", "name": "leaf", "parent_ref": "mid"},
+        {"temp_id": "mid", "name": "mid", "parent_ref": 7},
+        {"temp_id": 7, "name": "root"},
+        {"name": "under existing", "parent_id": 8},
+    ]})
+    assert response.status_code == 201
+    document = response.get_json()
+    assert set(document["temp_ids"]) == {"leaf", "mid", "7"}
+    # IDs come back in request order
+    assert document["ids"][:3] == [document["temp_ids"][ref] for ref in ("leaf", "mid", "7")]
+
+    tasks = tasks_by_id(app)
+    assert tasks[document["temp_ids"]["leaf"]].parent_id == document["temp_ids"]["mid"]
+    assert tasks[document["temp_ids"]["mid"]].parent_id == document["temp_ids"]["7"]
+    assert tasks[document["ids"][3]].parent_id == 8
+
+
+@pytest.mark.parametrize("payload, message", [
+    ({"list_id": 1, "tasks": [
+        {"temp_id": "a", "name": "a", "parent_ref": "b"},
+        {"temp_id": "b", "name": "b", "parent_ref": "a"},
+    ]}, "cycle"),
+    ({"list_id": 1, "tasks": [{"temp_id": "a", "name": "a", "parent_ref": "a"}]}, "cycle"),
+    ({"list_id": 1, "tasks": [{"name": "a", "parent_ref": "missing"}]}, "Unknown parent_ref"),
+    ({"list_id": 1, "tasks": [{"temp_id": "a", "name": "a"}, {"temp_id": "a", "name": "b"}]}, "Duplicate temp_id"),
+    ({"tasks": [{"name": "a"}]}, "list_id is required"),
+    ({"list_id": 1, "tasks": [{"name": ""}]}, "name is required"),
+    ({"list_id": [1], "tasks": [{"name": "a"}]}, "list_id must be an integer"),
+    ({"tasks": [{"name": "a", "list_id": {"id": 1}}]}, "list_id must be an integer"),
+    ({"tasks": [{"name": "a", "parent_id": [1]}]}, "parent_id must be an integer"),
+    ({"tasks": [{"name": "a", "parent_id": True}]}, "parent_id must be an integer"),
+    ({"list_id": 1, "tasks": [{"name": "a", "temp_id": ["x"]}]}, "temp_id must be"),
+    ({"list_id": 1, "tasks": [{"name": "a", "parent_ref": {"x": 1}}]}, "parent_ref must be"),
+    ({"list_id": 1, "tasks": [{"name": "a", "subtasks": {}}]}, "'subtasks' must be an array"),
+])
+def test_invalid_payload_is_rejected(app, seeded, payload, message):
+    before = len(tasks_by_id(app))
+    response = batch(seeded, payload)
+    assert response.status_code == 400
+    assert message in response.get_json()["error"]
+    assert len(tasks_by_id(app)) == before
+
+
+def test_batch_size_limit(app, seeded):
+    tasks = [{"name": f"task {index}"} for index in range(MAX_BATCH_SIZE)]
+    assert batch(seeded, {"list_id": 2, "tasks": tasks}).status_code == 201
+
+    tasks.append({"name": "one too many"})
+    response = batch(seeded, {"list_id": 2, "tasks": tasks})
+    assert response.status_code == 400
+    assert str(MAX_BATCH_SIZE) in response.get_json()["error"]
+
+
+def test_unowned_list_is_not_found(seeded):
+    assert batch(seeded, {"list_id": 99, "tasks": [{"name": "a"}]}).status_code == 404
+
+
+def test_ids_are_only_reserved_under_the_write_lock(app, seeded):
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            reserve_task_ids(1)
+        db.session.execute(db.update(Task).where(Task.id == 1).values(name="alpha"))
+        assert reserve_task_ids(1) == 9
+        db.session.rollback()
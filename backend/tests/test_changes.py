@@ -0,0 +1,92 @@
+# test_changes.py
+
+"""
+Tests for delta sync through GET /api/changes: cursors, tombstones and full resyncs.
+"""
+
+# Task IDs of the seeded tree (see conftest.TREE)
+ALPHA, BETA, ALPHA_ONE, ALPHA_TWO, BETA_ONE, ALPHA_ONE_A, ALPHA_LEAF, GAMMA = range(1, 9)
+
+
+def changes(api, since=None):
+    response = api("get", "/changes" if since is None else f"/changes?since={since}")
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def task_ids(document):
+    return {task["id"] for task in document["tasks"]}
+
+
+def test_full_sync_returns_everything(seeded):
+    document = changes(seeded)
+    assert document["reset"] is True
+    assert task_ids(document) == set(range(1, 9))
+    assert {row["id"] for row in document["lists"]} == {1, 2}
+    assert document["deleted"] == {"lists": [], "tasks": []}
+
+
+def test_cursor_advances_to_the_changed_rows_only(seeded):
+    cursor = changes(seeded)["cursor"]
+    assert changes(seeded, cursor) == {
+        "cursor": cursor, "reset": False, "lists": [], "tasks": [], "deleted": {"lists": [], "tasks": []},
+    }
+
+    seeded("put", f"/EditTask/{ALPHA_ONE}", {"name": "renamed"})
+    document = changes(seeded, cursor)
+    assert document["cursor"] == cursor + 1
+    assert [(task["id"], task["name"]) for task in document["tasks"]] == [(ALPHA_ONE, "renamed")]
+    assert document["reset"] is False
+
+    seeded("put", "/EditList/2", {"name": "second renamed"})
+    document = changes(seeded, document["cursor"])
+    assert document["cursor"] == cursor + 2
+    assert document["lists"] == [{"id": 2, "name": "second renamed"}]
+    assert document["tasks"] == []
+
+
+def test_deletions_are_reported_as_tombstones(seeded):
+    cursor = changes(seeded)["cursor"]
+    seeded("delete", f"/DeleteTask/{ALPHA_ONE}")
+    seeded("delete", "/DeleteList/2")
+
+    document = changes(seeded, cursor)
+    assert set(document["deleted"]["tasks"]) == {ALPHA_ONE, ALPHA_ONE_A, ALPHA_LEAF}
+    # GAMMA went with its list and is not listed on its own
+    assert document["deleted"]["lists"] == [2]
+    # ALPHA's rollup counts changed, so it is reported too
+    assert task_ids(document) == {ALPHA}
+
+
+def test_cursor_older_than_kept_tombstones_gets_full_resync(app, seeded):
+    app.config["TOMBSTONE_RETENTION"] = 2
+    old_cursor = changes(seeded)["cursor"]
+    seeded("delete", f"/DeleteTask/{ALPHA_LEAF}")
+    seeded("put", f"/EditTask/{BETA}", {"name": "renamed"})
+    recent_cursor = changes(seeded)["cursor"]
+    seeded("put", f"/EditTask/{BETA}", {"name": "renamed again"})
+    # This deletion discards the tombstone of the first one
+    seeded("delete", f"/DeleteTask/{BETA_ONE}")
+
+    document = changes(seeded, old_cursor)
+    assert document["reset"] is True
+    assert task_ids(document) == set(range(1, 9)) - {ALPHA_LEAF, BETA_ONE}
+    assert document["deleted"] == {"lists": [], "tasks": []}
+
+    # A cursor within the retained tombstones still gets a delta
+    document = changes(seeded, recent_cursor)
+    assert document["reset"] is False
+    assert document["deleted"]["tasks"] == [BETA_ONE]
+
+
+def test_cursor_ahead_of_server_gets_full_resync(seeded):
+    cursor = changes(seeded)["cursor"]
+    document = changes(seeded, cursor + 100)
+    assert document["reset"] is True
+    assert document["cursor"] == cursor
+    assert task_ids(document) == set(range(1, 9))
+
+
+def test_invalid_cursor_is_rejected(seeded):
+    assert seeded("get", "/changes?since=-1").status_code == 400
+    assert seeded("get", "/changes?since=abc").status_code == 400
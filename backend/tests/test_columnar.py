@@ -0,0 +1,158 @@
+# test_columnar.py
+
+"""
+Tests for columnar task trees: they decode to the default nested JSON, and every
+representation is cached and validated separately.
+"""
+
+import base64
+import pytest
+import columnar
+from columnar import COLUMNAR_JSON_MIMETYPE, COLUMNAR_MSGPACK_MIMETYPE, JSON_MIMETYPE
+
+
+def project(tasks):
+    """
+    Reduce nested tasks to the fields the columnar format carries.
+    """
+    return [
+        {
+            "id": task["id"],
+            "name": task["name"],
+            "depth": task["depth"],
+            "completed": task["completed"],
+            "subtasks": project(task["subtasks"]),
+        }
+        for task in tasks
+    ]
+
+
+def decode(columns, completed):
+    """
+    Rebuild the nesting from columns in one forward pass, as a client would.
+
+    Args:
+        columns (dict): The task columns.
+        completed (bytes): The decoded completed bitset.
+
+    Returns:
+        list: The top-level tasks, shaped like project's output.
+    """
+    assert columns["count"] == len(columns["ids"])
+    roots = []
+    nodes = []
+    for index, task_id in enumerate(columns["ids"]):
+        node = {
+            "id": task_id,
+            "name": columns["names"][index],
+            "depth": columns["depths"][index],
+            "completed": bool(completed[index >> 3] >> (index & 7) & 1),
+            "subtasks": [],
+        }
+        parent = columns["parent_index"][index]
+        assert parent < index
+        (roots if parent == -1 else nodes[parent]["subtasks"]).append(node)
+        nodes.append(node)
+    return roots
+
+
+def get_columnar_json(api, path):
+    response = api("get", path, headers={"Accept": COLUMNAR_JSON_MIMETYPE})
+    assert response.status_code == 200
+    assert response.mimetype == COLUMNAR_JSON_MIMETYPE
+    return response.get_json()
+
+
+@pytest.fixture
+def deeper(seeded):
+    """
+    The seeded lists, plus a second top-level tree with more than eight tasks so the bitset spans bytes.
+    """
+    tasks = [{"name": f"task {i}", "completed": i % 3 == 0} for i in range(10)]
+    assert seeded("post", "/tasks:batch", {"list_id": 1, "tasks": [{"name": "wide", "subtasks": tasks}]}).status_code == 201
+    return seeded
+
+
+def test_columnar_json_round_trips_task_tree(deeper):
+    nested = deeper("get", "/GetTasks/1").get_json()["tasks"]
+    columns = get_columnar_json(deeper, "/GetTasks/1")["tasks"]
+    assert decode(columns, base64.b64decode(columns["completed"])) == project(nested)
+
+
+def test_columnar_json_round_trips_pages(deeper):
+    path = "/GetTasks/1?limit=1&depth=1"
+    nested = deeper("get", path).get_json()
+    document = get_columnar_json(deeper, path)
+    columns = document["tasks"]
+    assert document["next_after"] == nested["next_after"]
+    assert decode(columns, base64.b64decode(columns["completed"])) == project(nested["tasks"])
+
+    # Child counts follow the same depth-first order
+    child_counts = []
+    stack = list(reversed(nested["tasks"]))
+    while stack:
+        task = stack.pop()
+        child_counts.append(task["child_count"])
+        stack.extend(reversed(task["subtasks"]))
+    assert columns["child_counts"] == child_counts
+
+
+def test_columnar_json_round_trips_lists(deeper):
+    nested = deeper("get", "/GetLists?include=tasks").get_json()["lists"]
+    lists = get_columnar_json(deeper, "/GetLists?include=tasks")["lists"]
+    assert lists["ids"] == [lst["id"] for lst in nested]
+    assert lists["names"] == [lst["name"] for lst in nested]
+    assert lists["task_counts"] == [lst["task_count"] for lst in nested]
+    assert lists["completed_counts"] == [lst["completed_count"] for lst in nested]
+    for columns, lst in zip(lists["tasks"], nested):
+        assert decode(columns, base64.b64decode(columns["completed"])) == project(lst["tasks"])
+
+
+def test_columnar_msgpack_round_trips_task_tree(deeper):
+    msgpack = pytest.importorskip("msgpack")
+    nested = deeper("get", "/GetTasks/1").get_json()["tasks"]
+    response = deeper("get", "/GetTasks/1", headers={"Accept": COLUMNAR_MSGPACK_MIMETYPE})
+    assert response.mimetype == COLUMNAR_MSGPACK_MIMETYPE
+    columns = msgpack.unpackb(response.get_data(), raw=False)["tasks"]
+    assert isinstance(columns["completed"], bytes)
+    assert decode(columns, columns["completed"]) == project(nested)
+
+
+def test_msgpack_falls_back_to_json_when_unavailable(seeded, monkeypatch):
+    monkeypatch.setattr(columnar, "msgpack", None)
+    response = seeded("get", "/GetTasks/1", headers={"Accept": COLUMNAR_MSGPACK_MIMETYPE})
+    assert response.mimetype == JSON_MIMETYPE
+    assert "tasks" in response.get_json()
+
+
+@pytest.mark.parametrize("app_config", [{"TREE_CACHE_BACKEND": "memory"}])
+@pytest.mark.parametrize("path", ["/GetTasks/1", "/GetTasks/1?limit=1", "/GetLists?include=tasks"])
+def test_each_representation_has_its_own_etag(seeded, path):
+    accepts = [None, JSON_MIMETYPE, COLUMNAR_JSON_MIMETYPE]
+    if columnar.msgpack is not None:
+        accepts.append(COLUMNAR_MSGPACK_MIMETYPE)
+
+    etags = {}
+    for accept in accepts:
+        headers = {"Accept": accept} if accept else None
+        # The second request is served from the tree cache, which must not mix representations
+        for _ in range(2):
+            response = seeded("get", path, headers=headers)
+            assert response.status_code == 200
+            assert "Accept" in response.vary
+            assert response.mimetype == (accept or JSON_MIMETYPE)
+            etags.setdefault(accept, set()).add(response.get_etag()[0])
+
+    assert all(len(values) == 1 for values in etags.values())
+    assert etags[None] == etags[JSON_MIMETYPE]
+    distinct = {next(iter(etags[accept])) for accept in accepts[1:]}
+    assert len(distinct) == len(accepts) - 1
+
+    # A copy validated in one representation is never validated for another
+    json_etag = next(iter(etags[JSON_MIMETYPE]))
+    response = seeded("get", path, headers={"Accept": COLUMNAR_JSON_MIMETYPE, "If-None-Match": f'"{json_etag}"'})
+    assert response.status_code == 200
+    columnar_etag = response.get_etag()[0]
+    response = seeded("get", path, headers={"Accept": COLUMNAR_JSON_MIMETYPE, "If-None-Match": f'"{columnar_etag}"'})
+    assert response.status_code == 304
+    assert "Accept" in response.vary
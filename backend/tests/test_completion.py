@@ -0,0 +1,85 @@
+# test_completion.py
+
+"""
+Tests for completing and uncompleting single tasks and whole subtrees, with their rollups.
+"""
+
+import pytest
+from db_init import db
+from models import List, Task
+from rollups import check_rollups
+
+# Task IDs of the seeded tree (see conftest.TREE); ALPHA_TWO starts completed
+ALPHA, BETA, ALPHA_ONE, ALPHA_TWO, BETA_ONE, ALPHA_ONE_A, ALPHA_LEAF, GAMMA = range(1, 9)
+ALPHA_SUBTREE = {ALPHA, ALPHA_ONE, ALPHA_TWO, ALPHA_ONE_A, ALPHA_LEAF}
+
+
+def completed_ids():
+    return set(db.session.execute(db.select(Task.id).where(Task.completed)).scalars())
+
+
+def completed_descendants(task_id):
+    return db.session.get(Task, task_id).completed_descendant_count
+
+
+def assert_consistent():
+    report = check_rollups()
+    assert report["tasks_drifted"] == 0 and report["lists_drifted"] == 0, report
+
+
+COMPLETE_SUBTREE = [
+    ("put", f"/TaskCompleted/{ALPHA_ONE}?subtree=true", None),
+    ("put", f"/EditTask/{ALPHA_ONE}", {"completed": True, "subtree": True}),
+]
+
+
+@pytest.mark.parametrize("method, path, body", COMPLETE_SUBTREE, ids=["TaskCompleted", "EditTask"])
+def test_complete_subtree(app, seeded, method, path, body):
+    assert seeded(method, path, body).status_code == 200
+
+    with app.app_context():
+        assert completed_ids() == {ALPHA_TWO, ALPHA_ONE, ALPHA_ONE_A, ALPHA_LEAF}
+        assert completed_descendants(ALPHA_ONE) == 2
+        assert completed_descendants(ALPHA) == 4
+        assert db.session.get(List, 1).completed_count == 4
+        assert db.session.get(List, 2).completed_count == 0
+        assert_consistent()
+
+
+def test_uncomplete_subtree(app, seeded):
+    seeded("put", f"/EditTask/{ALPHA}", {"completed": True, "subtree": True})
+    with app.app_context():
+        assert completed_ids() == ALPHA_SUBTREE
+        assert db.session.get(List, 1).completed_count == 5
+
+    assert seeded("put", f"/EditTask/{ALPHA_ONE}", {"completed": False, "subtree": True}).status_code == 200
+    with app.app_context():
+        assert completed_ids() == {ALPHA, ALPHA_TWO}
+        assert completed_descendants(ALPHA) == 1
+        assert completed_descendants(ALPHA_ONE) == 0
+        assert db.session.get(List, 1).completed_count == 2
+        assert_consistent()
+
+
+def test_subtree_toggle_flips_to_the_opposite_of_the_root(app, seeded):
+    # ALPHA is open, so toggling its subtree completes all of it, ALPHA_TWO included
+    assert seeded("put", f"/TaskCompleted/{ALPHA}?subtree=true").status_code == 200
+    with app.app_context():
+        assert completed_ids() == ALPHA_SUBTREE
+        assert_consistent()
+
+    assert seeded("put", f"/TaskCompleted/{ALPHA}?subtree=true").status_code == 200
+    with app.app_context():
+        assert completed_ids() == set()
+        assert db.session.get(List, 1).completed_count == 0
+        assert_consistent()
+
+
+def test_single_toggle_updates_ancestors(app, seeded):
+    assert seeded("put", f"/TaskCompleted/{ALPHA_LEAF}").status_code == 200
+    with app.app_context():
+        assert completed_ids() == {ALPHA_TWO, ALPHA_LEAF}
+        for ancestor_id in (ALPHA, ALPHA_ONE, ALPHA_ONE_A):
+            assert completed_descendants(ancestor_id) == (2 if ancestor_id == ALPHA else 1)
+        assert db.session.get(List, 1).completed_count == 2
+        assert_consistent()
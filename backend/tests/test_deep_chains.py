@@ -0,0 +1,109 @@
+# test_deep_chains.py
+
+"""
+Tests for chains nested deeper than Python's recursion limit and the C JSON codec's.
+"""
+
+import sys
+import pytest
+from db_init import db
+from models import List, Task
+from rollups import check_rollups
+from columnar import COLUMNAR_JSON_MIMETYPE
+from traversal import dumps
+
+DEPTH = 2000
+
+# Task ID of the seeded task in list 2 (see conftest)
+GAMMA = 8
+
+
+@pytest.fixture
+def chain(seeded):
+    """
+    A chain of DEPTH tasks under the seeded task of list 2, every third one completed.
+
+    Returns:
+        list: The chain's task IDs, top first.
+    """
+    assert DEPTH > sys.getrecursionlimit()
+    tasks = [{"temp_id": 0, "name": "chain 0", "parent_id": GAMMA}]
+    tasks += [
+        {"temp_id": index, "name": f"chain {index}", "parent_ref": index - 1, "completed": index % 3 == 0}
+        for index in range(1, DEPTH)
+    ]
+    response = seeded("post", "/tasks:batch", {"tasks": tasks})
+    assert response.status_code == 201
+    return response.get_json()["ids"]
+
+
+def assert_consistent():
+    report = check_rollups()
+    assert report["tasks_drifted"] == 0 and report["lists_drifted"] == 0, report
+
+
+def nesting(body):
+    # json.loads would itself hit the recursion limit, so count the levels instead
+    return body.count(b'"subtasks":[')
+
+
+def test_deep_chain_serializes(app, seeded, chain):
+    built = seeded("get", "/GetTasks/2")
+    assert built.status_code == 200
+    assert nesting(built.get_data()) == DEPTH + 1
+
+    streamed = seeded("get", "/GetTasks/2?stream=true")
+    assert streamed.status_code == 200
+    assert streamed.get_data().rstrip(b"\n") == built.get_data()
+
+    columnar = seeded("get", "/GetTasks/2", headers={"Accept": COLUMNAR_JSON_MIMETYPE})
+    assert columnar.status_code == 200
+    assert columnar.get_json()["tasks"]["depths"][-1] == DEPTH
+
+    # Every task of both lists carries a subtasks array
+    assert nesting(seeded("get", "/GetLists?include=tasks").get_data()) == 8 + DEPTH
+
+    with app.app_context():
+        document = db.session.get(Task, GAMMA).to_dict()
+        # The provider falls back from the C encoder to the explicit-stack one
+        encoded = app.json.dumps(document, sort_keys=True, separators=(",", ":"))
+        assert encoded == dumps(document)
+        assert nesting(encoded.encode()) == DEPTH + 1
+
+
+def test_deep_nested_request_body_is_rejected(seeded):
+    # Too deep for the JSON parser: clients must send such chains in the flat format
+    body = '{"list_id": 2, "tasks": [' + '{"name": "n", "subtasks": [' * DEPTH + "]}" * DEPTH + "]}"
+    response = seeded("post", "/tasks:batch", headers={"Content-Type": "application/json"}, data=body)
+    assert response.status_code == 400
+
+
+def test_deep_chain_completion(app, seeded, chain):
+    assert seeded("put", f"/TaskCompleted/{chain[0]}?subtree=true").status_code == 200
+    with app.app_context():
+        assert db.session.get(Task, GAMMA).completed_descendant_count == DEPTH
+        assert db.session.get(List, 2).completed_count == DEPTH
+        assert_consistent()
+
+    assert seeded("put", f"/EditTask/{chain[1000]}", {"completed": False, "subtree": True}).status_code == 200
+    with app.app_context():
+        assert db.session.get(Task, chain[0]).completed_descendant_count == 999
+        assert_consistent()
+
+
+def test_deep_chain_move(app, seeded, chain):
+    assert seeded("put", f"/moveTask/{chain[1000]}", {"new_list_id": 1}).status_code == 200
+    with app.app_context():
+        moved = db.session.get(Task, chain[-1])
+        assert moved.list_id == 1 and moved.depth == DEPTH - 1000 - 1
+        assert db.session.get(Task, GAMMA).descendant_count == 1000
+        assert db.session.get(List, 1).task_count == 7 + DEPTH - 1000
+        assert_consistent()
+
+
+def test_deep_chain_delete(app, seeded, chain):
+    assert seeded("delete", f"/DeleteTask/{chain[1]}").status_code == 200
+    with app.app_context():
+        assert db.session.execute(db.select(db.func.count(Task.id)).where(Task.list_id == 2)).scalar() == 2
+        assert db.session.get(Task, GAMMA).descendant_count == 1
+        assert_consistent()
@@ -0,0 +1,128 @@
+# test_deletes.py
+
+"""
+Tests for the set-based task and list deletes, checked against what the ORM cascade
+they replaced did: the whole subtree (and nothing else) disappears, every deleted task
+gets a tombstone, and ancestor rollups, list counts and the search index stay exact.
+"""
+
+from db_init import db
+from models import List, Task, Tombstone
+from rollups import check_rollups
+from search import SEARCH_TABLE
+
+# Task IDs of the seeded tree (see conftest.TREE)
+ALPHA, BETA, ALPHA_ONE, ALPHA_TWO, BETA_ONE, ALPHA_ONE_A, ALPHA_LEAF, GAMMA = range(1, 9)
+
+
+def task_parents():
+    return dict(db.session.execute(db.select(Task.id, Task.parent_id)).all())
+
+
+def descendants_by_parent_id(parents, task_id):
+    """
+    Collect a task and its descendants by walking parent_id links, independently of paths.
+    """
+    subtree = {task_id}
+    changed = True
+    while changed:
+        changed = False
+        for child_id, parent_id in parents.items():
+            if parent_id in subtree and child_id not in subtree:
+                subtree.add(child_id)
+                changed = True
+    return subtree
+
+
+def tombstoned(entity):
+    return set(db.session.execute(
+        db.select(Tombstone.entity_id).where(Tombstone.entity == entity)
+    ).scalars())
+
+
+def indexed_rowids():
+    return set(db.session.execute(db.text(f"SELECT rowid FROM {SEARCH_TABLE}")).scalars())
+
+
+def expected_rowids():
+    task_ids = db.session.execute(db.select(Task.id)).scalars()
+    list_ids = db.session.execute(db.select(List.id)).scalars()
+    return {task_id * 2 for task_id in task_ids} | {list_id * 2 + 1 for list_id in list_ids}
+
+
+def assert_consistent():
+    report = check_rollups()
+    assert report["tasks_drifted"] == 0 and report["lists_drifted"] == 0, report
+    assert indexed_rowids() == expected_rowids()
+
+
+def add_chain(api, parent_id, length):
+    """
+    Add a chain of tasks below a task, every third one completed.
+
+    Returns:
+        list: The IDs of the chain's tasks, top first.
+    """
+    tasks = [{"temp_id": "c0", "name": "chain 0", "parent_id": parent_id}]
+    tasks += [
+        {"temp_id": f"c{index}", "name": f"chain {index}", "parent_ref": f"c{index - 1}", "completed": index % 3 == 0}
+        for index in range(1, length)
+    ]
+    response = api("post", "/tasks:batch", {"tasks": tasks})
+    assert response.status_code == 201
+    # IDs come back in request order
+    return response.get_json()["ids"]
+
+
+def test_delete_task_removes_only_that_task(app, seeded):
+    assert seeded("delete", f"/DeleteTask/{ALPHA_LEAF}").status_code == 200
+
+    with app.app_context():
+        assert set(task_parents()) == set(range(1, 9)) - {ALPHA_LEAF}
+        assert tombstoned("task") == {ALPHA_LEAF}
+        for ancestor_id in (ALPHA, ALPHA_ONE, ALPHA_ONE_A):
+            assert db.session.get(Task, ancestor_id).descendant_count == (
+                {ALPHA: 3, ALPHA_ONE: 1, ALPHA_ONE_A: 0}[ancestor_id]
+            )
+        assert db.session.get(List, 1).task_count == 6
+        assert_consistent()
+
+
+def test_delete_deep_subtree_matches_cascade(app, seeded):
+    chain = add_chain(seeded, ALPHA_TWO, 300)
+    # A branch beside the chain, which must survive
+    seeded("post", "/AddSubtasks", {"name": "survivor", "parent_id": chain[99], "list_id": 1})
+
+    with app.app_context():
+        parents = task_parents()
+        doomed = descendants_by_parent_id(parents, chain[100])
+        completed_before = db.session.get(List, 1).completed_count
+        completed_doomed = db.session.execute(
+            db.select(db.func.count(Task.id)).where(Task.id.in_(doomed), Task.completed)
+        ).scalar()
+    assert len(doomed) == 200
+
+    assert seeded("delete", f"/DeleteTask/{chain[100]}").status_code == 200
+
+    with app.app_context():
+        assert set(task_parents()) == set(parents) - doomed
+        assert tombstoned("task") == doomed
+        # The chain's top now has 99 chain tasks and the survivor below it
+        assert db.session.get(Task, chain[0]).descendant_count == 100
+        assert db.session.get(Task, ALPHA).descendant_count == 105
+        assert db.session.get(List, 1).completed_count == completed_before - completed_doomed
+        assert db.session.get(List, 2).task_count == 1
+        assert_consistent()
+
+
+def test_delete_list_removes_its_tasks_only(app, seeded):
+    add_chain(seeded, ALPHA_LEAF, 50)
+
+    assert seeded("delete", "/DeleteList/1").status_code == 200
+
+    with app.app_context():
+        assert set(task_parents()) == {GAMMA}
+        assert db.session.get(List, 1) is None
+        assert tombstoned("list") == {1}
+        assert db.session.get(List, 2).task_count == 1
+        assert_consistent()
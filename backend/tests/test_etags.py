@@ -0,0 +1,59 @@
+# test_etags.py
+
+"""
+Tests for conditional reads: ETags change with every write and never repeat for a list ID.
+"""
+
+import pytest
+
+# Task IDs of the seeded tree (see conftest.TREE)
+ALPHA = 1
+
+READS = ["/GetTasks/1", "/GetListDetails/1", f"/tasks/{ALPHA}/children", "/GetLists"]
+
+
+def conditional_get(api, path, etag):
+    return api("get", path, headers={"If-None-Match": f'"{etag}"'})
+
+
+@pytest.mark.parametrize("path", READS)
+def test_unchanged_read_is_not_modified(seeded, path):
+    etag = seeded("get", path).get_etag()[0]
+
+    response = conditional_get(seeded, path, etag)
+    assert response.status_code == 304
+    assert response.get_etag()[0] == etag
+    assert response.get_data() == b""
+
+
+@pytest.mark.parametrize("path", READS)
+def test_write_changes_etag(seeded, path):
+    etag = seeded("get", path).get_etag()[0]
+    seeded("put", f"/EditTask/{ALPHA}", {"name": "renamed"})
+
+    response = conditional_get(seeded, path, etag)
+    assert response.status_code == 200
+    assert response.get_etag()[0] != etag
+
+
+def test_write_to_other_list_keeps_etag(seeded):
+    etag = seeded("get", "/GetTasks/1").get_etag()[0]
+    seeded("post", "/AddTask/2", {"name": "elsewhere"})
+    assert conditional_get(seeded, "/GetTasks/1", etag).status_code == 304
+
+
+def test_recreated_list_id_gets_new_etags(seeded):
+    seeded("post", "/Addlists", {"name": "old"})
+    old = {path: seeded("get", path).get_etag()[0] for path in ("/GetTasks/3", "/GetListDetails/3")}
+
+    seeded("delete", "/DeleteList/3")
+    seeded("post", "/Addlists", {"name": "new"})
+    # SQLite hands the deleted list's ID to the new one
+    lists = seeded("get", "/GetLists").get_json()["lists"]
+    assert {row["id"]: row["name"] for row in lists}[3] == "new"
+
+    for path, etag in old.items():
+        response = conditional_get(seeded, path, etag)
+        assert response.status_code == 200
+        assert response.get_etag()[0] != etag
+    assert conditional_get(seeded, "/GetListDetails/3", old["/GetListDetails/3"]).get_json() == {"listName": "new"}
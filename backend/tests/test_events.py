@@ -0,0 +1,78 @@
+# test_events.py
+
+"""
+Tests for the Server-Sent Events stream, including changes committed by other worker processes.
+"""
+
+import time
+import pytest
+from conftest import BASE_URL, PASSWORD
+from events import broker
+
+
+def open_stream(app, heartbeat_seconds):
+    """
+    Open the owner's event stream from a second session.
+
+    Returns:
+        tuple: A function returning the next message as text, and the response to close.
+    """
+    app.config["EVENTS_HEARTBEAT_SECONDS"] = heartbeat_seconds
+    client = app.test_client()
+    client.post(BASE_URL + "/login", json={"login": "owner", "password": PASSWORD})
+    response = client.get(BASE_URL + "/events", buffered=False)
+    assert response.status_code == 200
+    messages = iter(response.response)
+    return lambda: next(messages).decode(), response
+
+
+@pytest.fixture
+def stream(app, seeded):
+    read, response = open_stream(app, 0.05)
+    yield read
+    response.close()
+
+
+def next_event(read, limit=100):
+    # Skip keep-alive comments, giving up after a few seconds of heartbeats
+    for _ in range(limit):
+        message = read()
+        if not message.startswith(":"):
+            return message
+    raise AssertionError("no event received")
+
+
+def test_local_write_is_delivered(seeded, stream):
+    assert next_event(stream).startswith("event: ready")
+    seeded("put", "/TaskCompleted/2")
+    assert next_event(stream).startswith("event: task_completed")
+
+
+def test_write_from_another_process_triggers_resync(seeded, stream, monkeypatch):
+    ready = next_event(stream)
+    cursor = int(ready.split("id: ")[1].split("\n")[0])
+
+    # Another worker's broker: the change is committed, but never published to this process
+    monkeypatch.setattr(broker, "publish", lambda *args: None)
+    seeded("put", "/TaskCompleted/2")
+
+    message = next_event(stream)
+    assert message.startswith("event: resync")
+    assert f"id: {cursor + 1}" in message
+
+
+def test_gap_in_delivered_sequence_triggers_resync(app, seeded, monkeypatch):
+    # A long heartbeat, so only the gap can reveal the missed change in time
+    read, response = open_stream(app, 5)
+    next_event(read)
+    publish = broker.publish
+    monkeypatch.setattr(broker, "publish", lambda *args: None)
+    seeded("put", "/TaskCompleted/2")
+    monkeypatch.setattr(broker, "publish", publish)
+    seeded("put", "/TaskCompleted/3")
+
+    started = time.monotonic()
+    assert next_event(read).startswith("event: task_completed")
+    assert next_event(read).startswith("event: resync")
+    assert time.monotonic() - started < 1
+    response.close()
@@ -0,0 +1,49 @@
+# test_instrumentation.py
+
+import logging
+import pytest
+from sqlalchemy.exc import OperationalError
+from db_init import db
+from instrumentation import configure_logging
+from server import create_app
+from conftest import BASE_URL
+
+
+def test_failed_statements_do_not_leak_timers(app):
+    with app.app_context(), db.engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql("SELECT * FROM missing_table")
+        connection.exec_driver_sql("SELECT 1")
+        assert connection.info.get("query_started") == []
+
+
+def test_metrics_are_off_by_default(api):
+    assert api("get", "/metrics").status_code == 404
+
+
+def test_metrics_require_login(tmp_path):
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'metrics.db'}",
+        "METRICS_ENABLED": True,
+        "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+    })
+    client = app.test_client()
+    assert client.get(BASE_URL + "/metrics").status_code == 401
+
+    client.post(BASE_URL + "/signup", json={"username": "u", "email": "u@example.com", "password": "p", "name": "U"})
+    client.post(BASE_URL + "/login", json={"login": "u", "password": "p"})
+    assert "endpoints" in client.get(BASE_URL + "/metrics").get_json()
+
+
+def test_host_log_handlers_are_kept():
+    root = logging.getLogger()
+    host_handler = logging.NullHandler()
+    saved = root.handlers
+    root.handlers = [host_handler]
+    try:
+        configure_logging("INFO")
+        assert root.handlers == [host_handler]
+    finally:
+        root.handlers = saved
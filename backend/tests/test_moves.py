@@ -0,0 +1,90 @@
+# test_moves.py
+
+"""
+Tests for moving a task and its subtree to another list (PUT /moveTask).
+"""
+
+from db_init import db
+from models import List, Task
+from rollups import check_rollups
+
+# Task IDs of the seeded tree (see conftest.TREE); ALPHA_TWO starts completed
+ALPHA, BETA, ALPHA_ONE, ALPHA_TWO, BETA_ONE, ALPHA_ONE_A, ALPHA_LEAF, GAMMA = range(1, 9)
+
+
+def assert_consistent():
+    report = check_rollups()
+    assert report["tasks_drifted"] == 0 and report["lists_drifted"] == 0, report
+
+
+def move(api, task_id, list_id):
+    return api("put", f"/moveTask/{task_id}", {"new_list_id": list_id})
+
+
+def test_cross_list_move_carries_the_subtree(app, seeded):
+    response = move(seeded, ALPHA_ONE, 2)
+    assert response.status_code == 200
+    assert response.get_json()["moved"] == 3
+
+    with app.app_context():
+        moved = {task.id: task for task in db.session.execute(
+            db.select(Task).where(Task.id.in_([ALPHA_ONE, ALPHA_ONE_A, ALPHA_LEAF]))
+        ).scalars()}
+        assert {task.list_id for task in moved.values()} == {2}
+        assert moved[ALPHA_ONE].parent_id is None and moved[ALPHA_ONE].depth == 0
+        assert [moved[task_id].depth for task_id in (ALPHA_ONE_A, ALPHA_LEAF)] == [1, 2]
+        assert moved[ALPHA_LEAF].path.startswith(moved[ALPHA_ONE].path)
+        # Appended after the target list's top-level tasks
+        assert moved[ALPHA_ONE].position > db.session.get(Task, GAMMA).position
+
+        assert db.session.get(Task, ALPHA).descendant_count == 1
+        assert db.session.get(List, 1).task_count == 4
+        assert db.session.get(List, 2).task_count == 4
+        assert_consistent()
+
+
+def test_completed_counts_follow_the_move(app, seeded):
+    seeded("put", f"/TaskCompleted/{ALPHA_LEAF}")
+    assert move(seeded, ALPHA, 2).status_code == 200
+
+    with app.app_context():
+        assert db.session.get(List, 1).completed_count == 0
+        assert db.session.get(List, 2).completed_count == 2
+        assert db.session.get(List, 2).task_count == 6
+        assert_consistent()
+
+
+def test_move_within_the_same_list_keeps_the_place(app, seeded):
+    with app.app_context():
+        before = {task.id: (task.position, task.path) for task in db.session.execute(db.select(Task)).scalars()}
+
+    assert move(seeded, ALPHA, 1).status_code == 200
+
+    with app.app_context():
+        after = {task.id: (task.position, task.path) for task in db.session.execute(db.select(Task)).scalars()}
+        assert after == before
+        assert_consistent()
+    tasks = seeded("get", "/GetTasks/1").get_json()["tasks"]
+    assert [task["id"] for task in tasks] == [ALPHA, BETA]
+
+
+def test_subtask_moved_within_its_list_becomes_top_level(app, seeded):
+    assert move(seeded, ALPHA_ONE_A, 1).status_code == 200
+
+    tasks = seeded("get", "/GetTasks/1").get_json()["tasks"]
+    assert [task["id"] for task in tasks] == [ALPHA, BETA, ALPHA_ONE_A]
+    with app.app_context():
+        assert db.session.get(Task, ALPHA).descendant_count == 2
+        assert_consistent()
+
+
+def test_move_keeps_search_index_in_place(app, seeded):
+    move(seeded, ALPHA_ONE, 2)
+    results = seeded("get", "/search?q=leaf").get_json()["results"]
+    assert [(result["id"], result["list_id"]) for result in results] == [(ALPHA_LEAF, 2)]
+
+
+def test_move_to_unknown_list_or_task(seeded):
+    assert move(seeded, ALPHA, 99).status_code == 404
+    assert move(seeded, 99, 2).status_code == 404
+    assert seeded("put", f"/moveTask/{ALPHA}", {}).status_code == 400
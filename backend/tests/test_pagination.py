@@ -0,0 +1,92 @@
+# test_pagination.py
+
+"""
+Tests for keyset pagination of task trees (GetTasks and a task's children).
+"""
+
+import pytest
+from db_init import db
+from models import Task
+from tree import MAX_PAGE_SIZE
+
+# Task IDs of the seeded tree (see conftest.TREE)
+ALPHA, BETA, ALPHA_ONE, ALPHA_TWO, BETA_ONE, ALPHA_ONE_A, ALPHA_LEAF, GAMMA = range(1, 9)
+
+
+def pages(api, path, limit):
+    """
+    Follow next_after cursors from the first page to the last.
+
+    Returns:
+        list: Each page's tasks.
+    """
+    result = []
+    after = ""
+    while True:
+        separator = "&" if "?" in path else "?"
+        response = api("get", f"{path}{separator}limit={limit}&depth=0&after={after}")
+        assert response.status_code == 200, response.get_json()
+        document = response.get_json()
+        result.append(document["tasks"])
+        if document["next_after"] is None:
+            return result
+        after = document["next_after"]
+
+
+@pytest.fixture
+def wide(app, seeded):
+    """
+    A third list with 23 top-level tasks, 8 of which share position 0 like legacy rows.
+
+    Returns:
+        list: The task IDs in (position, id) order.
+    """
+    seeded("post", "/Addlists", {"name": "wide"})
+    ids = seeded("post", "/tasks:batch", {"list_id": 3, "tasks": [{"name": f"t{i}"} for i in range(23)]}).get_json()["ids"]
+    legacy = ids[5:13]
+    with app.app_context():
+        db.session.execute(db.update(Task).where(Task.id.in_(legacy)).values(position=0))
+        db.session.commit()
+    return legacy + [task_id for task_id in ids if task_id not in legacy]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 5, 23, 50])
+def test_pages_cover_every_task_once_in_order(seeded, wide, limit):
+    result = pages(seeded, "/GetTasks/3", limit)
+    assert all(len(page) <= limit for page in result)
+    assert [task["id"] for page in result for task in page] == wide
+
+
+def test_children_pages(seeded):
+    ids = seeded("post", "/tasks:batch", {"tasks": [{"name": f"c{i}", "parent_id": BETA} for i in range(6)]}).get_json()["ids"]
+    result = pages(seeded, f"/tasks/{BETA}/children", 4)
+    assert [len(page) for page in result] == [4, 3]
+    assert [task["id"] for page in result for task in page] == [BETA_ONE] + ids
+
+
+def test_child_counts_of_expanded_and_collapsed_levels(seeded):
+    document = seeded("get", "/GetTasks/1?limit=1&depth=1").get_json()
+    (alpha,) = document["tasks"]
+    assert alpha["id"] == ALPHA and alpha["child_count"] == 2
+    children = {task["id"]: task for task in alpha["subtasks"]}
+    assert set(children) == {ALPHA_ONE, ALPHA_TWO}
+    # The deepest expanded level is collapsed: counted, not loaded
+    assert children[ALPHA_ONE]["child_count"] == 1 and children[ALPHA_ONE]["subtasks"] == []
+    assert children[ALPHA_TWO]["child_count"] == 0
+    assert document["next_after"] is not None
+
+    document = seeded("get", f"/GetTasks/1?limit=1&after={document['next_after']}").get_json()
+    assert [task["id"] for task in document["tasks"]] == [BETA]
+    assert document["next_after"] is None
+
+
+def test_limit_is_capped(seeded):
+    assert seeded("get", f"/GetTasks/1?limit={MAX_PAGE_SIZE * 10}").status_code == 200
+
+
+@pytest.mark.parametrize("query", [
+    "after=abc", "after=1024", "after=1024:x", "after=-1:2", "limit=0", "limit=-1", "limit=x", "depth=-1", "depth=y",
+])
+def test_invalid_page_arguments_are_rejected(seeded, query):
+    assert seeded("get", f"/GetTasks/1?{query}").status_code == 400
+    assert seeded("get", f"/tasks/{ALPHA}/children?{query}").status_code == 400
@@ -0,0 +1,142 @@
+# test_query_plans.py
+
+"""
+Query-plan regression tests for the API routes.
+
+Each test drives one route through the test client, captures the SQL it actually emits
+through the instrumentation's cursor hook, and runs every statement through EXPLAIN
+QUERY PLAN. A route fails if any statement falls back to a full scan of a model table,
+which usually means an index was dropped or a filter no longer matches one.
+"""
+
+import re
+import pytest
+from db_init import db
+from columnar import COLUMNAR_JSON_MIMETYPE
+
+# A plan line such as "SCAN task" (without an index) is a full table scan; scans of
+# CTEs (e.g. a recursive query's queue) are not, so only model tables are checked
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+
+# Statements with a query plan; transaction control and PRAGMAs have none
+EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+# Task IDs of the seeded tree (see conftest.TREE)
+ALPHA, BETA, ALPHA_ONE, ALPHA_TWO, BETA_ONE, ALPHA_ONE_A, ALPHA_LEAF, GAMMA = range(1, 9)
+
+
+def exhaust_gap(api):
+    # Alternately move two siblings first until their positions are adjacent integers
+    for index in range(12):
+        api("put", f"/reorderTask/{ALPHA if index % 2 else BETA}", {"after_id": None})
+
+
+# (name, setup, (method, path, json[, headers])) for every route; setup runs uncaptured
+ROUTES = [
+    ("current_user", None, ("get", "/current_user", None)),
+    ("login", None, ("post", "/login", {"login": "owner@example.com", "password": "test-password"})),
+    (
+        "signup",
+        None,
+        ("post", "/signup", {"username": "other", "email": "other@example.com", "password": "x", "name": "Other"}),
+    ),
+    ("GetLists", None, ("get", "/GetLists", None)),
+    ("GetLists?include=tasks", None, ("get", "/GetLists?include=tasks", None)),
+    ("GetLists?include=tasks&stream=true", None, ("get", "/GetLists?include=tasks&stream=true", None)),
+    (
+        "GetLists?include=tasks (columnar)",
+        None,
+        ("get", "/GetLists?include=tasks", None, {"Accept": COLUMNAR_JSON_MIMETYPE}),
+    ),
+    ("GetTasks", None, ("get", "/GetTasks/1", None)),
+    ("GetTasks?stream=true", None, ("get", "/GetTasks/1?stream=true", None)),
+    ("GetTasks?limit", None, ("get", "/GetTasks/1?limit=1&depth=1", None)),
+    ("GetTasks?after", None, ("get", f"/GetTasks/1?limit=1&after=1024:{ALPHA}", None)),
+    ("GetTasks (columnar)", None, ("get", "/GetTasks/1", None, {"Accept": COLUMNAR_JSON_MIMETYPE})),
+    ("children", None, ("get", f"/tasks/{ALPHA}/children?depth=1", None)),
+    ("GetListDetails", None, ("get", "/GetListDetails/1", None)),
+    ("getUserIdByListId", None, ("get", "/getUserIdByListId/1", None)),
+    ("AddTask", None, ("post", "/AddTask/1", {"name": "new"})),
+    ("AddSubtasks", None, ("post", "/AddSubtasks", {"name": "new", "parent_id": ALPHA_ONE, "list_id": 1})),
+    (
+        "tasks:batch",
+        None,
+        ("post", "/tasks:batch", {"list_id": 1, "tasks": [{"name": "new", "subtasks": [{"name": "child"}]}]}),
+    ),
+    (
+        "tasks:batch under an existing task",
+        None,
+        ("post", "/tasks:batch", {"tasks": [{"name": "new", "parent_id": ALPHA_ONE_A}]}),
+    ),
+    ("EditTask", None, ("put", f"/EditTask/{ALPHA_ONE}", {"name": "renamed"})),
+    ("EditTask subtree", None, ("put", f"/EditTask/{ALPHA}", {"completed": True, "subtree": True})),
+    ("TaskCompleted", None, ("put", f"/TaskCompleted/{ALPHA_ONE_A}", None)),
+    ("TaskCompleted?subtree=true", None, ("put", f"/TaskCompleted/{ALPHA}?subtree=true", None)),
+    ("reorderTask", None, ("put", f"/reorderTask/{BETA}", {"after_id": None})),
+    ("reorderTask (renumbering)", exhaust_gap, ("put", f"/reorderTask/{BETA}", {"after_id": None})),
+    ("moveTask", None, ("put", f"/moveTask/{ALPHA}", {"new_list_id": 2})),
+    ("DeleteTask", None, ("delete", f"/DeleteTask/{ALPHA_ONE}", None)),
+    ("Addlists", None, ("post", "/Addlists", {"name": "third"})),
+    ("EditList", None, ("put", "/EditList/1", {"name": "renamed"})),
+    ("DeleteList", None, ("delete", "/DeleteList/1", None)),
+    ("search", None, ("get", "/search?q=alpha", None)),
+    ("changes", None, ("get", "/changes", None)),
+    ("changes?since", None, ("get", "/changes?since=2", None)),
+    ("logout", None, ("post", "/logout", None)),
+]
+
+
+def explain(statement, parameters):
+    """
+    Run EXPLAIN QUERY PLAN for a captured statement.
+
+    Returns:
+        list: The 'detail' column of every plan row.
+    """
+    with db.engine.connect() as connection:
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+    return [row[-1] for row in rows]
+
+
+def full_scans(statements):
+    """
+    Explain captured statements and collect those scanning a whole model table.
+
+    Args:
+        statements (list): Captured (statement, parameters) pairs.
+
+    Returns:
+        list: Each offending statement followed by its plan.
+    """
+    failures = []
+    for statement, parameters in statements:
+        if not statement.lstrip().upper().startswith(EXPLAINABLE):
+            continue
+        plan = explain(statement, parameters)
+        scanned = [match.group(1) for match in map(FULL_SCAN.match, plan) if match]
+        if any(table in db.metadata.tables for table in scanned):
+            failures.append(f"{statement}\n    " + "\n    ".join(plan))
+    return failures
+
+
+@pytest.mark.parametrize("name, setup, request_args", ROUTES, ids=[route[0] for route in ROUTES])
+def test_route_queries_use_indexes(app, seeded, statements, name, setup, request_args):
+    if setup is not None:
+        setup(seeded)
+    statements.clear()
+
+    response = seeded(*request_args)
+    # Streamed bodies only run their queries while they are read
+    response.get_data()
+    assert response.status_code < 400, response.get_data(as_text=True)
+
+    with app.app_context():
+        failures = full_scans(statements)
+    assert not failures, "full table scans:\n" + "\n".join(failures)
+
+
+def test_unindexed_filter_is_reported(app, statements):
+    # Task names are not indexed, so filtering on one alone must be flagged
+    with app.app_context():
+        db.session.execute(db.text("SELECT id FROM task WHERE name = :name"), {"name": "alpha"})
+        assert len(full_scans(statements)) == 1
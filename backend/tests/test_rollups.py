@@ -0,0 +1,66 @@
+# test_rollups.py
+
+"""
+Tests for rollup counts of deep trees, whose ancestors outnumber SQLite's bound-parameter limit.
+"""
+
+import sqlite3
+import pytest
+from sqlalchemy import event
+from db_init import db
+from models import List, Task
+from rollups import check_rollups
+
+DEPTH = 60
+# Far fewer bound parameters than a chain of DEPTH tasks has ancestors
+VARIABLE_LIMIT = 20
+
+
+@pytest.fixture
+def limited(app, seeded):
+    """
+    The seeded API, with connections that accept at most VARIABLE_LIMIT bound parameters
+    per statement, and a chain of DEPTH tasks under list 2's task.
+
+    Returns:
+        list: The chain's task IDs, top first.
+    """
+    tasks = [{"temp_id": 0, "name": "chain 0", "parent_id": 8}]
+    tasks += [{"temp_id": index, "name": f"chain {index}", "parent_ref": index - 1} for index in range(1, DEPTH)]
+    chain = seeded("post", "/tasks:batch", {"tasks": tasks}).get_json()["ids"]
+
+    def limit_variables(dbapi_connection, connection_record):
+        dbapi_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, VARIABLE_LIMIT)
+
+    with app.app_context():
+        event.listen(db.engine, "connect", limit_variables)
+        db.engine.dispose()
+    yield chain
+    with app.app_context():
+        event.remove(db.engine, "connect", limit_variables)
+
+
+def assert_consistent():
+    report = check_rollups()
+    assert report["tasks_drifted"] == 0 and report["lists_drifted"] == 0, report
+
+
+def test_deep_completion_updates_every_ancestor(app, seeded, limited):
+    assert seeded("put", f"/TaskCompleted/{limited[-1]}").status_code == 200
+
+    with app.app_context():
+        assert db.session.get(Task, limited[0]).completed_descendant_count == 1
+        assert db.session.get(Task, 8).completed_descendant_count == 1
+        assert db.session.get(List, 2).completed_count == 1
+        assert_consistent()
+
+
+def test_deep_add_delete_and_move_keep_rollups_exact(app, seeded, limited):
+    assert seeded("post", "/AddSubtasks", {"name": "leaf", "parent_id": limited[-1], "list_id": 2}).status_code == 200
+    assert seeded("delete", f"/DeleteTask/{limited[-10]}").status_code == 200
+    assert seeded("put", f"/moveTask/{limited[-20]}", {"new_list_id": 1}).status_code == 200
+
+    with app.app_context():
+        assert db.session.get(Task, 8).descendant_count == DEPTH - 20
+        assert db.session.get(List, 1).task_count == 7 + 10
+        assert_consistent()
@@ -0,0 +1,101 @@
+# test_search.py
+
+"""
+Tests for full-text search: per-user scoping and the triggers that keep the index in sync.
+"""
+
+import pytest
+from conftest import BASE_URL, PASSWORD
+from db_init import db
+from search import SEARCH_TABLE
+
+# Task IDs assigned by the seeded fixture
+ALPHA, ALPHA_ONE, ALPHA_ONE_A, ALPHA_LEAF, GAMMA = 1, 3, 6, 7, 8
+
+
+@pytest.fixture
+def intruder(app, seeded):
+    """
+    A second user whose list and task names share words with the owner's.
+
+    Returns:
+        callable: intruder(method, path, json=None) calling the API as that user.
+    """
+    client = app.test_client()
+
+    def call(method, path, json=None):
+        return getattr(client, method)(BASE_URL + path, json=json)
+
+    call("post", "/signup", {"username": "intruder", "email": "intruder@example.com", "password": PASSWORD, "name": "I"})
+    call("post", "/login", {"login": "intruder", "password": PASSWORD})
+    assert call("post", "/Addlists", {"name": "alpha secrets"}).status_code == 200
+    assert call("post", "/AddTask/3", {"name": "alpha hidden"}).status_code == 200
+    return call
+
+
+def search(api, query):
+    response = api("get", f"/search?q={query}")
+    assert response.status_code == 200
+    return {(hit["type"], hit["id"]): hit for hit in response.get_json()["results"]}
+
+
+def index_rows(app):
+    with app.app_context():
+        return sorted(db.session.execute(db.text(f"SELECT rowid, name, owner FROM {SEARCH_TABLE}")).all())
+
+
+def table_rows(app):
+    """
+    The index rows rebuild_search_index would write for the current tables.
+    """
+    with app.app_context():
+        return sorted(db.session.execute(db.text(
+            "SELECT task.id * 2, task.name, 'u' || list.user_id FROM task JOIN list ON list.id = task.list_id "
+            "UNION ALL SELECT list.id * 2 + 1, list.name, 'u' || list.user_id FROM list"
+        )).all())
+
+
+def test_results_are_scoped_to_the_owner(seeded, intruder):
+    hits = search(seeded, "alpha")
+    assert set(hits) == {("task", task_id) for task_id in (1, 3, 4, 6, 7)}
+    assert search(intruder, "alpha").keys() == {("list", 3), ("task", 9)}
+
+    # Owner tokens and query operators are only ever matched against names
+    for query in ["u2", "owner", "hidden", "alpha OR owner:u2", "owner : u2", '"u2"', "secrets*"]:
+        assert search(seeded, query) == {}, query
+
+
+def test_task_hits_carry_list_and_ancestors(seeded):
+    hit = search(seeded, "leaf")[("task", ALPHA_LEAF)]
+    assert hit["list_id"] == 1 and hit["list_name"] == "first"
+    assert [ancestor["name"] for ancestor in hit["ancestors"]] == ["alpha", "alpha one", "alpha one a"]
+
+
+def test_index_follows_edits_deletes_and_moves(app, seeded, intruder):
+    assert index_rows(app) == table_rows(app)
+
+    seeded("put", f"/EditTask/{ALPHA_ONE_A}", {"name": "renamed node"})
+    assert ("task", ALPHA_ONE_A) not in search(seeded, "alpha")
+    assert search(seeded, "renamed").keys() == {("task", ALPHA_ONE_A)}
+    assert index_rows(app) == table_rows(app)
+
+    # The subtree's list_id changes in one set-based UPDATE
+    assert seeded("put", f"/moveTask/{ALPHA_ONE}", {"new_list_id": 2}).status_code == 200
+    hit = search(seeded, "leaf")[("task", ALPHA_LEAF)]
+    assert hit["list_id"] == 2 and hit["list_name"] == "second"
+    assert index_rows(app) == table_rows(app)
+
+    # The whole subtree goes in one set-based DELETE
+    assert seeded("delete", f"/DeleteTask/{ALPHA}").status_code == 200
+    assert search(seeded, "alpha").keys() == {("task", ALPHA_ONE), ("task", ALPHA_LEAF)}
+    assert index_rows(app) == table_rows(app)
+
+    seeded("put", "/EditList/2", {"name": "errands"})
+    assert search(seeded, "errands").keys() == {("list", 2)}
+    assert seeded("delete", "/DeleteList/2").status_code == 200
+    assert search(seeded, "errands") == {} and search(seeded, "leaf") == {}
+    assert ("task", GAMMA) not in {row[0] for row in index_rows(app)}
+    assert index_rows(app) == table_rows(app)
+
+    # The other user's names were never touched
+    assert search(intruder, "alpha").keys() == {("list", 3), ("task", 9)}
@@ -0,0 +1,25 @@
+# test_streaming.py
+
+"""
+Tests for streamed task trees, which must be the same documents as the ones built in memory.
+"""
+
+import json
+
+# Task IDs of the seeded tree (see conftest.TREE)
+ALPHA, BETA, ALPHA_ONE, ALPHA_TWO = range(1, 5)
+
+
+def test_streamed_tree_matches_built_tree_after_reorders(seeded):
+    # Put siblings out of ID order, so position (not ID) decides the order
+    seeded("put", f"/reorderTask/{BETA}", {"after_id": None})
+    seeded("put", f"/reorderTask/{ALPHA_TWO}", {"after_id": None})
+
+    for path in ("/GetTasks/1", "/GetLists?include=tasks"):
+        built = seeded("get", path).get_json()
+        streamed = json.loads(seeded("get", path + ("&" if "?" in path else "?") + "stream=true").get_data())
+        assert streamed == built
+
+    tasks = seeded("get", "/GetTasks/1").get_json()["tasks"]
+    assert [task["id"] for task in tasks] == [BETA, ALPHA]
+    assert [task["id"] for task in tasks[1]["subtasks"]] == [ALPHA_TWO, ALPHA_ONE]
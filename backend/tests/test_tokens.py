@@ -0,0 +1,108 @@
+# test_tokens.py
+
+"""
+Tests for bearer access tokens: issue, scopes, expiry and revocation across worker processes.
+"""
+
+import pytest
+from conftest import BASE_URL
+from tokens import denylist
+
+
+@pytest.fixture
+def app_config():
+    return {"API_TOKENS_ENABLED": True}
+
+
+@pytest.fixture
+def issue(seeded):
+    """
+    Issue tokens through the password session.
+
+    Returns:
+        callable: issue(scopes) returning the token.
+    """
+    def issue_token(scopes=("read", "write")):
+        response = seeded("post", "/tokens", {"scopes": list(scopes)})
+        assert response.status_code == 201
+        return response.get_json()["token"]
+
+    return issue_token
+
+
+@pytest.fixture
+def bearer(app):
+    """
+    Call the API with a token only, from a client without a session cookie.
+
+    Returns:
+        callable: bearer(token, method, path, json=None) returning the response.
+    """
+    client = app.test_client()
+
+    def call(token, method, path, json=None):
+        return getattr(client, method)(BASE_URL + path, json=json, headers={"Authorization": f"Bearer {token}"})
+
+    return call
+
+
+def test_token_authenticates_reads_and_writes(issue, bearer):
+    token = issue()
+    assert bearer(token, "get", "/GetTasks/1").status_code == 200
+    assert bearer(token, "post", "/AddTask/1", {"name": "by token"}).status_code == 200
+    assert bearer(token, "get", "/current_user").get_json()["username"] == "owner"
+
+
+def test_read_scope_cannot_write(issue, bearer):
+    token = issue(["read"])
+    assert bearer(token, "get", "/GetLists").status_code == 200
+    for method, path, body in [
+        ("post", "/AddTask/1", {"name": "x"}),
+        ("put", "/EditTask/1", {"name": "x"}),
+        ("delete", "/DeleteTask/1", None),
+        ("post", "/Addlists", {"name": "x"}),
+    ]:
+        response = bearer(token, method, path, body)
+        assert response.status_code == 403, path
+        assert "write" in response.get_json()["error"]
+
+
+def test_write_scope_cannot_read(issue, bearer):
+    token = issue(["write"])
+    assert bearer(token, "get", "/GetLists").status_code == 403
+    assert bearer(token, "put", "/EditTask/1", {"name": "x"}).status_code == 200
+
+
+def test_invalid_and_expired_tokens_are_rejected(app, issue, bearer):
+    token = issue()
+    assert bearer(token[:-2] + "xx", "get", "/GetLists").status_code == 401
+    assert bearer("", "get", "/GetLists").status_code == 401
+
+    app.config["API_TOKEN_TTL"] = -1
+    assert bearer(token, "get", "/GetLists").status_code == 401
+
+
+def test_unknown_scopes_and_token_issued_tokens_are_refused(seeded, issue, bearer):
+    assert seeded("post", "/tokens", {"scopes": ["admin"]}).status_code == 400
+    assert bearer(issue(), "post", "/tokens", {}).status_code == 403
+
+
+def test_revoked_token_is_rejected_by_every_worker(issue, bearer):
+    token = issue(["read"])
+    other = issue(["read"])
+    # A read-only token may still revoke itself
+    assert bearer(token, "post", "/tokens/revoke", {}).status_code == 200
+    assert bearer(token, "get", "/GetLists").status_code == 401
+
+    # Another worker process has never seen the revocation in memory
+    denylist._revoked.clear()
+    denylist._expiry.clear()
+    assert bearer(token, "get", "/GetLists").status_code == 401
+    assert bearer(other, "get", "/GetLists").status_code == 200
+
+
+def test_revoke_by_session(seeded, issue, bearer):
+    token = issue()
+    assert seeded("post", "/tokens/revoke", {"token": token}).status_code == 200
+    assert bearer(token, "get", "/GetLists").status_code == 401
+    assert seeded("post", "/tokens/revoke", {}).status_code == 400
@@ -0,0 +1,100 @@
+# test_transactions.py
+
+"""
+Tests for SQLite write transactions: write requests take the write lock before reading,
+so concurrent writers queue up instead of overwriting each other's changes.
+"""
+
+import sqlite3
+import threading
+import time
+import pytest
+from conftest import PASSWORD
+from db_init import db
+from models import Task
+from passwords import password_hasher
+
+
+def outside_connection(app, timeout=0.0):
+    """
+    Open a connection to the test database that does not go through the app, like another worker's.
+    """
+    with app.app_context():
+        path = db.engine.url.database
+    return sqlite3.connect(path, timeout=timeout, isolation_level=None)
+
+
+def try_write(app):
+    """
+    Check whether another connection could take the write lock right now, without waiting.
+    """
+    connection = outside_connection(app)
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        connection.execute("ROLLBACK")
+        return True
+    except sqlite3.OperationalError as e:
+        assert "locked" in str(e)
+        return False
+    finally:
+        connection.close()
+
+
+@pytest.mark.parametrize("method, locked", [("POST", True), ("PUT", True), ("DELETE", True), ("GET", False)])
+def test_write_requests_lock_before_reading(app, seeded, method, locked):
+    with app.test_request_context(method=method):
+        db.session.execute(db.select(Task.name).where(Task.id == 1)).scalar()
+        assert try_write(app) is not locked
+        db.session.rollback()
+    assert try_write(app)
+
+
+def test_read_then_write_waits_for_a_concurrent_writer(app, seeded):
+    errors = []
+
+    def concurrent_edit():
+        # Waits for the request's lock instead of committing between its read and its write
+        connection = outside_connection(app, timeout=5.0)
+        try:
+            connection.execute("UPDATE task SET name = name || ' by other worker' WHERE id = 1")
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    with app.test_request_context(method="PUT"):
+        name = db.session.execute(db.select(Task.name).where(Task.id == 1)).scalar()
+        writer = threading.Thread(target=concurrent_edit)
+        writer.start()
+        time.sleep(0.2)
+        db.session.execute(db.update(Task).where(Task.id == 1).values(name=name + " edited"))
+        db.session.commit()
+    writer.join()
+
+    # Neither update is lost
+    assert errors == []
+    with app.app_context():
+        assert db.session.get(Task, 1).name == "alpha edited by other worker"
+
+
+def test_outside_requests_transactions_stay_deferred(app, seeded):
+    with app.app_context():
+        db.session.execute(db.select(Task.name).where(Task.id == 1)).scalar()
+        assert try_write(app)
+        db.session.execute(db.update(Task).where(Task.id == 1).values(name="alpha"))
+        assert not try_write(app)
+        db.session.rollback()
+
+
+def test_login_holds_no_lock_while_checking_the_password(app, api, monkeypatch):
+    verify = password_hasher.verify
+    writable = []
+
+    def checking_verify(password_hash, password):
+        writable.append(try_write(app))
+        return verify(password_hash, password)
+
+    monkeypatch.setattr(password_hasher, "verify", checking_verify)
+    assert api("post", "/login", {"login": "owner", "password": PASSWORD}).status_code == 200
+    assert api("post", "/login", {"login": "owner", "password": "wrong"}).status_code == 400
+    assert writable == [True, True]
@@ -0,0 +1,27 @@
+# test_tree_cache.py
+
+import os
+from tree_cache import FileCacheBackend
+
+
+def test_file_backend_evicts_least_recently_used(tmp_path):
+    # Room for three entries of 100 payload bytes and their version line
+    backend = FileCacheBackend(str(tmp_path), max_bytes=350)
+    for list_id in range(3):
+        backend.set((1, list_id), 1, b"x" * 100)
+        # Modification times must differ for the order to be deterministic
+        os.utime(backend._path((1, list_id)), ns=(list_id * 10**9, list_id * 10**9))
+
+    # Reading the oldest entry makes it the most recently used one
+    assert backend.get((1, 0)) == (1, b"x" * 100)
+    backend.set((1, 3), 1, b"x" * 100)
+
+    assert backend.get((1, 1)) is None
+    assert all(backend.get((1, list_id)) is not None for list_id in (0, 2, 3))
+    assert backend.stats()["evictions"] == 1
+
+
+def test_file_backend_skips_payloads_over_budget(tmp_path):
+    backend = FileCacheBackend(str(tmp_path), max_bytes=50)
+    backend.set((1, 1), 1, b"x" * 100)
+    assert backend.get((1, 1)) is None
@@ -0,0 +1,84 @@
+# test_user_cache.py
+
+"""
+Tests for the per-process cache of logged-in identities: expiry, eviction, invalidation
+and its default under several worker processes.
+"""
+
+import user_cache as user_cache_module
+from db_init import db
+from models import User
+from server import create_app, default_user_cache_size
+from user_cache import CachedUser, UserCache, load_cached_user, user_cache
+
+
+def identity(user_id):
+    return CachedUser(user_id, f"user{user_id}", f"user{user_id}@example.com", "User")
+
+
+def test_identity_expires_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(user_cache_module.time, "monotonic", lambda: now[0])
+    cache = UserCache(max_size=4, ttl=30.0)
+    cache.put(identity(1))
+
+    now[0] += 29.9
+    assert cache.get(1).username == "user1"
+    now[0] += 0.1
+    assert cache.get(1) is None
+
+
+def test_least_recently_used_identity_is_evicted():
+    cache = UserCache(max_size=2, ttl=30.0)
+    cache.put(identity(1))
+    cache.put(identity(2))
+    cache.get(1)
+    cache.put(identity(3))
+    assert cache.get(2) is None
+    assert cache.get(1) is not None and cache.get(3) is not None
+
+    disabled = UserCache(max_size=0, ttl=30.0)
+    disabled.put(identity(1))
+    assert disabled.get(1) is None
+
+
+def test_update_and_delete_invalidate_the_cached_identity(app, api):
+    assert api("get", "/current_user").get_json()["email"] == "owner@example.com"
+    assert user_cache.get(1) is not None
+
+    with app.app_context():
+        db.session.get(User, 1).email = "renamed@example.com"
+        db.session.commit()
+    assert user_cache.get(1) is None
+    assert api("get", "/current_user").get_json()["email"] == "renamed@example.com"
+
+    with app.app_context():
+        db.session.delete(db.session.get(User, 1))
+        db.session.commit()
+        assert user_cache.get(1) is None
+        assert load_cached_user(1) is None
+    assert api("get", "/current_user").status_code == 401
+
+
+def test_cache_is_off_under_several_workers(tmp_path, monkeypatch, statements):
+    monkeypatch.delenv("USER_CACHE_SIZE", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert default_user_cache_size() > 0
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "4")
+    assert default_user_cache_size() == 0
+    app = create_app({
+        "TESTING": True,
+        "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'workers.db'}",
+        "LOG_LEVEL": "WARNING",
+    })
+    assert app.config["USER_CACHE_SIZE"] == 0
+
+    with app.app_context():
+        db.session.add(User(username="u", email="u@example.com", name="U", password_hash="x"))
+        db.session.commit()
+        load_cached_user(1)
+        before = len(statements)
+        # Every load reads the row again, so changes made by other workers are seen at once
+        assert load_cached_user(1).username == "u"
+        assert len(statements) == before + 1
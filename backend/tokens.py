@@ -0,0 +1,213 @@
+# tokens.py
+
+import heapq
+import secrets
+import threading
+import time
+from flask import abort, current_app, jsonify
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from db_init import db
+from models import RevokedToken
+from user_cache import CachedUser
+
+# 'read' covers GET/HEAD/OPTIONS requests, 'write' every other method
+SCOPES = ("read", "write")
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Endpoints any valid token may call, so that read-only tokens can revoke themselves
+UNSCOPED_ENDPOINTS = frozenset({"auth_bp.revoke_token"})
+
+# Separates token signatures from other uses of SECRET_KEY (such as session cookies)
+TOKEN_SALT = "api-token"
+
+
+class TokenIdentity(CachedUser):
+    """
+    Identity of a request authenticated by an access token, built from the token alone.
+
+    Attributes:
+        scopes (frozenset): The scopes granted to the token.
+        token_id (str): The token's unique ID, used to revoke it.
+        expires_at (float): UNIX time at which the token expires.
+    """
+
+    def __init__(self, id, username, email, name, scopes, token_id, expires_at):
+        super().__init__(id, username, email, name)
+        self.scopes = frozenset(scopes)
+        self.token_id = token_id
+        self.expires_at = expires_at
+
+
+class TokenDenylist:
+    """
+    Set of revoked token IDs, stored in the database so that every worker process sees them.
+
+    A token is checked with one primary-key lookup; IDs already known to be revoked are
+    answered from memory. Each entry is kept only until its token would have expired
+    anyway, so the table holds at most the tokens revoked within one token lifetime.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Revocations seen by this process, token_id -> expires_at
+        self._revoked = {}
+        # (expires_at, token_id) pairs, earliest first, for pruning
+        self._expiry = []
+
+    def revoke(self, token_id, user_id, expires_at):
+        """
+        Deny a token until it expires, in the current transaction.
+
+        Args:
+            token_id (str): The token's unique ID.
+            user_id (int): The ID of the token's user.
+            expires_at (float): UNIX time at which the token expires.
+        """
+        now = time.time()
+        db.session.execute(
+            db.delete(RevokedToken)
+            .where(RevokedToken.expires_at <= now)
+            .execution_options(synchronize_session=False)
+        )
+        if db.session.get(RevokedToken, token_id) is None:
+            db.session.add(RevokedToken(token_id=token_id, user_id=user_id, expires_at=expires_at))
+        self._remember(token_id, expires_at, now)
+
+    def is_revoked(self, token_id):
+        """
+        Check whether a token was revoked, by any worker process.
+
+        Args:
+            token_id (str): The token's unique ID.
+
+        Returns:
+            bool: True if the token is revoked.
+        """
+        with self._lock:
+            if token_id in self._revoked:
+                return True
+
+        row = db.session.get(RevokedToken, token_id)
+        if row is None:
+            return False
+        self._remember(token_id, row.expires_at, time.time())
+        return True
+
+    def _remember(self, token_id, expires_at, now):
+        with self._lock:
+            self._prune(now)
+            if token_id not in self._revoked:
+                self._revoked[token_id] = expires_at
+                heapq.heappush(self._expiry, (expires_at, token_id))
+
+    def _prune(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, token_id = heapq.heappop(self._expiry)
+            self._revoked.pop(token_id, None)
+
+    def stats(self):
+        with self._lock:
+            self._prune(time.time())
+            return {"revoked_cached": len(self._revoked)}
+
+
+# Shared by the token routes and the request loader
+denylist = TokenDenylist()
+
+
+def token_serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt=TOKEN_SALT)
+
+
+def issue_token(user, scopes):
+    """
+    Sign an access token carrying a user's identity and scopes.
+
+    Args:
+        user: The user (exposing id, username, email and name).
+        scopes (iterable): Scopes to grant, a subset of SCOPES.
+
+    Returns:
+        tuple: The token and its unique ID.
+    """
+    token_id = secrets.token_urlsafe(12)
+    token = token_serializer().dumps({
+        "uid": user.id,
+        "usr": user.username,
+        "eml": user.email,
+        "nam": user.name,
+        "scp": sorted(scopes),
+        "jti": token_id,
+    })
+    return token, token_id
+
+
+def read_token(token):
+    """
+    Verify an access token's signature, age and revocation, with at most one primary-key lookup.
+
+    Args:
+        token (str): The token.
+
+    Returns:
+        TokenIdentity: The identity carried by the token, or None if the token is invalid,
+            expired or revoked.
+    """
+    ttl = current_app.config["API_TOKEN_TTL"]
+    try:
+        claims, issued_at = token_serializer().loads(token, max_age=ttl, return_timestamp=True)
+    except (BadSignature, SignatureExpired):
+        return None
+
+    if denylist.is_revoked(claims["jti"]):
+        return None
+
+    return TokenIdentity(
+        claims["uid"],
+        claims["usr"],
+        claims["eml"],
+        claims["nam"],
+        claims["scp"],
+        claims["jti"],
+        issued_at.timestamp() + ttl,
+    )
+
+
+def bearer_token(request):
+    """
+    Extract the token of an 'Authorization: Bearer <token>' header.
+
+    Returns:
+        str: The token, or None if the request carries none.
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def load_token_user(request):
+    """
+    Flask-Login request loader authenticating API clients by access token.
+
+    Args:
+        request: The current request.
+
+    Returns:
+        TokenIdentity: The token's identity, or None if the request carries no valid token.
+            A valid token lacking the scope the request's method needs aborts with HTTP 403.
+    """
+    token = bearer_token(request)
+    if token is None:
+        return None
+
+    identity = read_token(token)
+    if identity is None:
+        return None
+
+    needed = "read" if request.method in READ_METHODS else "write"
+    if needed not in identity.scopes and request.endpoint not in UNSCOPED_ENDPOINTS:
+        response = jsonify({"error": f"The access token lacks the '{needed}' scope."})
+        response.status_code = 403
+        abort(response)
+    return identity
@@ -0,0 +1,139 @@
+# traversal.py
+
+import json
+from flask.json.provider import DefaultJSONProvider
+
+# Tasks nest without limit, while Python recursion (and the C JSON codec) stops at about
+# a thousand levels. Everything here walks trees with an explicit stack instead, so
+# arbitrarily deep hierarchies use heap memory proportional to the tree, not call frames.
+
+
+def iter_preorder(roots, children):
+    """
+    Walk trees depth-first, yielding every node before its children.
+
+    Args:
+        roots (iterable): The root nodes, in order.
+        children (callable): Returns the ordered children of a node.
+
+    Yields:
+        tuple: (node, level) pairs, where level is 0 for the roots.
+    """
+    stack = [(root, 0) for root in reversed(list(roots))]
+    while stack:
+        node, level = stack.pop()
+        yield node, level
+        stack.extend((child, level + 1) for child in reversed(list(children(node))))
+
+
+def build_nested(root, children, serialize, key="subtasks"):
+    """
+    Serialize a tree into nested dictionaries.
+
+    Args:
+        root: The root node.
+        children (callable): Returns the ordered children of a node.
+        serialize (callable): Returns the dictionary of one node, without its children.
+        key (str): The key under which each dictionary lists its children's dictionaries.
+
+    Returns:
+        dict: The root's dictionary.
+    """
+    result = serialize(root)
+    result[key] = []
+    stack = [(root, result)]
+    while stack:
+        node, node_dict = stack.pop()
+        for child in children(node):
+            child_dict = serialize(child)
+            child_dict[key] = []
+            node_dict[key].append(child_dict)
+            stack.append((child, child_dict))
+    return result
+
+
+class _Fragment(str):
+    """
+    Already-encoded JSON text waiting on the encoder's stack.
+    """
+
+
+def _encode_key(key):
+    # JSON object keys are strings; other scalars are converted the way json.dumps does
+    return json.dumps(key if isinstance(key, str) else json.dumps(key))
+
+
+def iter_json(value, default=None):
+    """
+    Encode a value as compact JSON with sorted keys, however deeply it nests.
+
+    The output matches json.dumps(value, sort_keys=True, separators=(",", ":")).
+
+    Args:
+        value: The value to encode.
+        default (callable, optional): Converts objects JSON cannot encode, as in json.dumps.
+
+    Yields:
+        str: JSON fragments; joined, they form the document.
+
+    Raises:
+        TypeError: If an object cannot be encoded.
+    """
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if type(item) is _Fragment:
+            yield item
+        elif isinstance(item, dict):
+            if not item:
+                yield "{}"
+                continue
+            stack.append(_Fragment("}"))
+            entries = sorted(item.items())
+            for index in range(len(entries) - 1, -1, -1):
+                key, entry = entries[index]
+                stack.append(entry)
+                stack.append(_Fragment(("," if index else "{") + _encode_key(key) + ":"))
+        elif isinstance(item, (list, tuple)):
+            if not item:
+                yield "[]"
+                continue
+            stack.append(_Fragment("]"))
+            for index in range(len(item) - 1, -1, -1):
+                stack.append(item[index])
+                stack.append(_Fragment("," if index else "["))
+        elif item is None or isinstance(item, (str, int, float)):
+            yield json.dumps(item)
+        elif default is not None:
+            stack.append(default(item))
+        else:
+            raise TypeError(f"Object of type {type(item).__name__} is not JSON serializable")
+
+
+def dumps(value, default=None):
+    """
+    Encode a value with iter_json and return the document as one string.
+    """
+    return "".join(iter_json(value, default))
+
+
+class DeepJSONProvider(DefaultJSONProvider):
+    """
+    The app's JSON provider, able to encode and reject task trees of any depth.
+
+    The C encoder is used first; documents nested too deeply for it are encoded again
+    with iter_json. Request bodies nested too deeply to decode are rejected
+    like malformed JSON (HTTP 400) instead of raising RecursionError.
+    """
+
+    def dumps(self, obj, **kwargs):
+        try:
+            return super().dumps(obj, **kwargs)
+        except RecursionError:
+            return dumps(obj, default=kwargs.get("default", self.default))
+
+    def loads(self, s, **kwargs):
+        try:
+            return super().loads(s, **kwargs)
+        except RecursionError:
+            raise ValueError("JSON document is nested too deeply; send deep batches in the flat format.")
@@ -0,0 +1,387 @@
+# tree.py
+
+from db_init import db
+from models import List, Task
+from hierarchy import in_any_subtree
+from traversal import iter_preorder
+
+# Page size of top-level tasks (or children) when the client does not choose one
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Subtask levels expanded below each paged task when the client does not choose
+DEFAULT_EXPAND_DEPTH = 1
+
+# Columns needed to serialize a task; selecting plain columns avoids building ORM instances
+TASK_COLUMNS = (
+    Task.id,
+    Task.name,
+    Task.parent_id,
+    Task.list_id,
+    Task.depth,
+    Task.completed,
+    Task.position,
+    Task.descendant_count,
+    Task.completed_descendant_count,
+)
+
+
+def task_rows_query(list_ids):
+    """
+    Build the query selecting every task belonging to the given lists.
+
+    Args:
+        list_ids (list): IDs of the lists whose tasks should be loaded.
+
+    Returns:
+        Select: A statement over TASK_COLUMNS, ordered by sibling position.
+    """
+    return (
+        db.select(*TASK_COLUMNS)
+        .where(Task.list_id.in_(list_ids))
+        .order_by(Task.position, Task.id)
+    )
+
+
+def fetch_task_rows(list_ids):
+    """
+    Fetch every task belonging to the given lists in a single query.
+
+    Args:
+        list_ids (iterable): IDs of the lists whose tasks should be loaded.
+
+    Returns:
+        list: Row objects exposing the columns in TASK_COLUMNS, ordered by sibling position.
+    """
+    list_ids = list(list_ids)
+    if not list_ids:
+        return []
+
+    return db.session.execute(task_rows_query(list_ids)).all()
+
+
+def task_row_to_dict(row):
+    """
+    Serialize a task row to the same shape as Task.to_dict, with an empty subtasks list.
+
+    Args:
+        row: A row exposing the columns in TASK_COLUMNS.
+
+    Returns:
+        dict: A dictionary containing task details.
+    """
+    return {
+        "id": row.id,
+        "name": row.name,
+        "parent_id": row.parent_id,
+        "list_id": row.list_id,
+        "depth": row.depth,
+        "completed": row.completed,
+        "position": row.position,
+        "descendant_count": row.descendant_count,
+        "completed_descendant_count": row.completed_descendant_count,
+        "subtasks": [],
+    }
+
+
+def build_task_tree(rows, root_parent_id=None):
+    """
+    Assemble flat task rows into nested dictionaries using a parent_id index.
+
+    Rows whose parent is not part of the given rows are skipped, matching the
+    top-level query (parent_id=None) the routes used before. Siblings keep the
+    order of the rows, which the queries sort by position.
+
+    Args:
+        rows (list): Task rows, as returned by fetch_task_rows.
+        root_parent_id (int, optional): Parent of the tasks returned at the top (None for top-level tasks).
+
+    Returns:
+        list: Serialized top-level tasks, each with its nested subtasks.
+    """
+    nodes = {row.id: task_row_to_dict(row) for row in rows}
+    roots = []
+
+    for row in rows:
+        if row.parent_id == root_parent_id:
+            roots.append(nodes[row.id])
+            continue
+
+        parent = nodes.get(row.parent_id)
+        if parent is not None:
+            parent["subtasks"].append(nodes[row.id])
+
+    return roots
+
+
+def load_task_tree(list_id):
+    """
+    Load and serialize the full task hierarchy of a list with one query.
+
+    Args:
+        list_id (int): The ID of the list to load.
+
+    Returns:
+        list: Serialized top-level tasks, each with its nested subtasks.
+    """
+    return build_task_tree(fetch_task_rows([list_id]))
+
+
+def load_task_trees(list_ids):
+    """
+    Load and serialize the task hierarchies of several lists with one query.
+
+    Args:
+        list_ids (iterable): IDs of the lists to load.
+
+    Returns:
+        dict: Mapping of list ID to its serialized top-level tasks.
+    """
+    list_ids = list(list_ids)
+    trees = {list_id: [] for list_id in list_ids}
+
+    for root in build_task_tree(fetch_task_rows(list_ids)):
+        trees[root["list_id"]].append(root)
+
+    return trees
+
+
+def task_page_query(list_id, parent_id, after, limit):
+    """
+    Build the keyset query selecting one page of a list's top-level tasks or of a task's children.
+
+    Args:
+        list_id (int): The ID of the list.
+        parent_id (int): The ID of the parent task, or None for top-level tasks.
+        after (tuple): Only tasks sorting after this (position, id) pair are returned (None for the first page).
+        limit (int): Maximum number of tasks.
+
+    Returns:
+        Select: A statement over TASK_COLUMNS and Task.path, ordered by position.
+    """
+    statement = (
+        db.select(*TASK_COLUMNS, Task.path)
+        # Comparing with None renders IS NULL, selecting top-level tasks
+        .where(Task.list_id == list_id, Task.parent_id == parent_id)
+        .order_by(Task.position, Task.id)
+        .limit(limit)
+    )
+    if after is not None:
+        after_position, after_id = after
+        statement = statement.where(
+            db.or_(
+                Task.position > after_position,
+                db.and_(Task.position == after_position, Task.id > after_id),
+            )
+        )
+    return statement
+
+
+def subtree_levels_query(paths, min_depth, max_depth):
+    """
+    Build the query selecting the descendants of some tasks within a depth window.
+
+    Args:
+        paths (list): The materialized paths of the tasks.
+        min_depth (int): The shallowest depth to select.
+        max_depth (int): The deepest depth to select.
+
+    Returns:
+        Select: A statement over TASK_COLUMNS, ordered by sibling position.
+    """
+    return (
+        db.select(*TASK_COLUMNS)
+        .where(in_any_subtree(paths), Task.depth.between(min_depth, max_depth))
+        .order_by(Task.position, Task.id)
+    )
+
+
+def child_counts_query(paths, depth):
+    """
+    Build the query counting, below some tasks, the children of every task of one level.
+
+    Args:
+        paths (list): The materialized paths of the tasks.
+        depth (int): The depth of the counted children.
+
+    Returns:
+        Select: A statement yielding parent_id and child_count.
+    """
+    return (
+        db.select(Task.parent_id, db.func.count(Task.id).label("child_count"))
+        .where(in_any_subtree(paths), Task.depth == depth)
+        .group_by(Task.parent_id)
+    )
+
+
+def load_task_page(list_id, parent=None, after=None, limit=DEFAULT_PAGE_SIZE, depth=DEFAULT_EXPAND_DEPTH):
+    """
+    Load one page of top-level tasks (or of a task's children), expanded to a limited depth.
+
+    Every returned task carries a 'child_count'. Tasks on the deepest expanded level
+    have empty 'subtasks' even when their child_count is positive; their children are
+    fetched on demand. Three indexed queries are issued regardless of the page's size.
+
+    Args:
+        list_id (int): The ID of the list.
+        parent (optional): The parent task (exposing 'id', 'path' and 'depth'), or None for top-level tasks.
+        after (tuple, optional): Keyset cursor; the (position, id) of the last task of the previous page.
+        limit (int): Maximum number of tasks in the page.
+        depth (int): Levels of subtasks expanded below each task of the page.
+
+    Returns:
+        tuple: The serialized tasks of the page, and the 'position:id' cursor of the next page
+            (None on the last page).
+    """
+    parent_id = parent.id if parent is not None else None
+    base_depth = parent.depth + 1 if parent is not None else 0
+
+    # Fetch one extra task to learn whether another page follows
+    page = db.session.execute(task_page_query(list_id, parent_id, after, limit + 1)).all()
+    next_after = f"{page[limit - 1].position}:{page[limit - 1].id}" if len(page) > limit else None
+    page = page[:limit]
+    if not page:
+        return [], None
+
+    paths = [row.path for row in page]
+    rows = list(page)
+    if depth > 0:
+        rows += db.session.execute(subtree_levels_query(paths, base_depth + 1, base_depth + depth)).all()
+
+    # Children of the deepest expanded level are only counted
+    deepest = base_depth + depth
+    collapsed_counts = dict(db.session.execute(child_counts_query(paths, deepest + 1)).all())
+
+    tasks = build_task_tree(rows, root_parent_id=parent_id)
+    for node, _ in iter_preorder(tasks, lambda node: node["subtasks"]):
+        if node["depth"] == deepest:
+            node["child_count"] = collapsed_counts.get(node["id"], 0)
+        else:
+            node["child_count"] = len(node["subtasks"])
+
+    return tasks, next_after
+
+
+def page_args(args):
+    """
+    Read the keyset pagination arguments of a request's query string.
+
+    Args:
+        args: The request's query arguments.
+
+    Returns:
+        dict: 'after', 'limit' and 'depth' keyword arguments for load_task_page.
+
+    Raises:
+        ValueError: If limit or depth is not a non-negative integer, limit is zero,
+            or after is not a 'position:id' cursor.
+    """
+    values = {"after": None}
+    after = args.get("after", "")
+    if after:
+        position, _, task_id = after.partition(":")
+        if not (position.isdigit() and task_id.isdigit()):
+            raise ValueError("after must be the next_after cursor of a previous page.")
+        values["after"] = (int(position), int(task_id))
+
+    for name, default in (("limit", DEFAULT_PAGE_SIZE), ("depth", DEFAULT_EXPAND_DEPTH)):
+        raw = args.get(name)
+        if raw is None or raw == "":
+            values[name] = default
+            continue
+        if not raw.isdigit():
+            raise ValueError(f"{name} must be a non-negative integer.")
+        values[name] = int(raw)
+
+    if values["limit"] == 0:
+        raise ValueError("limit must be at least 1.")
+    values["limit"] = min(values["limit"], MAX_PAGE_SIZE)
+    return values
+
+
+def wants_page(args):
+    """
+    Check whether a request's query string asked for a page of tasks (limit, after or depth).
+
+    Args:
+        args: The request's query arguments.
+
+    Returns:
+        bool: True if any pagination argument is present.
+    """
+    return any(name in args for name in ("limit", "after", "depth"))
+
+
+def list_summary_query(user_id):
+    """
+    Build the query summarizing each of a user's lists.
+
+    Task counts come from the lists' rollup columns; the deepest level is read from
+    the end of the (list_id, depth) index, so no list's tasks are scanned.
+
+    Args:
+        user_id (int): The ID of the user whose lists should be summarized.
+
+    Returns:
+        Select: A statement yielding id, name, task_count, completed_count and max_depth.
+    """
+    max_depth = (
+        db.select(db.func.max(Task.depth))
+        .where(Task.list_id == List.id)
+        .scalar_subquery()
+    )
+    return (
+        db.select(
+            List.id,
+            List.name,
+            List.task_count,
+            List.completed_count,
+            db.func.coalesce(max_depth, 0).label("max_depth"),
+        )
+        .where(List.user_id == user_id)
+        .order_by(List.id)
+    )
+
+
+def load_list_summaries(user_id, include_tasks=False):
+    """
+    Summarize a user's lists with their rollup counts, read by one query.
+
+    Args:
+        user_id (int): The ID of the user whose lists should be summarized.
+        include_tasks (bool): Whether to embed each list's full task tree, loaded in one batched query.
+
+    Returns:
+        list: Dictionaries with list metadata, task counts and, optionally, tasks.
+    """
+    summaries = [
+        {
+            "id": row.id,
+            "name": row.name,
+            "task_count": row.task_count,
+            "completed_count": row.completed_count,
+            "max_depth": row.max_depth,
+        }
+        for row in db.session.execute(list_summary_query(user_id))
+    ]
+
+    if include_tasks:
+        trees = load_task_trees(summary["id"] for summary in summaries)
+        for summary in summaries:
+            summary["tasks"] = trees[summary["id"]]
+
+    return summaries
+
+
+def wants_tasks(args):
+    """
+    Check whether a request's query string opted into embedded tasks (?include=tasks).
+
+    Args:
+        args: The request's query arguments.
+
+    Returns:
+        bool: True if 'tasks' appears in the comma-separated 'include' argument.
+    """
+    include = args.get("include", "")
+    return "tasks" in [part.strip() for part in include.split(",")]
@@ -0,0 +1,315 @@
+# tree_cache.py
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+# Representations of a list's tree cached side by side; None is the default nested JSON
+PAYLOAD_VARIANTS = (None, "columnar-json", "columnar-msgpack")
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU store bounded by the total size of the cached payloads.
+
+    Attributes:
+        max_bytes (int): Payload bytes kept before the least recently used entries are evicted.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        Return the (version, payload) entry stored under a key, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, version, payload):
+        """
+        Store a payload, evicting the least recently used entries beyond max_bytes.
+        """
+        # A payload larger than the whole budget would only evict everything else
+        if len(payload) > self.max_bytes:
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous[1])
+
+            self._entries[key] = (version, payload)
+            self._size += len(payload)
+
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= len(entry[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+class FileCacheBackend:
+    """
+    Store with one file per entry, shared by every worker process pointing at the same directory.
+
+    Reads refresh a file's modification time, so after each write the least recently
+    used files are removed until the directory fits max_bytes again.
+
+    Attributes:
+        directory (str): Directory holding the cache files.
+        max_bytes (int): Bytes of cache files kept before the least recently used are evicted.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, "-".join(str(part) for part in key) + ".json")
+
+    def _entries(self):
+        # (modification time, size, path) of every cache file; other workers may remove them meanwhile
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(".json"):
+                    try:
+                        status = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((status.st_mtime_ns, status.st_size, entry.path))
+        return entries
+
+    def get(self, key):
+        """
+        Return the (version, payload) entry stored under a key, or None.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as cache_file:
+                version = int(cache_file.readline())
+                payload = cache_file.read()
+            os.utime(path)
+            return version, payload
+        except (OSError, ValueError):
+            return None
+
+    def set(self, key, version, payload):
+        """
+        Store a payload in the key's file, evicting the least recently used files beyond max_bytes.
+        """
+        # A payload larger than the whole budget would only evict everything else
+        if len(payload) > self.max_bytes:
+            return
+
+        # Write to a temporary file first so readers never see a partial entry
+        descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as cache_file:
+                cache_file.write(f"{version}\n".encode())
+                cache_file.write(payload)
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+
+        self._evict()
+
+    def _evict(self):
+        entries = self._entries()
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            size -= entry_size
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "backend": "file",
+            "entries": len(entries),
+            "bytes": sum(entry[1] for entry in entries),
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "directory": self.directory,
+        }
+
+
+class NullCacheBackend:
+    """
+    Backend that stores nothing, used when the cache is disabled.
+    """
+
+    def get(self, key):
+        return None
+
+    def set(self, key, version, payload):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {"backend": "none"}
+
+
+class TreeCache:
+    """
+    Cache of serialized GetTasks payloads keyed by (user_id, list_id) and representation.
+
+    Entries remember the list version they were built from and are only served for that
+    version, so a reader racing a write can never resurrect a stale tree; write routes
+    also invalidate entries explicitly to free their space.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or NullCacheBackend()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    @staticmethod
+    def _key(user_id, list_id, variant):
+        return (user_id, list_id) if variant is None else (user_id, list_id, variant)
+
+    def get(self, user_id, list_id, version, variant=None):
+        """
+        Return the cached payload for a list, or None if missing or built from another version.
+
+        Args:
+            user_id (int): The ID of the list's owner.
+            list_id (int): The ID of the list.
+            version (int): The list's current version.
+            variant (str, optional): The representation, one of PAYLOAD_VARIANTS.
+
+        Returns:
+            bytes: The serialized payload, or None.
+        """
+        entry = self.backend.get(self._key(user_id, list_id, variant))
+        if entry is not None and entry[0] == version:
+            self._count("hits")
+            return entry[1]
+
+        self._count("misses")
+        return None
+
+    def put(self, user_id, list_id, version, payload, variant=None):
+        """
+        Cache a list's serialized payload for the given version.
+
+        Args:
+            user_id (int): The ID of the list's owner.
+            list_id (int): The ID of the list.
+            version (int): The list version the payload was built from.
+            payload (bytes): The serialized payload.
+            variant (str, optional): The representation, one of PAYLOAD_VARIANTS.
+        """
+        self.backend.set(self._key(user_id, list_id, variant), version, payload)
+
+    def invalidate(self, user_id, list_ids):
+        """
+        Drop the cached payloads of the given lists.
+
+        Args:
+            user_id (int): The ID of the lists' owner.
+            list_ids (iterable): IDs of the lists to drop.
+        """
+        for list_id in list_ids:
+            for variant in PAYLOAD_VARIANTS:
+                self.backend.delete(self._key(user_id, list_id, variant))
+            self._count("invalidations")
+
+    def stats(self):
+        """
+        Report hit, miss and invalidation counters along with the backend's own statistics.
+
+        Returns:
+            dict: The cache statistics.
+        """
+        with self._lock:
+            stats = dict(self._counters)
+        stats.update(self.backend.stats())
+        return stats
+
+
+# Shared by the read routes and changes.record_list_change
+tree_cache = TreeCache()
+
+
+def configure_tree_cache(backend_name, max_bytes, directory):
+    """
+    Select the backend of the shared tree cache.
+
+    Args:
+        backend_name (str): 'memory', 'file' or 'none'.
+        max_bytes (int): Size budget of the memory and file backends.
+        directory (str): Directory of the file backend.
+
+    Raises:
+        ValueError: If the backend name is unknown.
+    """
+    if backend_name == "memory":
+        tree_cache.backend = MemoryCacheBackend(max_bytes)
+    elif backend_name == "file":
+        tree_cache.backend = FileCacheBackend(directory, max_bytes)
+    elif backend_name == "none":
+        tree_cache.backend = NullCacheBackend()
+    else:
+        raise ValueError(f"Unknown TREE_CACHE_BACKEND: {backend_name}")
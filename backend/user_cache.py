@@ -0,0 +1,159 @@
+# user_cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from sqlalchemy import event
+from db_init import db
+from models import User
+
+
+class CachedUser(UserMixin):
+    """
+    Slim, session-independent identity used as Flask-Login's current_user.
+
+    Attributes:
+        id (int): The user's ID.
+        username (str): The user's username.
+        email (str): The user's email address.
+        name (str): The user's full name.
+    """
+
+    def __init__(self, id, username, email, name):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.name = name
+
+    def __repr__(self):
+        return f"CachedUser('{self.username}', '{self.email}', '{self.name}')"
+
+
+class UserCache:
+    """
+    Per-process LRU cache of CachedUser identities with a time-to-live.
+
+    Invalidation only reaches the current process: under several worker processes, the
+    others would keep a deleted or changed user's identity until its TTL runs out, so the
+    cache is disabled there by default (server.default_user_cache_size). A max_size of 0
+    caches nothing.
+
+    Attributes:
+        max_size (int): Maximum number of cached identities before the least recently used is evicted.
+        ttl (float): Seconds an identity stays valid after being cached.
+    """
+
+    def __init__(self, max_size=1024, ttl=30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, max_size, ttl):
+        """
+        Update the cache limits and drop all cached identities.
+
+        Args:
+            max_size (int): Maximum number of cached identities.
+            ttl (float): Seconds an identity stays valid.
+        """
+        with self._lock:
+            self.max_size = max_size
+            self.ttl = ttl
+            self._entries.clear()
+
+    def get(self, user_id):
+        """
+        Return a cached identity, or None if it is missing or expired.
+
+        Args:
+            user_id (int): The ID of the user.
+
+        Returns:
+            CachedUser: The cached identity, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+
+            identity, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+
+            self._entries.move_to_end(user_id)
+            return identity
+
+    def put(self, identity):
+        """
+        Cache an identity, evicting the least recently used ones beyond max_size.
+
+        Args:
+            identity (CachedUser): The identity to cache.
+        """
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[identity.id] = (identity, time.monotonic() + self.ttl)
+            self._entries.move_to_end(identity.id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """
+        Drop a user's cached identity, if any.
+
+        Args:
+            user_id (int): The ID of the user.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        """
+        Drop every cached identity.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by the user_loader and the invalidation hooks below
+user_cache = UserCache()
+
+
+def load_cached_user(user_id):
+    """
+    Load a user's identity from the cache, querying only the profile columns on a miss.
+
+    Args:
+        user_id (int): The ID of the user.
+
+    Returns:
+        CachedUser: The user's identity, or None if the user does not exist.
+    """
+    identity = user_cache.get(user_id)
+    if identity is not None:
+        return identity
+
+    row = db.session.execute(
+        db.select(User.id, User.username, User.email, User.name).where(User.id == user_id)
+    ).first()
+    if row is None:
+        return None
+
+    identity = CachedUser(row.id, row.username, row.email, row.name)
+    user_cache.put(identity)
+    return identity
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_user(mapper, connection, target):
+    """
+    Invalidate a user's cached identity whenever their row is updated or deleted through the ORM,
+    in this worker process only.
+    """
+    user_cache.invalidate(target.id)
@@ -0,0 +1,6 @@
+# wsgi.py
+
+from server import create_app
+
+# Production entry point, e.g. `gunicorn -c gunicorn.conf.py wsgi:app`
+app = create_app()